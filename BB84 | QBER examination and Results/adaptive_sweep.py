@@ -0,0 +1,151 @@
+import argparse
+import math
+import os
+import sys
+import numpy as np
+import matplotlib.pyplot as plt
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "BB84"))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+from batch_engine import QBER_THRESHOLD, run_batch
+
+# Same grid as Gamma_veriation.py: gamma = index / 100
+GAMMA_STEPS = 101
+COARSE_STEP = 10
+# 95% normal confidence interval
+Z_95 = 1.96
+
+
+def netsquid_sampler(key_length, seed=None):
+    # QBER samples from the event-driven protocols, one network reused for every run
+    import netsquid as ns
+    from network_set_up import BB84Network
+
+    if seed is not None:
+        ns.set_random_state(seed=seed)
+    network = BB84Network(key_length, seed=seed)
+    return lambda gamma, samples: np.array([network.run(gamma=gamma) for _ in range(samples)])
+
+
+def batch_sampler(key_length, seed=None):
+    rng = np.random.default_rng(seed)
+    return lambda gamma, samples: run_batch(key_length, gamma, samples, rng)["qber"]
+
+
+class PointEstimate:
+    """Running QBER mean and confidence interval of one gamma point."""
+
+    def __init__(self, gamma):
+        self.gamma = gamma
+        self.samples = 0
+        self.total = 0.0
+        self.total_squares = 0.0
+
+    def add(self, qbers):
+        self.samples += len(qbers)
+        self.total += float(np.sum(qbers))
+        self.total_squares += float(np.sum(np.square(qbers)))
+
+    @property
+    def mean(self):
+        return self.total / self.samples
+
+    @property
+    def half_width(self):
+        if self.samples < 2:
+            return math.inf
+        variance = max(0.0, (self.total_squares - self.samples * self.mean ** 2) / (self.samples - 1))
+        return Z_95 * math.sqrt(variance / self.samples)
+
+
+def sample_point(sampler, gamma, target_width, min_samples=10, max_samples=200, batch=10):
+    # Sample in batches until the full CI width is below target_width (QBER percentage points)
+    point = PointEstimate(gamma)
+    while point.samples < max_samples:
+        size = min_samples if point.samples == 0 else min(batch, max_samples - point.samples)
+        point.add(sampler(gamma, size))
+        if point.samples >= min_samples and 2 * point.half_width <= target_width:
+            break
+    return point
+
+
+def needs_refinement(low, middle, high, threshold=QBER_THRESHOLD):
+    # Refine around the threshold crossing and where the curve is not a straight line
+    lowest = min(low.mean - low.half_width, high.mean - high.half_width)
+    highest = max(low.mean + low.half_width, high.mean + high.half_width)
+    if lowest <= threshold <= highest:
+        return True
+    linear = (low.mean + high.mean) / 2
+    return abs(middle.mean - linear) > middle.half_width + (low.half_width + high.half_width) / 2
+
+
+def adaptive_sweep(sampler, target_width=1.0, min_samples=10, max_samples=200, batch=10, coarse_step=COARSE_STEP):
+    """QBER curve on an adaptive subset of the 101 point gamma grid.
+
+    Starts from every coarse_step-th grid point and bisects an interval only if
+    it may contain the threshold crossing or the curve bends inside it, so flat
+    and linear stretches keep their coarse spacing.
+    Returns {grid index: PointEstimate}, sorted by gamma.
+    """
+    points = {}
+
+    def estimate(index):
+        if index not in points:
+            points[index] = sample_point(sampler, index / (GAMMA_STEPS - 1), target_width, min_samples, max_samples, batch)
+        return points[index]
+
+    coarse = list(range(0, GAMMA_STEPS, coarse_step))
+    if coarse[-1] != GAMMA_STEPS - 1:
+        coarse.append(GAMMA_STEPS - 1)
+    intervals = list(zip(coarse[:-1], coarse[1:]))
+    while intervals:
+        low, high = intervals.pop()
+        if high - low < 2:
+            continue
+        middle = (low + high) // 2
+        if needs_refinement(estimate(low), estimate(middle), estimate(high)):
+            intervals += [(low, middle), (middle, high)]
+    return dict(sorted(points.items()))
+
+
+def report(points, fixed_samples):
+    fixed_total = GAMMA_STEPS * fixed_samples
+    used = sum(point.samples for point in points.values())
+    print(f"{'gamma':>6} {'QBER %':>8} {'+/- 95%':>8} {'samples':>8}")
+    for point in points.values():
+        print(f"{point.gamma:>6.2f} {point.mean:>8.2f} {point.half_width:>8.2f} {point.samples:>8}")
+    print(f"{len(points)}/{GAMMA_STEPS} gamma points, {used} simulations instead of {fixed_total} "
+          f"({fixed_total - used} saved, {1 - used / fixed_total:.1%})")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Adaptive QBER vs gamma sweep")
+    parser.add_argument("--keys", type=int, nargs="+", default=[32])
+    parser.add_argument("--width", type=float, default=1.0, help="target 95%% CI width in QBER percentage points")
+    parser.add_argument("--min-samples", type=int, default=10)
+    parser.add_argument("--max-samples", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--engine", choices=["netsquid", "batch"], default="netsquid")
+    args = parser.parse_args()
+
+    if args.engine == "netsquid":
+        from tracing import OFF, tracer
+        tracer.configure(level=OFF)
+
+    for key_length in args.keys:
+        make_sampler = netsquid_sampler if args.engine == "netsquid" else batch_sampler
+        points = adaptive_sweep(make_sampler(key_length, args.seed), args.width, args.min_samples, args.max_samples)
+        print(f"K={key_length}")
+        report(points, args.max_samples)
+
+        plt.figure(figsize=(8, 6))
+        plt.errorbar([p.gamma for p in points.values()], [p.mean for p in points.values()],
+                     yerr=[p.half_width for p in points.values()], label="QBER (95% CI)", marker='o', linestyle='-', capsize=3)
+        plt.axhline(QBER_THRESHOLD, color="red", linestyle="--", label=f"{QBER_THRESHOLD}% threshold")
+        plt.title("QBER vs Gamma (adaptive)")
+        plt.xlabel("Gamma (0 - 1)")
+        plt.ylabel("QBER (%)")
+        plt.grid(True)
+        plt.legend()
+        plt.savefig(os.path.join(os.path.dirname(os.path.abspath(__file__)), f"QBER_vs_Gamma_adaptive_(K={key_length})_{args.engine}.png"))
+        plt.close()
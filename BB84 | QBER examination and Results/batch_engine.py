@@ -0,0 +1,140 @@
+import math
+import os
+import sys
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "BB84"))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+# Same parameters and basis encoding as the event-driven protocols
+from postprocessing import QBER_SAMPLE_FRACTION, QBER_THRESHOLD, X_BASIS, Z_BASIS
+
+
+def run_batch(key_length, gamma, samples=1, rng=None):
+    """Run `samples` independent BB84 exchanges of 3 * key_length qubits at once.
+
+    Every row of the returned arrays is one protocol run, equivalent to one
+    AliceProtocol/BobProtocol pair followed by ns.sim_run().
+    """
+    rng = np.random.default_rng(rng)
+    num_bits = int(3 * key_length)
+    shape = (samples, num_bits)
+
+    # Alice's bits and bases, Bob's bases
+    alice_bits = rng.integers(0, 2, size=shape, dtype=np.uint8)
+    alice_bases = rng.integers(0, 2, size=shape, dtype=np.uint8)
+    bob_bases = rng.integers(0, 2, size=shape, dtype=np.uint8)
+
+    # A time independent DepolarNoiseModel replaces the qubit by the maximally mixed
+    # state with probability gamma, so a measurement in the preparation basis flips
+    # with probability gamma / 2. Measuring in the other basis gives a fair coin.
+    flips = (rng.random(shape) < gamma / 2).astype(np.uint8)
+    coin = rng.integers(0, 2, size=shape, dtype=np.uint8)
+    matching = alice_bases == bob_bases
+    bob_bits = np.where(matching, alice_bits ^ flips, coin)
+
+    # Sifting: positions where the bases match
+    sifted = matching.sum(axis=1)
+
+    # Random 20% sample of the sifted positions, drawn by ranking random priorities
+    sample_size = np.ceil(sifted * QBER_SAMPLE_FRACTION).astype(np.int64)
+    priority = np.where(matching, rng.random(shape), 2.0)
+    order = np.argsort(priority, axis=1, kind="stable")
+    rank = np.empty_like(order)
+    np.put_along_axis(rank, order, np.broadcast_to(np.arange(num_bits), shape), axis=1)
+    sampled = rank < sample_size[:, None]
+
+    # QBER on the sample, in percent like qber_percentage; BobProtocol counts an
+    # empty sample as 100 so the block is discarded
+    differing = (alice_bits != bob_bits)
+    sample_errors = (differing & sampled).sum(axis=1)
+    qber = np.full(samples, 1.0)
+    np.divide(sample_errors, sample_size, out=qber, where=sample_size > 0)
+    qber *= 100
+
+    # encryption_key_generation: first key_length remaining sifted positions
+    remaining = matching & ~sampled
+    key_mask = remaining & (np.cumsum(remaining, axis=1) <= key_length)
+
+    return {
+        "qber": qber,
+        "sifted": sifted,
+        "sample_size": sample_size,
+        "key_bits": key_mask.sum(axis=1),
+        "key_errors": (differing & key_mask).sum(axis=1),
+        "accepted": qber <= QBER_THRESHOLD,
+        "alice_bits": alice_bits,
+        "bob_bits": bob_bits,
+        "key_mask": key_mask,
+    }
+
+
+def encryption_keys(result, side="alice"):
+    # Keys as '0'/'1' strings, the format returned by encryption_key_generation
+    bits = result[f"{side}_bits"]
+    keys = []
+    for row, mask in zip(bits, result["key_mask"]):
+        keys.append((row[mask] + ord("0")).tobytes().decode())
+    return keys
+
+
+def qber_curve(key_length, gammas, samples, rng=None, block_samples=200):
+    # Mean QBER for every gamma, processing at most block_samples runs per array batch
+    rng = np.random.default_rng(rng)
+    means = []
+    for gamma in gammas:
+        total = 0.0
+        done = 0
+        while done < samples:
+            size = min(block_samples, samples - done)
+            total += run_batch(key_length, gamma, size, rng)["qber"].sum()
+            done += size
+        means.append(total / samples)
+    return np.array(means)
+
+
+def netsquid_qber_samples(key_length, gamma, samples):
+    # Event-driven reference path, the protocols used by Gamma_veriation.py
+    from network_set_up import BB84Network
+
+    network = BB84Network(key_length)
+    return np.array([network.run(gamma=gamma) for _ in range(samples)])
+
+
+def cross_check(key_length=32, gammas=None, samples=20, seed=None, z_limit=4.0):
+    """Compare the batch QBER curve with the NetSquid path on a small grid.
+
+    Returns a dict with both curves and the z-score of their difference per
+    gamma. `passed` is False if any |z| exceeds z_limit.
+    """
+    if gammas is None:
+        gammas = [i / 10 for i in range(11)]
+    rng = np.random.default_rng(seed)
+
+    batch_mean, netsquid_mean, z_scores = [], [], []
+    for gamma in gammas:
+        batch = run_batch(key_length, gamma, samples, rng)["qber"]
+        reference = netsquid_qber_samples(key_length, gamma, samples)
+        error = math.sqrt((batch.var(ddof=1) + reference.var(ddof=1)) / samples) if samples > 1 else 0.0
+        difference = batch.mean() - reference.mean()
+        z = difference / error if error > 0 else (0.0 if difference == 0 else math.inf)
+        batch_mean.append(batch.mean())
+        netsquid_mean.append(reference.mean())
+        z_scores.append(z)
+        print(f"gamma={gamma:.2f}  batch={batch.mean():6.2f}%  netsquid={reference.mean():6.2f}%  z={z:+.2f}")
+
+    z_scores = np.array(z_scores)
+    return {
+        "gammas": np.array(gammas),
+        "batch": np.array(batch_mean),
+        "netsquid": np.array(netsquid_mean),
+        "z": z_scores,
+        "passed": bool(np.all(np.abs(z_scores) <= z_limit)),
+    }
+
+
+if __name__ == '__main__':
+    from tracing import OFF, tracer
+    # Only the QBER is compared, the protocols run without tracing
+    tracer.configure(level=OFF)
+    result = cross_check(key_length=32, samples=20, seed=1)
+    print("Cross-check passed" if result["passed"] else "Cross-check FAILED")
@@ -0,0 +1,147 @@
+import argparse
+import os
+import sys
+import numpy as np
+import matplotlib.pyplot as plt
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "BB84"))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+from parallel import run_tasks, task_seed
+from result_store import ResultStore, code_version
+from tracing import OFF, tracer
+
+# Secret key rate and QBER against distance over a lossy fibre. Every run records
+# Bob's QBER, the key bits of the block (0 when discarded or when Alice's and Bob's
+# keys differ) and its simulated duration, so the rate is key bits per simulated
+# second including the light travel time of every qubit and acknowledgment.
+# Privacy amplification runs after Cascade, never on unreconciled bits.
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_STORE = os.path.join(HERE, "sweep_results.sqlite")
+DEFAULT_DISTANCES = [1, 5, 10, 25, 50, 75, 100, 150, 200]
+
+
+def _warm_netsquid():
+    # Pool initializer: import NetSquid once per worker instead of once per task. Lost
+    # qubits would otherwise be traced one by one at long distances
+    import netsquid
+    import network_set_up
+    tracer.configure(level=OFF)
+
+
+def task_params(task, options):
+    distance_index, distance, samples, root_seed = task
+    return dict(options, experiment="distance_sweep", distance=distance, samples=samples, seed=root_seed)
+
+
+def run_distance_task(task, options):
+    import netsquid as ns
+    from network_set_up import BB84Network
+
+    distance_index, distance, samples, root_seed = task
+    protocol_seed, netsquid_seed = task_seed(root_seed, distance_index).generate_state(2)
+    ns.set_random_state(seed=int(netsquid_seed))
+
+    network = BB84Network(options["key_length"], dp_rate=options["dp_rate"], fibre_delay=True, length=distance,
+                          attenuation=options["attenuation"], loss_init=options["loss_init"],
+                          window=options["window"], reconciliation=options["reconciliation"],
+                          privacy_amplification=options["privacy_amplification"], seed=int(protocol_seed))
+    runs = np.zeros((samples, 3))
+    for sample in range(samples):
+        runs[sample, 0] = network.run()
+        runs[sample, 1] = network.bob_protocol.key_bits if keys_match(network) else 0
+        runs[sample, 2] = network.elapsed_time
+    return runs
+
+
+def keys_match(network):
+    # An agreed block only counts when both ends hold the same key
+    bob_key = network.bob_protocol.encryption_key
+    return bob_key is not None and bob_key == network.alice_protocol.encryption_key
+
+
+def _run_task(item):
+    # run_tasks hands over one picklable argument
+    task, options = item
+    return run_distance_task(task, options)
+
+
+def distance_sweep(distances, samples, key_length=256, dp_rate=0.02, attenuation=0.2, loss_init=0.0, window=16,
+                   privacy_amplification=True, workers=None, root_seed=0, store=None):
+    """Per distance (km) an array of shape (samples, 3): QBER (%), key bits, simulated ns.
+
+    Distances already in the ResultStore are not simulated again.
+    """
+    options = {"key_length": key_length, "dp_rate": dp_rate, "attenuation": attenuation, "loss_init": loss_init,
+               "window": window, "reconciliation": "cascade" if privacy_amplification else None,
+               "privacy_amplification": privacy_amplification}
+    tasks = [(index, distance, samples, root_seed) for index, distance in enumerate(distances)]
+    results = {}
+    if store is not None:
+        for task in tasks:
+            value = store.get(task_params(task, options))
+            if value is not None:
+                results[task] = value
+    missing = [task for task in tasks if task not in results]
+    checkpoint = (lambda item, result: store.put(task_params(item[0], options), result)) if store is not None else None
+    # Longest distances are the slowest to simulate, dispatch them first
+    missing.sort(key=lambda task: -task[1])
+    computed = run_tasks(_run_task, [(task, options) for task in missing], workers=workers, initializer=_warm_netsquid,
+                         desc="Processing distances", on_result=checkpoint) if missing else []
+    results.update(zip(missing, computed))
+    return {task[1]: results[task] for task in tasks}
+
+
+def summarize(sweep):
+    # Mean QBER, secret key bits per simulated second and discard ratio per distance
+    rows = []
+    for distance, runs in sweep.items():
+        rows.append({"distance": distance, "qber": runs[:, 0].mean(),
+                     "key_rate": runs[:, 1].sum() / (runs[:, 2].sum() * 1e-9),
+                     "discard_ratio": float(np.mean(runs[:, 1] == 0))})
+    return rows
+
+
+def plot_sweep(rows, label):
+    distances = [row["distance"] for row in rows]
+    figure, rate_axis = plt.subplots(figsize=(8, 6))
+    rate_axis.semilogy(distances, [max(row["key_rate"], 1e-3) for row in rows], marker='o', color="tab:blue",
+                       label="Secret key rate")
+    rate_axis.set_xlabel("Distance (km)")
+    rate_axis.set_ylabel("Key bits per simulated second", color="tab:blue")
+    rate_axis.grid(True)
+    qber_axis = rate_axis.twinx()
+    qber_axis.plot(distances, [row["qber"] for row in rows], marker='s', linestyle='--', color="tab:red", label="QBER")
+    qber_axis.set_ylabel("QBER (%)", color="tab:red")
+    plt.title(f"BB84 key rate and QBER vs distance ({label})")
+    figure.tight_layout()
+    figure.savefig(os.path.join(HERE, f"Key_rate_vs_Distance_({label}).png"))
+    plt.close(figure)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="BB84 key rate and QBER against fibre length")
+    parser.add_argument("--distances", type=float, nargs="+", default=DEFAULT_DISTANCES, help="km")
+    parser.add_argument("--samples", type=int, default=20)
+    parser.add_argument("--key", type=int, default=256)
+    parser.add_argument("--dp-rate", type=float, default=0.02)
+    parser.add_argument("--attenuation", type=float, default=0.2, help="dB/km")
+    parser.add_argument("--loss-init", type=float, default=0.0, help="loss probability at the channel entrance")
+    parser.add_argument("--window", type=int, default=16)
+    parser.add_argument("--no-privacy-amplification", action="store_true")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--store", default=DEFAULT_STORE, help="SQLite result store, 'none' to disable")
+    args = parser.parse_args()
+
+    tracer.configure(level=OFF)
+    version = code_version(os.path.join(HERE, os.pardir, "BB84"), os.path.join(HERE, os.pardir, "common"))
+    store = None if args.store == "none" else ResultStore(args.store, version)
+    sweep = distance_sweep(args.distances, args.samples, args.key, args.dp_rate, args.attenuation, args.loss_init,
+                           args.window, not args.no_privacy_amplification, args.workers, args.seed, store)
+    rows = summarize(sweep)
+    plot_sweep(rows, f"K={args.key}, {args.attenuation} dB per km, N={args.samples}")
+
+    print(f"{'km':>7} {'QBER %':>8} {'key bit/s':>12} {'discarded':>10}")
+    for row in rows:
+        print(f"{row['distance']:>7.1f} {row['qber']:>8.2f} {row['key_rate']:>12.4g} {row['discard_ratio']:>10.2%}")
@@ -0,0 +1,136 @@
+import argparse
+import os
+import sys
+import numpy as np
+import matplotlib.pyplot as plt
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "BB84"))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+from parallel import run_tasks, task_seed
+from result_store import ResultStore, code_version
+from batch_engine import run_batch
+
+GAMMA_STEPS = 101
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_STORE = os.path.join(HERE, "sweep_results.sqlite")
+
+
+def _warm_netsquid():
+    # Pool initializer: import NetSquid once per worker instead of once per task.
+    # The sweep only reads the QBER, so the protocols run without tracing
+    import netsquid
+    import network_set_up
+    from tracing import OFF, tracer
+    tracer.configure(level=OFF)
+
+
+def sweep_tasks(key_list, number_of_samples_per_gamma, chunk_samples, root_seed, engine):
+    # One task per (key_length, gamma, chunk of samples), largest key lengths first
+    tasks = []
+    for key_length in sorted(key_list, reverse=True):
+        for gamma_index in range(GAMMA_STEPS):
+            for chunk, start in enumerate(range(0, number_of_samples_per_gamma, chunk_samples)):
+                samples = min(chunk_samples, number_of_samples_per_gamma - start)
+                tasks.append((engine, key_length, gamma_index, chunk, samples, root_seed))
+    return tasks
+
+
+def task_params(task):
+    # Result store key of one task
+    engine, key_length, gamma_index, chunk, samples, root_seed = task
+    return {"experiment": "qber_sweep", "engine": engine, "key_length": key_length, "gamma_index": gamma_index,
+            "chunk": chunk, "samples": samples, "seed": root_seed}
+
+
+def sweep_version():
+    # Results change with the protocols, the shared helpers (formalism, task seeds) or the batch engine
+    return code_version(os.path.join(HERE, os.pardir, "BB84"), os.path.join(HERE, os.pardir, "common"),
+                        os.path.join(HERE, "batch_engine.py"))
+
+
+def run_sweep_task(task):
+    engine, key_length, gamma_index, chunk, samples, root_seed = task
+    gamma = gamma_index / (GAMMA_STEPS - 1)
+    seed = task_seed(root_seed, key_length, gamma_index, chunk)
+
+    if engine == "batch":
+        return run_batch(key_length, gamma, samples, np.random.default_rng(seed))["qber"]
+
+    import netsquid as ns
+    from network_set_up import BB84Network
+
+    # The protocols draw from their own generators and NetSquid from its global state
+    protocol_seed, netsquid_seed = seed.generate_state(2)
+    ns.set_random_state(seed=int(netsquid_seed))
+
+    network = BB84Network(key_length, seed=int(protocol_seed))
+    return np.array([network.run(gamma=gamma) for _ in range(samples)])
+
+
+def run_sweep(key_list, number_of_samples_per_gamma, workers=None, root_seed=0, engine="netsquid", chunk_samples=10,
+              store=None, simulate=True):
+    """QBER samples for every (key_length, gamma) point of the sweep.
+
+    Returns {key_length: array of shape (GAMMA_STEPS, number_of_samples_per_gamma)}.
+    The result is identical for any number of workers. With a ResultStore, chunks
+    already stored are reused and every finished chunk is written at once, so an
+    interrupted sweep resumes where it stopped. simulate=False only reads the store
+    and raises KeyError if a chunk is missing.
+    """
+    tasks = sweep_tasks(key_list, number_of_samples_per_gamma, chunk_samples, root_seed, engine)
+    results = {}
+    if store is not None:
+        for task in tasks:
+            value = store.get(task_params(task))
+            if value is not None:
+                results[task] = value
+    missing = [task for task in tasks if task not in results]
+    if missing and not simulate:
+        raise KeyError(f"{len(missing)} of {len(tasks)} sweep chunks are not in the result store")
+
+    checkpoint = (lambda task, result: store.put(task_params(task), result)) if store is not None else None
+    initializer = _warm_netsquid if engine == "netsquid" else None
+    computed = run_tasks(run_sweep_task, missing, workers=workers, initializer=initializer,
+                         desc="Processing Gamma Changes", on_result=checkpoint) if missing else []
+    results.update(zip(missing, computed))
+
+    qbers = {key_length: [[] for _ in range(GAMMA_STEPS)] for key_length in key_list}
+    for task in tasks:
+        _, key_length, gamma_index, _, _, _ = task
+        qbers[key_length][gamma_index].extend(results[task])
+    return {key_length: np.array(points) for key_length, points in qbers.items()}
+
+
+def plot_sweep(sweep, samples, engine):
+    gamma_values = [i / (GAMMA_STEPS - 1) for i in range(GAMMA_STEPS)]
+    for key_length, qbers in sweep.items():
+        average_gamma_list = qbers.mean(axis=1)
+
+        plt.figure(figsize=(8, 6))
+        plt.plot(gamma_values, average_gamma_list, label="QBER", marker='o', linestyle='-')
+        plt.title("QBER vs Gamma")
+        plt.xlabel("Gamma (0 - 1)")
+        plt.ylabel("QBER (%)")
+        plt.grid(True)
+        plt.legend()
+        plt.savefig(os.path.join(HERE, f"QBER_vs_Gamma_(N={samples}, K={key_length})_{engine}.png"))
+        plt.close()
+
+        print(key_length, list(average_gamma_list))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Parallel QBER vs gamma sweep")
+    parser.add_argument("--keys", type=int, nargs="+", default=[32, 64, 128, 256, 512, 1024, 2048])
+    parser.add_argument("--samples", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--engine", choices=["netsquid", "batch"], default="netsquid")
+    parser.add_argument("--store", default=DEFAULT_STORE, help="SQLite result store, 'none' to disable")
+    parser.add_argument("--plot-only", action="store_true", help="plot from the result store without simulating")
+    args = parser.parse_args()
+
+    store = None if args.store == "none" else ResultStore(args.store, sweep_version())
+    sweep = run_sweep(args.keys, args.samples, workers=args.workers, root_seed=args.seed, engine=args.engine,
+                      store=store, simulate=not args.plot_only)
+    plot_sweep(sweep, args.samples, args.engine)
@@ -1,31 +1,81 @@
 import netsquid as ns
 from netsquid.protocols import NodeProtocol
+from netsquid.components.component import Message
 from netsquid.qubits import create_qubits, measure, operate
 from netsquid.qubits.operators import H
-import random
+import time
 from textwrap import wrap
 import numpy as np
 from tools import *
+from codec import decode_bases, encode_sifting, message_size
+from postprocessing import (BASIS_LETTERS, X_BASIS, Z_BASIS, extract_key, measurement_matrix, remove_positions, sift,
+                            take_bits, write_matrix)
+from cascade import ParityOracle, decode_queries
+from privacy_amplification import amplify
 import math
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+from tracing import DEBUG, ERROR, INFO, WARNING, tracer
+from instrumentation import make_profiler
+
+PORT_NAMES = ("quantum_out", "classical_in", "classical_out")
+
 
 class AliceProtocol(NodeProtocol):
-    def __init__(self, node, encryption_key_length=32):
+    def __init__(self, node, encryption_key_length=32, window=1, codec="text", blocks=1, key_sink=None, profile=False,
+                 ports=None, rng=None):
         super().__init__(node)
+        # Node port of each logical port, e.g. {"quantum_out": "quantum_out_3"} when a node runs several links
+        self.port_names = dict(zip(PORT_NAMES, PORT_NAMES), **(ports or {}))
         self.num_bits = int(3 * encryption_key_length)
         self.encryption_key_length = encryption_key_length
-        self.raw_bits = []
-        self.bases = []
+        # Number of qubits in flight per acknowledgment, 1 is stop-and-wait
+        self.window = window
+        # "text" or "binary" (codec.py) format for the sifting messages
+        self.codec = codec
+        # Number of key blocks to generate, None for continuous generation until stopped
+        self.blocks = blocks
+        # Called with a KeyBlock as soon as every block is agreed or discarded
+        self.key_sink = key_sink
+        # Per-phase wall time, simulated time and events (instrumentation.py), a no-op unless profile
+        self.profiler = make_profiler(profile, node.name, lambda: self.events)
+        # Seed or numpy Generator of this session's bits, bases and QBER samples, None for fresh entropy
+        self.rng = np.random.default_rng(rng)
+        self.clear_run_state()
+
+    def clear_block_state(self):
+        # One entry per qubit of the block: bit (0/1) and basis code (postprocessing Z_BASIS/X_BASIS),
+        # drawn for the whole block at once
+        self.raw_bits = self.rng.integers(0, 2, self.num_bits, dtype=np.uint8)
+        self.bases = self.rng.integers(Z_BASIS, X_BASIS + 1, self.num_bits, dtype=np.uint8)
         self.sifted_basis = []
-        self.encryption_key = {}
+        self.lost_qubits = []
+        self.encryption_key = None
+        self.key_bits = 0
 
-    def run(self):
-        print("[Alice] Protocol started.")
-        for i in range(self.num_bits):
-            port = self.node.ports["quantum_out"]
-            bit = random.randint(0, 1)
-            basis = random.choice(["Z", "X"])
-            self.raw_bits.append(bit)
-            self.bases.append(basis)
+    def clear_run_state(self):
+        self.clear_block_state()
+        self.block_index = 0
+        # Simulator events handled and classical/quantum messages sent by this protocol
+        self.events = 0
+        self.messages_sent = 0
+        self.bytes_sent = 0
+        self.profiler.clear()
+
+    def reset(self, rng=None):
+        # Forget the previous run and restart, so one instance serves many Monte Carlo samples.
+        # A new rng (seed or Generator) makes the run replayable
+        if rng is not None:
+            self.rng = np.random.default_rng(rng)
+        self.clear_run_state()
+        super().reset()
+
+    def prepare_qubit(self, i):
+        with self.profiler.phase("prepare"):
+            bit = self.raw_bits[i]
+            basis = "X" if self.bases[i] == X_BASIS else "Z"
 
             # Prepare qubit
             qubit = create_qubits(1)[0]
@@ -36,76 +86,188 @@ class AliceProtocol(NodeProtocol):
                 operate(qubit, H)
                 if bit == 1:
                     operate(qubit, ns.Z)
+        return qubit, bit, basis
 
-            # Transmit qubit
-            port.tx_output(qubit)
-            print(f"[Alice] Sent qubit {i+1}/{self.num_bits}: Bit={bit}, Basis={basis}")
+    def send(self, port_name, message):
+        self.node.ports[self.port_names[port_name]].tx_output(message)
+        self.messages_sent += 1
+        if port_name == "classical_out":
+            self.bytes_sent += message_size(message)
 
-            # Wait for acknowledgment
-            yield self.await_port_input(self.node.ports["classical_in"])
-            ack = self.node.ports["classical_in"].rx_input().items[0]
-            if ack != f"ACK_{i + 1}":
-                print(f"[Alice] Error: Expected ACK_{i}, got {ack}")
+    def receive(self):
+        # Wait for the next classical message from Bob
+        yield self.await_port_input(self.node.ports[self.port_names["classical_in"]])
+        self.events += 1
+        return self.node.ports[self.port_names["classical_in"]].rx_input().items[0]
+
+    def run(self):
+        if tracer.enabled(INFO, self.node.name):
+            tracer.emit(INFO, self.node.name, "[Alice] Protocol started.")
+        while self.blocks is None or self.block_index < self.blocks:
+            if self.block_index > 0:
+                self.clear_block_state()
+            completed = yield from self.run_block()
+            if not completed:
                 return
+            self.block_index += 1
+
+    def run_block(self):
+        # One key block: transmission, sifting, QBER sample and key agreement
+        if self.window > 1:
+            transmitted = yield from self.transmit_windowed()
+        else:
+            transmitted = yield from self.transmit_stop_and_wait()
+        if not transmitted:
+            return False
 
         # Wait for Bob's bases
-        print("[Alice] Waiting for Bob's bases...")
-        self.node.ports["classical_out"].tx_output("None")
-        yield self.await_port_input(self.node.ports["classical_in"])
-        bob_bases = (self.node.ports["classical_in"].rx_input().items[0]).split()
-        print("[Alice] Received Bob's bases:", bob_bases)
+        if tracer.enabled(INFO, self.node.name):
+            tracer.emit(INFO, self.node.name, "[Alice] Waiting for Bob's bases...")
+        with self.profiler.phase("bases_exchange"):
+            self.send("classical_out", "None")
+            bob_bases = yield from self.receive()
+            bob_bases = decode_bases(bob_bases) if self.codec == "binary" else bob_bases.split()
+        if tracer.enabled(DEBUG, self.node.name):
+            tracer.emit(DEBUG, self.node.name, f"[Alice] Received Bob's bases: {bob_bases}")
 
-        # Find sifted positions (where bases match)
-        self.sifted_basis = [i for i, (a_basis, b_basis) in enumerate(zip(self.bases, bob_bases)) if a_basis == b_basis]
-        print("[Alice] Initial sifted positions:", self.sifted_basis)
+        with self.profiler.phase("sifting"):
+            # Find sifted positions (where bases match)
+            self.sifted_basis = sift(self.bases, bob_bases).tolist()
+            if tracer.enabled(DEBUG, self.node.name):
+                tracer.emit(DEBUG, self.node.name, f"[Alice] Initial sifted positions: {self.sifted_basis}")
 
-        # Calculate 20% of the list length
-        eleven_percent_count = math.ceil(len(self.sifted_basis) * 0.20)
+            # Calculate 20% of the list length
+            eleven_percent_count = math.ceil(len(self.sifted_basis) * 0.20)
 
-        # Randomly select 20% of the numbers
-        random_selection = random.sample(self.sifted_basis, eleven_percent_count)
+            # Randomly select 20% of the numbers
+            random_selection = self.rng.choice(self.sifted_basis, eleven_percent_count, replace=False).tolist()
 
-        print(random_selection, type(random_selection))
+            if tracer.enabled(DEBUG, self.node.name):
+                tracer.emit(DEBUG, self.node.name, f"[Alice] Random selection: {random_selection}")
 
-        # Remove the selected positions from self.sifted_basis
-        self.sifted_basis = [item for item in self.sifted_basis if item not in random_selection]
+            # Remove the selected positions from self.sifted_basis
+            self.sifted_basis = remove_positions(self.sifted_basis, random_selection).tolist()
 
-        # Initialize an empty list to store the concatenated strings
-        concatenated_strings = []
+            # Initialize an empty list to store the concatenated strings
+            concatenated_strings = []
 
-        # Loop through the random_selection to get the corresponding indexes and bits
-        for selected_item in random_selection:
-            corresponding_bit = self.raw_bits[selected_item]  # Get the corresponding bit
+            # Loop through the random_selection to get the corresponding indexes and bits
+            for selected_item in random_selection:
+                corresponding_bit = self.raw_bits[selected_item]  # Get the corresponding bit
 
-            # Create the concatenated string with sifted_basis item, random_selection item, and corresponding raw_bits
-            concatenated_strings.append(f"{corresponding_bit}")
+                # Create the concatenated string with sifted_basis item, random_selection item, and corresponding raw_bits
+                concatenated_strings.append(f"{corresponding_bit}")
             
-        # Now concatenate the remaining sifted_basis, random_selection, and corresponding bits into one string
-        selected_values = " ".join([f"{item}" for item in self.sifted_basis])  
-        selected_values += "|"  
-        selected_values += " ".join([f"{item}" for item in random_selection]) 
-        selected_values += "|"  
-        selected_values += "".join(concatenated_strings)  
-
-        print("[Alice] Final sifted basis, Random Selection and Corresponding Bits:", selected_values)
-
-        # Send everything to Bob
-        self.node.ports["classical_out"].tx_output(''.join(selected_values))
-        print("[Alice] Selected values sent to Bob.")
-        yield self.await_port_input(self.node.ports["classical_in"])
-        bobs_answer = self.node.ports["classical_in"].rx_input().items[0]
-        
-        if bobs_answer == "OK":
-            self.encryption_key = encryption_key_generation(self.sifted_basis, self.raw_bits, self.encryption_key_length)
-            print("[Alice] Secure communication of the Encryption Key: Successful")
-        else:
-            self.encryption_key = "Discarded"
-            print("[Alice] Secure communication of the Encryption Key: Unsuccessful")
-            print("[Alice] Key discarded")
+            # The text message is only built when it is sent or traced, the binary codec does not need it
+            debug = tracer.enabled(DEBUG, self.node.name)
+            if self.codec != "binary" or debug:
+                # Now concatenate the remaining sifted_basis, random_selection, and corresponding bits into one string
+                selected_values = " ".join([f"{item}" for item in self.sifted_basis])
+                selected_values += "|"
+                selected_values += " ".join([f"{item}" for item in random_selection])
+                selected_values += "|"
+                selected_values += "".join(concatenated_strings)
+
+            if debug:
+                tracer.emit(DEBUG, self.node.name, f"[Alice] Final sifted basis, Random Selection and Corresponding Bits: {selected_values}")
+
+            # Send everything to Bob
+            if self.codec == "binary":
+                self.send("classical_out", encode_sifting(self.num_bits, self.sifted_basis, random_selection, concatenated_strings))
+            else:
+                self.send("classical_out", ''.join(selected_values))
+            if tracer.enabled(INFO, self.node.name):
+                tracer.emit(INFO, self.node.name, "[Alice] Selected values sent to Bob.")
+
+        with self.profiler.phase("reconciliation"):
+            bobs_answer = yield from self.receive()
+
+            # Answer Bob's Cascade parity queries, if he reconciles, until his verdict arrives
+            oracle = None
+            while bobs_answer.startswith("PARITY|"):
+                seed, passes, queries = decode_queries(bobs_answer)
+                if oracle is None:
+                    oracle = ParityOracle(take_bits(self.raw_bits, self.sifted_basis), passes, seed)
+                self.send("classical_out", "PARITIES|" + "".join(str(parity) for parity in oracle.parities(queries)))
+                bobs_answer = yield from self.receive()
+
+        with self.profiler.phase("key_extraction"):
+            if bobs_answer == "OK":
+                self.encryption_key = extract_key(self.sifted_basis, self.raw_bits, self.encryption_key_length)
+                self.key_bits = min(self.encryption_key_length, len(self.sifted_basis))
+                if tracer.enabled(INFO, self.node.name):
+                    tracer.emit(INFO, self.node.name, "[Alice] Secure communication of the Encryption Key: Successful")
+            elif bobs_answer.startswith("OK|"):
+                # Privacy amplification: Bob chose the final length and the public Toeplitz seed
+                _, key_bits, seed = bobs_answer.split("|")
+                self.key_bits = int(key_bits)
+                self.encryption_key = amplify(take_bits(self.raw_bits, self.sifted_basis), self.key_bits, int(seed))
+                if tracer.enabled(INFO, self.node.name):
+                    tracer.emit(INFO, self.node.name, "[Alice] Secure communication of the Encryption Key: Successful")
+            else:
+                self.encryption_key = None
+                if tracer.enabled(INFO, self.node.name):
+                    tracer.emit(INFO, self.node.name, "[Alice] Secure communication of the Encryption Key: Unsuccessful")
+                    tracer.emit(INFO, self.node.name, "[Alice] Key discarded")
+
+        if self.key_sink is not None:
+            self.key_sink(KeyBlock(self.block_index, self.encryption_key, self.key_bits, None,
+                                   self.encryption_key is None, ns.sim_time(), time.perf_counter()))
+        return True
+
+    def transmit_stop_and_wait(self):
+        for i in range(self.num_bits):
+            qubit, bit, basis = self.prepare_qubit(i)
+
+            # Transmit qubit
+            with self.profiler.phase("transmit"):
+                self.send("quantum_out", qubit)
+            if tracer.enabled(DEBUG, self.node.name):
+                tracer.emit(DEBUG, self.node.name, f"[Alice] Sent qubit {i+1}/{self.num_bits}: Bit={bit}, Basis={basis}")
+
+            # Wait for acknowledgment
+            with self.profiler.phase("ack_wait"):
+                ack = yield from self.receive()
+            if ack != f"ACK_{i + 1}":
+                if tracer.enabled(ERROR, self.node.name):
+                    tracer.emit(ERROR, self.node.name, f"[Alice] Error: Expected ACK_{i + 1}, got {ack}")
+                return False
+        return True
+
+    def transmit_windowed(self):
+        # Send the qubits in frames of `window` qubits. Bob answers every frame with a
+        # cumulative ACK plus a bitmap of the qubits that actually arrived.
+        for start in range(0, self.num_bits, self.window):
+            count = min(self.window, self.num_bits - start)
+            qubits = []
+            for i in range(start, start + count):
+                qubit, bit, basis = self.prepare_qubit(i)
+                qubits.append(qubit)
+                if tracer.enabled(DEBUG, self.node.name):
+                    tracer.emit(DEBUG, self.node.name, f"[Alice] Sent qubit {i+1}/{self.num_bits}: Bit={bit}, Basis={basis}")
+            with self.profiler.phase("transmit"):
+                self.send("quantum_out", Message(qubits, seq=start))
+
+            with self.profiler.phase("ack_wait"):
+                ack = yield from self.receive()
+            cumulative, _, bitmap = ack.partition("|")
+            if cumulative != f"ACK_{start + count}" or len(bitmap) != count:
+                if tracer.enabled(ERROR, self.node.name):
+                    tracer.emit(ERROR, self.node.name, f"[Alice] Error: Expected ACK_{start + count}, got {ack}")
+                return False
+            self.lost_qubits.extend(start + offset for offset, received in enumerate(bitmap) if received == "0")
+        if self.lost_qubits and tracer.enabled(WARNING, self.node.name):
+            tracer.emit(WARNING, self.node.name, f"[Alice] Bob reported {len(self.lost_qubits)} lost qubits: {self.lost_qubits}")
+        return True
 
     def display_matrix(self):
-        # Create a NumPy array for visualization
-        matrix = np.array([list(range(1, self.num_bits + 1)), self.bases, self.raw_bits], dtype=object)
+        # Print the block row by row straight from the arrays
         print("\n--- Alice's Measurement Matrix ---")
         print("Bit #   Basis   Bit")
-        print(matrix.T)  # Transpose for vertical alignment
+        for i, (basis, bit) in enumerate(zip(BASIS_LETTERS[self.bases], self.raw_bits), start=1):
+            print(f"{i:>5}   {basis:>5}   {bit:>3}")
+
+    def export_matrix(self, path, append=False):
+        # Compact (block, qubit, basis, bit) records, append=True streams block after block
+        # into one file that postprocessing.load_matrix memory-maps
+        write_matrix(path, measurement_matrix(self.bases, self.raw_bits, self.block_index), append)
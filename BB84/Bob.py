@@ -3,89 +3,294 @@ from netsquid.protocols import NodeProtocol
 from netsquid.components.models.qerrormodels import DepolarNoiseModel
 from netsquid.qubits import create_qubits, measure, operate
 from netsquid.qubits.operators import H
-import random
 import time
+import os
+import sys
 from textwrap import wrap
 import numpy as np
 from tools import *
+from codec import decode_sifting, encode_bases, message_size
+from postprocessing import (BASIS_LETTERS, LOST, QBER_THRESHOLD, X_BASIS, Z_BASIS, bases_to_string, extract_key,
+                            measurement_matrix, qber_percentage, take_bits, write_matrix)
+from cascade import DEFAULT_PASSES, cascade, encode_queries
+from privacy_amplification import DEFAULT_EPSILON, amplify, secure_key_length
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+from tracing import DEBUG, ERROR, INFO, WARNING, tracer
+from instrumentation import make_profiler
+
+
+PORT_NAMES = ("quantum_in", "classical_in", "classical_out")
 
 
 class BobProtocol(NodeProtocol):
-    def __init__(self, node, encryption_key_length=32, dp_rate=0):
+    def __init__(self, node, encryption_key_length=32, dp_rate=0, window=1, codec="text", blocks=1, key_sink=None,
+                 reconciliation=None, privacy_amplification=False, profile=False, ports=None, qubit_timeout=None,
+                 rng=None):
         super().__init__(node)
+        # Node port of each logical port, e.g. {"quantum_in": "quantum_in_3"} when a node runs several links
+        self.port_names = dict(zip(PORT_NAMES, PORT_NAMES), **(ports or {}))
         self.num_bits = int(3 * encryption_key_length)
         self.encryption_key_length = encryption_key_length
-        self.raw_bits = []
-        self.bases = []
+        # Number of qubits in flight per acknowledgment, 1 is stop-and-wait
+        self.window = window
+        # "text" or "binary" (codec.py) format for the sifting messages
+        self.codec = codec
+        # Number of key blocks to generate, None for continuous generation until stopped
+        self.blocks = blocks
+        # Called with a KeyBlock as soon as every block is agreed or discarded
+        self.key_sink = key_sink
+        # None trusts the sifted bits below the QBER threshold, "cascade" corrects them first
+        self.reconciliation = reconciliation
+        self.cascade_passes = DEFAULT_PASSES
+        self.cascade_block_size = None
+        # Compress the key with a Toeplitz hash sized from the QBER and the leaked bits. Only after Cascade:
+        # hashing unreconciled bits would leave Alice and Bob with unrelated keys
+        if privacy_amplification and reconciliation is None:
+            raise ValueError("Privacy amplification needs reconciliation, e.g. reconciliation=\"cascade\".")
+        self.privacy_amplification = privacy_amplification
+        self.epsilon = DEFAULT_EPSILON
+        self.depolar_noise = DepolarNoiseModel(depolar_rate=dp_rate, time_independent=True)
+        # On lossy channels: ns to wait for the next qubit (frame) before counting it as lost
+        self.qubit_timeout = qubit_timeout
+        # Per-phase wall time, simulated time and events (instrumentation.py), a no-op unless profile
+        self.profiler = make_profiler(profile, node.name, lambda: self.events)
+        # Seed or numpy Generator of this session's bases and public seeds, None for fresh entropy
+        self.rng = np.random.default_rng(rng)
+        self.clear_run_state()
+
+    def clear_block_state(self):
+        # One entry per qubit of the block: bit (0/1) and basis code (postprocessing Z_BASIS/X_BASIS/LOST).
+        # Measurement bases are drawn for the whole block at once, lost qubits become LOST
+        self.raw_bits = np.zeros(self.num_bits, dtype=np.uint8)
+        self.bases = self.rng.integers(Z_BASIS, X_BASIS + 1, self.num_bits, dtype=np.uint8)
         self.sifted_key = []
         self.qber = 0
-        self.depolar_noise = DepolarNoiseModel(depolar_rate=dp_rate, time_independent=True)
-        self.encryption_key = ""
+        self.encryption_key = None
+        self.key_bits = 0
+        self.reconciliation_stats = None
 
-    def run(self):
-        for i in range(self.num_bits):
-            port = self.node.ports["quantum_in"]
-            basis = random.choice(["Z", "X"])
-            self.bases.append(basis)
+    def clear_run_state(self):
+        self.clear_block_state()
+        self.block_index = 0
+        # Simulator events handled and classical messages sent by this protocol
+        self.events = 0
+        self.messages_sent = 0
+        self.bytes_sent = 0
+        self.profiler.clear()
 
-            yield self.await_port_input(port)
-            time.sleep(0)
-            qubit = port.rx_input().items[0]
+    def reset(self, dp_rate=None, rng=None):
+        # Forget the previous run and restart, optionally with a new depolarizing rate and rng
+        if dp_rate is not None:
+            self.depolar_noise.depolar_rate = dp_rate
+        if rng is not None:
+            self.rng = np.random.default_rng(rng)
+        self.clear_run_state()
+        super().reset()
+
+    def measure_qubit(self, qubit, i):
+        basis = "X" if self.bases[i] == X_BASIS else "Z"
+        if qubit is None:
+            # Lost in transit: no basis, never part of the sifted key
+            self.bases[i] = LOST
+            if tracer.enabled(WARNING, self.node.name):
+                tracer.emit(WARNING, self.node.name, f"[Bob] Qubit {i+1}/{self.num_bits} lost")
+            return False
+        with self.profiler.phase("noise"):
             self.depolar_noise.error_operation([qubit])
+        with self.profiler.phase("measure"):
             result, _ = measure(qubit, observable=ns.Z if basis == "Z" else ns.X)
-            self.raw_bits.append(result)
-            print(f"[Bob] Measured qubit {i+1}/{self.num_bits}: Result={result}, Basis={basis}")
+        self.raw_bits[i] = result
+        if tracer.enabled(DEBUG, self.node.name):
+            tracer.emit(DEBUG, self.node.name, f"[Bob] Measured qubit {i+1}/{self.num_bits}: Result={result}, Basis={basis}")
+        return True
 
-            # Send acknowledgment to Alice
-            self.node.ports["classical_out"].tx_output(f"ACK_{i + 1}")
-            print(f"[Bob] Sent ACK_{i + 1}")
+    def send(self, message):
+        self.node.ports[self.port_names["classical_out"]].tx_output(message)
+        self.messages_sent += 1
+        self.bytes_sent += message_size(message)
+
+    def receive(self):
+        # Wait for the next classical message from Alice
+        yield self.await_port_input(self.node.ports[self.port_names["classical_in"]])
+        self.events += 1
+        return self.node.ports[self.port_names["classical_in"]].rx_input().items[0]
+
+    def run(self):
+        while self.blocks is None or self.block_index < self.blocks:
+            if self.block_index > 0:
+                self.clear_block_state()
+            completed = yield from self.run_block()
+            if not completed:
+                return
+            self.block_index += 1
+
+    def run_block(self):
+        # One key block: measurement, sifting, QBER check and key agreement
+        if self.window > 1:
+            received = yield from self.receive_windowed()
+        else:
+            received = yield from self.receive_stop_and_wait()
+        if not received:
+            return False
 
         # Send bases to Alice
-        print("[Bob] Sending bases to Alice...")
-        yield self.await_port_input(self.node.ports["classical_in"])
-        self.node.ports["classical_out"].tx_output(' '.join(self.bases))
-        dummy = self.node.ports["classical_in"].rx_input().items[0]
+        if tracer.enabled(INFO, self.node.name):
+            tracer.emit(INFO, self.node.name, "[Bob] Sending bases to Alice...")
+        with self.profiler.phase("bases_exchange"):
+            dummy = yield from self.receive()
+            self.send(encode_bases(self.bases) if self.codec == "binary" else bases_to_string(self.bases))
 
         # Wait for sifted positions from Alice
-        yield self.await_port_input(self.node.ports["classical_in"])
-        selected_values = self.node.ports["classical_in"].rx_input().items[0]
+        with self.profiler.phase("sifting_wait"):
+            selected_values = yield from self.receive()
 
-        # Step 1: Split the final string by the '|' separator
-        parts = selected_values.split('|')
+        with self.profiler.phase("sifting"):
+            if self.codec == "binary":
+                sifted_basis, random_selection, alice_qber_key = decode_sifting(selected_values)
+            else:
+                # Step 1: Split the final string by the '|' separator
+                parts = selected_values.split('|')
 
-        # Step 2: Extract sifted_basis and random_selection
-        sifted_basis = list(map(int, parts[0].split()))  # Convert sifted_basis from string to list of integers
-        random_selection = list(map(int, parts[1].split()))  # Convert random_selection from string to list of integers
+                # Step 2: Extract sifted_basis and random_selection
+                sifted_basis = list(map(int, parts[0].split()))  # Convert sifted_basis from string to list of integers
+                random_selection = list(map(int, parts[1].split()))  # Convert random_selection from string to list of integers
 
-        # Step 3: The last part is the corresponding bits as a single string
-        alice_qber_key = parts[2]
+                # Step 3: The last part is the corresponding bits as a single string
+                alice_qber_key = parts[2]
 
         # Print the results
-        print("Sifted Basis:", sifted_basis)
-        print("Random Selection:", random_selection)
-        print("Corresponding Bits:", alice_qber_key)
-
-        # Create the corresponding random key from Bob's measured bits
-        bob_qber_key = "".join([f"{self.raw_bits[item]}" for item in random_selection]) 
-
-        #Check qber
-        self.qber = qber_calculation(alice_qber_key, bob_qber_key)
-        print(f'Difference: {self.qber} %')
-
-        if self.qber <= 11:
-            # Send everything to Bob
-            self.encryption_key = encryption_key_generation(sifted_basis, self.raw_bits, self.encryption_key_length)
-            self.node.ports["classical_out"].tx_output("OK")
-            print("[Bob] Encryption Key: Valid")
+        if tracer.enabled(DEBUG, self.node.name):
+            tracer.emit(DEBUG, self.node.name, f"Sifted Basis: {sifted_basis}")
+            tracer.emit(DEBUG, self.node.name, f"Random Selection: {random_selection}")
+            tracer.emit(DEBUG, self.node.name, f"Corresponding Bits: {alice_qber_key}")
+
+        with self.profiler.phase("qber"):
+            # Create the corresponding random key from Bob's measured bits
+            bob_qber_key = take_bits(self.raw_bits, random_selection)
+
+            #Check qber, with nothing left to sample (e.g. every qubit lost) the block is discarded
+            self.qber = qber_percentage(alice_qber_key, bob_qber_key) if len(random_selection) else 100.0
+        if tracer.enabled(INFO, self.node.name):
+            tracer.emit(INFO, self.node.name, f'Difference: {self.qber} %')
+
+        if self.qber <= QBER_THRESHOLD:
+            if self.reconciliation == "cascade":
+                # Correct the residual errors of all kept sifted bits before taking the key
+                with self.profiler.phase("reconciliation"):
+                    key_material = yield from self.reconcile(take_bits(self.raw_bits, sifted_basis))
+            else:
+                key_material = take_bits(self.raw_bits, sifted_basis)
+            with self.profiler.phase("key_extraction"):
+                verdict = "OK"
+                if self.privacy_amplification:
+                    leaked = self.reconciliation_stats["leaked_bits"] if self.reconciliation_stats else 0
+                    self.key_bits = min(self.encryption_key_length,
+                                        secure_key_length(len(key_material), self.qber, leaked, self.epsilon))
+                    seed = int(self.rng.integers(1 << 63))
+                    self.encryption_key = amplify(key_material, self.key_bits, seed) if self.key_bits else None
+                    verdict = f"OK|{self.key_bits}|{seed}"
+                else:
+                    self.key_bits = min(self.encryption_key_length, len(key_material))
+                    self.encryption_key = extract_key(range(len(key_material)), key_material, self.encryption_key_length)
+
+        if self.encryption_key is not None:
+            self.send(verdict)
+            if tracer.enabled(INFO, self.node.name):
+                tracer.emit(INFO, self.node.name, f"[Bob] Encryption Key: Valid, {self.key_bits} bits")
         else:
-            self.encryption_key = "Discarded"
-            self.node.ports["classical_out"].tx_output("DISCARD")
-            print("[Bob] Encryption Key: Discarded")
+            self.encryption_key = None
+            self.key_bits = 0
+            self.send("DISCARD")
+            if tracer.enabled(INFO, self.node.name):
+                tracer.emit(INFO, self.node.name, "[Bob] Encryption Key: Discarded")
+
+        if self.key_sink is not None:
+            self.key_sink(KeyBlock(self.block_index, self.encryption_key, self.key_bits, self.qber,
+                                   self.encryption_key is None, ns.sim_time(), time.perf_counter()))
+        return True
+
+    def reconcile(self, bits):
+        # Drive Cascade over the classical channel, one message pair per batch of parities
+        seed = int(self.rng.integers(1 << 32))
+        reconciliation = cascade(bits, self.qber, self.cascade_passes, self.cascade_block_size, seed)
+        try:
+            queries = next(reconciliation)
+            while True:
+                self.send(encode_queries(seed, self.cascade_passes, queries))
+                answer = yield from self.receive()
+                queries = reconciliation.send([int(parity) for parity in answer.partition("|")[2]])
+        except StopIteration as done:
+            self.reconciliation_stats = done.value
+        if tracer.enabled(INFO, self.node.name):
+            stats = self.reconciliation_stats
+            tracer.emit(INFO, self.node.name, f"[Bob] Cascade corrected {stats['corrected']} bits in {stats['round_trips']} round trips, "
+                                              f"leaked {stats['leaked_bits']} bits, efficiency {stats['efficiency']:.3f}")
+        return self.reconciliation_stats["bits"]
+
+    def receive_stop_and_wait(self):
+        port = self.node.ports[self.port_names["quantum_in"]]
+        for i in range(self.num_bits):
+            with self.profiler.phase("qubit_wait"):
+                message = yield from self.await_qubits(port)
+            time.sleep(0)
+            qubit = message.items[0] if message is not None and message.items else None
+            self.measure_qubit(qubit, i)
+
+            # Send acknowledgment to Alice
+            with self.profiler.phase("ack"):
+                self.send(f"ACK_{i + 1}")
+            if tracer.enabled(DEBUG, self.node.name):
+                tracer.emit(DEBUG, self.node.name, f"[Bob] Sent ACK_{i + 1}")
+        return True
+
+    def await_qubits(self, port):
+        # Next message on the quantum port, or None once qubit_timeout ns passed without one
+        if self.qubit_timeout is None:
+            yield self.await_port_input(port)
+        else:
+            yield self.await_port_input(port) | self.await_timer(self.qubit_timeout)
+        self.events += 1
+        return port.rx_input()
+
+    def receive_windowed(self):
+        # Frames of up to `window` qubits, tagged with the index of their first qubit.
+        # Every frame is answered with a cumulative ACK and a bitmap of received qubits.
+        port = self.node.ports[self.port_names["quantum_in"]]
+        expected = 0
+        while expected < self.num_bits:
+            with self.profiler.phase("qubit_wait"):
+                message = yield from self.await_qubits(port)
+            # No message: the whole frame was lost, Alice sends the next one only after our ACK
+            seq = expected if message is None else message.meta.get("seq")
+            if seq != expected:
+                if tracer.enabled(ERROR, self.node.name):
+                    tracer.emit(ERROR, self.node.name, f"[Bob] Error: Expected frame starting at qubit {expected + 1}, got {seq}")
+                self.send(f"NACK_{expected}")
+                return False
+
+            count = min(self.window, self.num_bits - expected)
+            qubits = list(message.items)[:count] if message is not None else []
+            qubits += [None] * (count - len(qubits))
+            bitmap = "".join("1" if self.measure_qubit(qubit, expected + offset) else "0"
+                             for offset, qubit in enumerate(qubits))
+
+            expected += count
+            with self.profiler.phase("ack"):
+                self.send(f"ACK_{expected}|{bitmap}")
+            if tracer.enabled(DEBUG, self.node.name):
+                tracer.emit(DEBUG, self.node.name, f"[Bob] Sent ACK_{expected}")
+        return True
 
 
     def display_matrix(self):
-        # Create a NumPy array for visualization
-        matrix = np.array([list(range(1, self.num_bits + 1)), self.bases, self.raw_bits], dtype=object)
+        # Print the block row by row straight from the arrays
         print("\n--- Bob's Measurement Matrix ---")
         print("Bit #   Basis   Bit")
-        print(matrix.T)  # Transpose for vertical alignment
+        for i, (basis, bit) in enumerate(zip(BASIS_LETTERS[self.bases], self.raw_bits), start=1):
+            print(f"{i:>5}   {basis:>5}   {bit:>3}")
+
+    def export_matrix(self, path, append=False):
+        # Compact (block, qubit, basis, bit) records, append=True streams block after block
+        # into one file that postprocessing.load_matrix memory-maps
+        write_matrix(path, measurement_matrix(self.bases, self.raw_bits, self.block_index), append)
@@ -0,0 +1,91 @@
+import struct
+import numpy as np
+from postprocessing import LOST, X_BASIS, bases_array
+
+# Binary format of the classical sifting messages exchanged by Alice and Bob.
+# Every message starts with a header: codec version, message type, number of qubits.
+CODEC_VERSION = 1
+BASES_MESSAGE = 1
+SIFTING_MESSAGE = 2
+
+_HEADER = struct.Struct("<BBI")
+_LOST_FLAG = 0x01
+
+
+def _header(message_type, data):
+    version, found_type, num_bits = _HEADER.unpack_from(data)
+    if version != CODEC_VERSION:
+        raise ValueError(f"Unsupported codec version {version}, expected {CODEC_VERSION}.")
+    if found_type != message_type:
+        raise ValueError(f"Expected message type {message_type}, got {found_type}.")
+    return num_bits, _HEADER.size
+
+
+def _take_bits(data, offset, count):
+    # Unpack `count` bits starting at byte `offset`, returns the bits and the next offset
+    length = (count + 7) // 8
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8, count=length, offset=offset), count=count)
+    return bits, offset + length
+
+
+def _bitmap(indices, num_bits):
+    mask = np.zeros(num_bits, dtype=np.uint8)
+    mask[np.asarray(indices, dtype=np.int64)] = 1
+    return mask
+
+
+def encode_bases(bases):
+    # Bob's bases, one bit per qubit (0 = Z, 1 = X), plus a bitmap of received
+    # qubits when some were lost.
+    bases = bases_array(bases)
+    num_bits = len(bases)
+    x_basis = (bases == X_BASIS).astype(np.uint8)
+    lost = (bases == LOST).astype(np.uint8)
+    flags = _LOST_FLAG if lost.any() else 0
+
+    parts = [_HEADER.pack(CODEC_VERSION, BASES_MESSAGE, num_bits), bytes([flags]), np.packbits(x_basis).tobytes()]
+    if flags & _LOST_FLAG:
+        parts.append(np.packbits(1 - lost).tobytes())
+    return b"".join(parts)
+
+
+def decode_bases(data):
+    num_bits, offset = _header(BASES_MESSAGE, data)
+    flags = data[offset]
+    # Bases as a uint8 array in the postprocessing encoding
+    x_basis, offset = _take_bits(data, offset + 1, num_bits)
+    bases = x_basis.copy()
+    if flags & _LOST_FLAG:
+        received, offset = _take_bits(data, offset, num_bits)
+        bases[received == 0] = LOST
+    return bases
+
+
+def encode_sifting(num_bits, sifted_basis, random_selection, selection_bits):
+    # Alice's answer: bitmap of the kept sifted positions, bitmap of the QBER sample
+    # positions and the sample bits in ascending position order.
+    order = np.argsort(np.asarray(random_selection, dtype=np.int64), kind="stable")
+    bits = np.asarray([int(bit) for bit in selection_bits], dtype=np.uint8)[order]
+    return b"".join([
+        _HEADER.pack(CODEC_VERSION, SIFTING_MESSAGE, num_bits),
+        np.packbits(_bitmap(sifted_basis, num_bits)).tobytes(),
+        np.packbits(_bitmap(random_selection, num_bits)).tobytes(),
+        np.packbits(bits).tobytes(),
+    ])
+
+
+def decode_sifting(data):
+    # Returns the sifted positions, the sample positions (ascending) and the sample bits as a '0'/'1' string
+    num_bits, offset = _header(SIFTING_MESSAGE, data)
+    sifted, offset = _take_bits(data, offset, num_bits)
+    selection, offset = _take_bits(data, offset, num_bits)
+    random_selection = np.flatnonzero(selection)
+    bits, offset = _take_bits(data, offset, len(random_selection))
+    return np.flatnonzero(sifted).tolist(), random_selection.tolist(), (bits + ord("0")).tobytes().decode()
+
+
+def message_size(message):
+    # Bytes a classical message occupies on the channel
+    if isinstance(message, (bytes, bytearray)):
+        return len(message)
+    return len(str(message).encode())
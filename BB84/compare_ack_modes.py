@@ -0,0 +1,32 @@
+import netsquid as ns
+from Alice import *
+from Bob import *
+from network_set_up import *
+from tracing import OFF, tracer
+
+
+def run_mode(key_length, window, length=1e3):
+    # One protocol run over delayed fibres of `length` km, returns simulated time and event counts
+    ns.sim_reset()
+    alice, bob = network_setup(fibre_delay=True, length=length)
+    alice_protocol = AliceProtocol(alice, key_length, window=window)
+    bob_protocol = BobProtocol(bob, key_length, dp_rate=0, window=window)
+
+    alice_protocol.start()
+    bob_protocol.start()
+    ns.sim_run()
+
+    key_bits = bob_protocol.key_bits
+    events = alice_protocol.events + bob_protocol.events + alice_protocol.messages_sent + bob_protocol.messages_sent
+    return ns.sim_time(), events, key_bits
+
+
+if __name__ == '__main__':
+    tracer.configure(level=OFF)
+    key_length = 256
+    print(f"{'mode':>16} {'sim time (us)':>14} {'ns / key bit':>13} {'events':>8} {'events / key bit':>17}")
+    for window in [1, 8, 32, 128]:
+        sim_time, events, key_bits = run_mode(key_length, window)
+        mode = "stop-and-wait" if window == 1 else f"window W={window}"
+        per_bit = key_bits or float("nan")
+        print(f"{mode:>16} {sim_time / 1e3:>14.1f} {sim_time / per_bit:>13.1f} {events:>8} {events / per_bit:>17.2f}")
@@ -0,0 +1,246 @@
+import argparse
+import asyncio
+import base64
+import concurrent.futures
+import json
+import uuid
+from urllib.parse import parse_qs, urlsplit
+
+# Local key delivery in the style of ETSI GS QKD 014. One process plays both key
+# management entities: the master SAE (Alice's application) fetches new keys from
+# enc_keys, the slave SAE (Bob's application) fetches the same keys by key_ID from
+# dec_keys. Keys are cut from a pool of key material that the BB84 protocols keep
+# filling in the background, Alice's copy for enc_keys and Bob's for dec_keys.
+#
+#   GET  /api/v1/keys/<slave SAE>/status
+#   GET  /api/v1/keys/<slave SAE>/enc_keys?number=1&size=256    (POST: {"number": 1, "size": 256})
+#   GET  /api/v1/keys/<master SAE>/dec_keys?key_ID=<id>         (POST: {"key_IDs": [{"key_ID": <id>}]})
+#
+# Plain HTTP/1.1 with keep-alive over TCP or a Unix socket, standard library only.
+
+KEY_SIZE = 256
+MIN_KEY_SIZE = 64
+MAX_KEY_SIZE = 8192
+MAX_KEYS_PER_REQUEST = 128
+REASONS = {200: "OK", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found", 503: "Service Unavailable"}
+
+
+class KeyPool:
+    """Key material agreed by both ends, handed out once under a key ID.
+
+    Both copies are consumed at the same offsets, so a key_ID always names the
+    same bits at Alice and Bob. capacity bounds the stored bytes; producers wait
+    on `space` before adding more.
+    """
+
+    def __init__(self, capacity=1 << 20):
+        self.capacity = capacity
+        self.alice = bytearray()
+        self.bob = bytearray()
+        self.offset = 0
+        # key ID -> Bob's copy, until the slave SAE asks for it
+        self.issued = {}
+        self.added = asyncio.Event()
+        self.space = asyncio.Event()
+        self.space.set()
+
+    def stored(self):
+        return len(self.alice) - self.offset
+
+    def add(self, alice_key, bob_key):
+        # Whole bytes of one agreed block from each side
+        length = min(len(alice_key), len(bob_key))
+        self.alice += alice_key[:length]
+        self.bob += bob_key[:length]
+        self.added.set()
+        if self.stored() >= self.capacity:
+            self.space.clear()
+
+    async def wait_for(self, size, timeout):
+        # True once `size` bytes are stored, False after timeout seconds
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while self.stored() < size:
+            self.added.clear()
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                return False
+            try:
+                await asyncio.wait_for(self.added.wait(), remaining)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    def take(self, size):
+        # Next key of `size` bytes as (key_ID, Alice's copy)
+        start, self.offset = self.offset, self.offset + size
+        key_id = str(uuid.uuid4())
+        self.issued[key_id] = bytes(self.bob[start:self.offset])
+        alice_key = bytes(self.alice[start:self.offset])
+        if self.offset > len(self.alice) // 2:
+            # Drop the consumed head once it is the larger part, amortized O(1) per byte
+            del self.alice[:self.offset]
+            del self.bob[:self.offset]
+            self.offset = 0
+        if self.stored() < self.capacity:
+            self.space.set()
+        return key_id, alice_key
+
+    def redeem(self, key_id):
+        # Bob's copy of an issued key, None if unknown or already redeemed
+        return self.issued.pop(key_id, None)
+
+
+async def fill_from_stream(pool, stream, seed=None):
+    """Feed `pool` with the agreed blocks of a key_stream.KeyStream until it ends.
+
+    The simulation runs on its own thread, one block per call, so the event loop
+    keeps serving requests while keys are generated.
+    """
+    loop = asyncio.get_running_loop()
+    blocks = stream.stream(seed)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as simulator:
+        while True:
+            await pool.space.wait()
+            pair = await loop.run_in_executor(simulator, next, blocks, None)
+            if pair is None:
+                return
+            alice_block, bob_block = pair
+            if not (alice_block.discarded or bob_block.discarded):
+                pool.add(alice_block.key[:alice_block.key_bits // 8], bob_block.key[:bob_block.key_bits // 8])
+
+
+class KeyServer:
+    def __init__(self, pool, master_sae="SAE_A", slave_sae="SAE_B", key_size=KEY_SIZE, timeout=1.0):
+        self.pool = pool
+        self.master_sae = master_sae
+        self.slave_sae = slave_sae
+        self.key_size = key_size
+        # Seconds a request may wait for key material before 503
+        self.timeout = timeout
+
+    async def handle(self, reader, writer):
+        # One connection, any number of keep-alive requests
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line.strip():
+                    break
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                status, payload = await self.dispatch(method, target, body)
+                data = json.dumps(payload).encode()
+                writer.write(f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n"
+                             f"Content-Length: {len(data)}\r\n\r\n".encode() + data)
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, target, body):
+        url = urlsplit(target)
+        parts = url.path.strip("/").split("/")
+        if len(parts) != 5 or parts[:3] != ["api", "v1", "keys"] or method not in ("GET", "POST"):
+            return 404, {"message": f"No route for {method} {url.path}"}
+        sae, endpoint = parts[3], parts[4]
+        query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        try:
+            request = json.loads(body) if method == "POST" and body else {}
+        except json.JSONDecodeError:
+            return 400, {"message": "Request body is not valid JSON"}
+
+        if endpoint in ("status", "enc_keys") and sae != self.slave_sae:
+            return 401, {"message": f"Unknown slave SAE {sae}"}
+        if endpoint == "dec_keys" and sae != self.master_sae:
+            return 401, {"message": f"Unknown master SAE {sae}"}
+        if endpoint == "status":
+            return 200, self.status()
+        if endpoint == "enc_keys":
+            try:
+                number = int(request.get("number", query.get("number", 1)))
+                size = int(request.get("size", query.get("size", self.key_size)))
+            except (TypeError, ValueError):
+                return 400, {"message": "number and size must be integers"}
+            return await self.enc_keys(number, size)
+        if endpoint == "dec_keys":
+            key_ids = [entry["key_ID"] for entry in request.get("key_IDs", [])] or [query.get("key_ID")]
+            return self.dec_keys(key_ids)
+        return 404, {"message": f"Unknown endpoint {endpoint}"}
+
+    def status(self):
+        return {"source_KME_ID": "KME_A", "target_KME_ID": "KME_B", "master_SAE_ID": self.master_sae,
+                "slave_SAE_ID": self.slave_sae, "key_size": self.key_size,
+                "stored_key_count": self.pool.stored() * 8 // self.key_size,
+                "max_key_count": self.pool.capacity * 8 // self.key_size, "max_key_per_request": MAX_KEYS_PER_REQUEST,
+                "max_key_size": MAX_KEY_SIZE, "min_key_size": MIN_KEY_SIZE, "max_SAE_ID_count": 0}
+
+    async def enc_keys(self, number, size):
+        if not 1 <= number <= MAX_KEYS_PER_REQUEST or not MIN_KEY_SIZE <= size <= MAX_KEY_SIZE or size % 8:
+            return 400, {"message": f"number must be 1..{MAX_KEYS_PER_REQUEST}, size a multiple of 8 "
+                                    f"in {MIN_KEY_SIZE}..{MAX_KEY_SIZE}"}
+        if not await self.pool.wait_for(number * size // 8, self.timeout):
+            return 503, {"message": "Not enough key material, try again later"}
+        keys = []
+        for _ in range(number):
+            key_id, key = self.pool.take(size // 8)
+            keys.append({"key_ID": key_id, "key": base64.b64encode(key).decode()})
+        return 200, {"keys": keys}
+
+    def dec_keys(self, key_ids):
+        keys = []
+        for key_id in key_ids:
+            key = self.pool.redeem(key_id) if key_id else None
+            if key is None:
+                # Keys redeemed before the failing one stay consumed, as they were handed out
+                return 400, {"message": f"key_ID {key_id} not found"}
+            keys.append({"key_ID": key_id, "key": base64.b64encode(key).decode()})
+        return 200, {"keys": keys}
+
+
+async def serve(server, host="127.0.0.1", port=8014, unix_path=None):
+    # asyncio server for a KeyServer, on a Unix socket if unix_path is given
+    if unix_path is not None:
+        return await asyncio.start_unix_server(server.handle, path=unix_path)
+    return await asyncio.start_server(server.handle, host, port)
+
+
+async def main(args):
+    from key_stream import KeyStream
+    from tracing import OFF, tracer
+
+    # The stream runs blocks forever, per-block protocol records only on request
+    if not args.trace:
+        tracer.configure(level=OFF)
+    pool = KeyPool(capacity=args.capacity)
+    server = KeyServer(pool, key_size=args.size)
+    listener = await serve(server, args.host, args.port, args.unix)
+    stream = KeyStream(encryption_key_length=args.key, dp_rate=args.dp_rate, blocks=None, report_every=0,
+                       reconciliation="cascade", privacy_amplification=True)
+    address = args.unix or f"http://{args.host}:{args.port}"
+    print(f"Serving keys on {address}, master SAE {server.master_sae}, slave SAE {server.slave_sae}")
+    async with listener:
+        await asyncio.gather(listener.serve_forever(), fill_from_stream(pool, stream, args.seed))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="ETSI GS QKD 014 style key delivery backed by BB84")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8014)
+    parser.add_argument("--unix", default=None, help="serve on this Unix socket path instead of TCP")
+    parser.add_argument("--key", type=int, default=1024, help="key length of each BB84 block")
+    parser.add_argument("--dp-rate", type=float, default=0.02)
+    parser.add_argument("--size", type=int, default=KEY_SIZE, help="default key size in bits")
+    parser.add_argument("--capacity", type=int, default=1 << 20, help="bytes of key material to keep ready")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--trace", action="store_true", help="keep the protocols' INFO records on stdout")
+    asyncio.run(main(parser.parse_args()))
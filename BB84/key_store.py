@@ -0,0 +1,185 @@
+import contextlib
+import fcntl
+import mmap
+import os
+import threading
+import time
+import numpy as np
+
+# Append-only key store on disk.
+#
+# <path>.keys holds the packed key material back to back, <path>.idx one
+# INDEX_DTYPE record per key: where its bytes are, how many bits it holds, when
+# it was stored and whether it was consumed. The key ID is the record number.
+# Data is written before its index record, so a crash never leaves a record
+# pointing at missing bytes; a torn last record is dropped on open. Both files are
+# memory-mapped: reads return memoryview slices of the data map without copying,
+# and consumption flips the flag in the shared index map while holding an
+# exclusive lock on <path>.lock, so no key is handed out twice, even across
+# processes.
+
+INDEX_DTYPE = np.dtype([("offset", "<u8"), ("length", "<u4"), ("bits", "<u4"), ("created", "<f8"), ("consumed", "u1")])
+
+
+class KeyStore:
+    """Persistent, consumption-tracked store of packed keys."""
+
+    def __init__(self, path, durable=False):
+        self.path = path
+        # fsync after every append, slower but survives power loss
+        self.durable = durable
+        self.data_file = open(f"{path}.keys", "ab+")
+        self.index_file = open(f"{path}.idx", "ab+")
+        self.lock_file = open(f"{path}.lock", "ab+")
+        self.thread_lock = threading.Lock()
+        self.data_map = None
+        self.data = memoryview(b"")
+        self._map_index(0)
+        # Keys below this ID are all consumed
+        self.cursor = 0
+        with self.locked():
+            # Drop a record torn by a crash during append
+            size = os.fstat(self.index_file.fileno()).st_size
+            if size % INDEX_DTYPE.itemsize:
+                os.truncate(self.index_file.fileno(), size - size % INDEX_DTYPE.itemsize)
+            self._refresh()
+
+    @contextlib.contextmanager
+    def locked(self):
+        # Exclusive against other threads and, through flock, other processes
+        with self.thread_lock:
+            fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _map_index(self, count):
+        self.index = np.memmap(self.index_file, dtype=INDEX_DTYPE, mode="r+", shape=(count,)) if count else \
+            np.zeros(0, dtype=INDEX_DTYPE)
+        # Plain ndarray views of the fields, indexing a memmap subclass is several times slower.
+        # consumed is shared with every process that maps the index
+        self.offsets = np.asarray(self.index["offset"])
+        self.lengths = np.asarray(self.index["length"])
+        self.consumed = np.asarray(self.index["consumed"])
+
+    def _refresh(self):
+        # Map records and data appended since the last call, by us or another process
+        count = os.fstat(self.index_file.fileno()).st_size // INDEX_DTYPE.itemsize
+        if count != len(self.index):
+            self._map_index(count)
+        size = os.fstat(self.data_file.fileno()).st_size
+        if size and (self.data_map is None or len(self.data_map) < size):
+            # Earlier maps stay alive as long as views into them do
+            self.data_map = mmap.mmap(self.data_file.fileno(), size, access=mmap.ACCESS_READ)
+            self.data = memoryview(self.data_map)
+
+    def __len__(self):
+        return os.fstat(self.index_file.fileno()).st_size // INDEX_DTYPE.itemsize
+
+    def available(self):
+        # Number of keys not consumed yet
+        with self.locked():
+            self._refresh()
+            return int(len(self.consumed) - np.count_nonzero(self.consumed))
+
+    def append(self, key, bits=None):
+        """Store one packed key, returns its key ID."""
+        return self.extend([key], None if bits is None else [bits])[0]
+
+    def extend(self, keys, bits=None):
+        """Store many packed keys with one write per file, returns their key IDs.
+
+        bits gives the key lengths in bits, by default 8 per byte.
+        """
+        keys = [memoryview(key).cast("B") for key in keys]
+        lengths = np.array([len(key) for key in keys], dtype=np.uint64)
+        records = np.zeros(len(keys), dtype=INDEX_DTYPE)
+        records["length"] = lengths
+        records["bits"] = 8 * lengths if bits is None else bits
+        records["created"] = time.time()
+        with self.locked():
+            first = len(self)
+            offset = os.fstat(self.data_file.fileno()).st_size
+            records["offset"] = offset + np.cumsum(lengths) - lengths
+            self._write(self.data_file, b"".join(keys))
+            self._write(self.index_file, records.tobytes())
+        return list(range(first, first + len(keys)))
+
+    def _write(self, file, data):
+        file.write(data)
+        file.flush()
+        if self.durable:
+            os.fsync(file.fileno())
+
+    def sink(self, block):
+        # Protocol key_sink: keep every agreed KeyBlock
+        if not block.discarded:
+            self.append(block.key, block.key_bits)
+
+    def _view(self, key_id):
+        offset = int(self.offsets[key_id])
+        return self.data[offset:offset + int(self.lengths[key_id])]
+
+    def _check(self, key_id):
+        # Map newer records if key_id is beyond the ones we know
+        if not 0 <= key_id < len(self.offsets):
+            self._refresh()
+            if not 0 <= key_id < len(self.offsets):
+                raise KeyError(f"Unknown key ID {key_id}")
+
+    def read(self, key_id):
+        # Zero-copy view of a key, consumed or not, without consuming it. Stored keys
+        # never change, so no lock is needed unless the index must be remapped
+        if not 0 <= key_id < len(self.offsets):
+            with self.locked():
+                self._check(key_id)
+        return self._view(key_id)
+
+    def consume(self, key_id):
+        """Zero-copy view of key `key_id`, marked consumed; raises ValueError if it already was."""
+        with self.locked():
+            self._check(key_id)
+            if self.consumed[key_id]:
+                raise ValueError(f"Key {key_id} was already consumed")
+            self.consumed[key_id] = 1
+            return self._view(key_id)
+
+    def consume_next(self, count=1):
+        """The next `count` unconsumed keys as [(key ID, view), ...], marked consumed.
+
+        Returns fewer keys if the store runs out.
+        """
+        with self.locked():
+            if self.cursor + count > len(self.consumed):
+                self._refresh()
+            consumed = self.consumed
+            # Scan forward in growing windows instead of over the whole tail every call
+            free = []
+            window = max(2 * count, 64)
+            while count > len(free) and self.cursor < len(consumed):
+                found = np.flatnonzero(consumed[self.cursor:self.cursor + window] == 0)[:count - len(free)]
+                free.extend((found + self.cursor).tolist())
+                self.cursor = free[-1] + 1 if len(free) == count else min(self.cursor + window, len(consumed))
+                window *= 2
+            consumed[free] = 1
+            return [(key_id, self._view(key_id)) for key_id in free]
+
+    def flush(self):
+        # Write the consumed flags through to disk
+        if isinstance(self.index, np.memmap):
+            self.index.flush()
+
+    def close(self):
+        self.flush()
+        self._map_index(0)
+        self.data_map = None
+        self.data = memoryview(b"")
+        for file in (self.data_file, self.index_file, self.lock_file):
+            file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,96 @@
+import collections
+import os
+import sys
+import time
+import netsquid as ns
+from network_set_up import BB84Network
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+from tracing import INFO, tracer
+
+
+class KeyRateMeter:
+    """Live key throughput of a stream of KeyBlocks.
+
+    Can be used directly as a protocol key_sink.
+    """
+
+    def __init__(self, report_every=10, node="KeyRateMeter"):
+        self.report_every = report_every
+        self.node = node
+        self.blocks = 0
+        self.discarded = 0
+        self.secret_bits = 0
+        self.start_wall_time = time.perf_counter()
+        self.start_sim_time = ns.sim_time()
+        self.last_block = None
+
+    def __call__(self, block):
+        self.blocks += 1
+        self.last_block = block
+        if block.discarded:
+            self.discarded += 1
+        else:
+            self.secret_bits += block.key_bits
+        if self.report_every and self.blocks % self.report_every == 0 and tracer.enabled(INFO, self.node):
+            rates = self.rates()
+            tracer.emit(INFO, self.node, f"[Key rate] {self.blocks} blocks, {rates['bits_per_sim_second']:.1f} bit/s simulated, "
+                                         f"{rates['bits_per_wall_second']:.1f} bit/s wall clock, discard ratio {rates['discard_ratio']:.2%}")
+
+    def rates(self):
+        sim_seconds = ((self.last_block.sim_time if self.last_block else ns.sim_time()) - self.start_sim_time) * 1e-9
+        wall_seconds = (self.last_block.wall_time if self.last_block else time.perf_counter()) - self.start_wall_time
+        return {
+            "blocks": self.blocks,
+            "secret_bits": self.secret_bits,
+            "bits_per_sim_second": self.secret_bits / sim_seconds if sim_seconds > 0 else float("nan"),
+            "bits_per_wall_second": self.secret_bits / wall_seconds if wall_seconds > 0 else float("nan"),
+            "discard_ratio": self.discarded / self.blocks if self.blocks else 0.0,
+        }
+
+
+class KeyStream:
+    """Continuous BB84 key generation as a generator of (alice_block, bob_block) pairs.
+
+    The simulation is paused after every block, so each pair is handed out as
+    soon as both sides know whether the block was agreed or discarded.
+    """
+
+    def __init__(self, encryption_key_length=256, dp_rate=0, fibre_delay=True, blocks=None, report_every=10, **protocol_options):
+        self.network = BB84Network(encryption_key_length, dp_rate=dp_rate, fibre_delay=fibre_delay,
+                                   blocks=blocks, **protocol_options)
+        self.alice_blocks = collections.deque()
+        self.bob_blocks = collections.deque()
+        self.network.alice_protocol.key_sink = self._alice_sink
+        self.network.bob_protocol.key_sink = self.bob_blocks.append
+        self.report_every = report_every
+        self.meter = None
+
+    def _alice_sink(self, block):
+        # Alice is the last to learn Bob's verdict, stop the simulation there
+        self.alice_blocks.append(block)
+        ns.sim_stop()
+
+    def __iter__(self):
+        return self.stream()
+
+    def stream(self, seed=None):
+        self.network.reset(seed=seed)
+        self.meter = KeyRateMeter(self.report_every)
+        while True:
+            ns.sim_run()
+            if not self.alice_blocks:
+                # The protocols finished or failed, nothing more will come
+                return
+            while self.alice_blocks and self.bob_blocks:
+                alice_block, bob_block = self.alice_blocks.popleft(), self.bob_blocks.popleft()
+                self.meter(bob_block)
+                yield alice_block, bob_block
+
+
+if __name__ == '__main__':
+    tracer.configure(level=INFO, nodes=["KeyRateMeter"])
+    stream = KeyStream(encryption_key_length=256, dp_rate=0.15, blocks=50, report_every=10)
+    for alice_block, bob_block in stream:
+        pass
+    print(stream.meter.rates())
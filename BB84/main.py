@@ -5,8 +5,13 @@ from textwrap import wrap
 from Alice import *
 from Bob import *
 from network_set_up import *
+from postprocessing import key_to_string
+from tracing import DEBUG, tracer
 
 if __name__ == '__main__':
+    # Trace every qubit, as the protocols used to print
+    tracer.configure(level=DEBUG)
+
     # Run protocols
     alice, bob = network_setup()
     key_length = 64
@@ -22,5 +27,8 @@ if __name__ == '__main__':
     alice_protocol.display_matrix()
     bob_protocol.display_matrix()
     print("\n--- Sifted Key ---")
-    print(f"Alice's Encryption Key: {alice_protocol.encryption_key}")
-    print(f"Bob's Encryption Key: {bob_protocol.encryption_key}")
\ No newline at end of file
+    for name, protocol in [("Alice", alice_protocol), ("Bob", bob_protocol)]:
+        key = key_to_string(protocol.encryption_key, protocol.key_bits) if protocol.encryption_key is not None else "Discarded"
+        print(f"{name}'s Encryption Key: {key}")
+    print("\n--- Classical Channel Usage ---")
+    print(f"Alice sent {alice_protocol.bytes_sent} bytes, Bob sent {bob_protocol.bytes_sent} bytes")
\ No newline at end of file
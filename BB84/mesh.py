@@ -0,0 +1,211 @@
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import netsquid as ns
+from netsquid.components import QuantumChannel, ClassicalChannel
+from netsquid.components.models.delaymodels import FibreDelayModel
+from netsquid.nodes import Node, Network
+from Alice import AliceProtocol
+from Bob import BobProtocol
+from relay import random_links, shortest_path, xor_relay
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+from tracing import INFO, OFF, tracer
+
+# A mesh of BB84 links in one simulation. Link k = (a, b) runs an AliceProtocol on
+# node a and a BobProtocol on node b over the ports quantum_out_k / quantum_in_k and
+# classical_in_k / classical_out_k, so a node takes part in as many sessions as it
+# has links. Agreed key blocks fill a key pool per link; end-to-end keys are then
+# relayed hop by hop through trusted nodes by publishing XORs of adjacent link keys.
+
+
+def mesh_setup(num_nodes, links, fibre_delay=False, length=1e3):
+    # Nodes Node_0 .. Node_<n-1>, one quantum and two classical channels per link, each
+    # `length` km long like the channels of network_set_up.network_setup
+    ports = [[] for _ in range(num_nodes)]
+    for k, (a, b) in enumerate(links):
+        ports[a] += [f"quantum_out_{k}", f"classical_in_{k}", f"classical_out_{k}"]
+        ports[b] += [f"quantum_in_{k}", f"classical_in_{k}", f"classical_out_{k}"]
+    network = Network("BB84Mesh")
+    nodes = [Node(f"Node_{i}", port_names=ports[i]) for i in range(num_nodes)]
+    network.add_nodes(nodes)
+
+    models = {"delay_model": FibreDelayModel()} if fibre_delay else None
+    for k, (a, b) in enumerate(links):
+        network.add_connection(nodes[a], nodes[b], channel_to=QuantumChannel(f"QuantumChannel_{k}", length=length, models=models),
+                               port_name_node1=f"quantum_out_{k}", port_name_node2=f"quantum_in_{k}", label=f"quantum_{k}")
+        network.add_connection(nodes[a], nodes[b], channel_to=ClassicalChannel(f"ClassicalChannelToBob_{k}", length=length, models=models),
+                               port_name_node1=f"classical_out_{k}", port_name_node2=f"classical_in_{k}", label=f"classical_ab_{k}")
+        network.add_connection(nodes[b], nodes[a], channel_to=ClassicalChannel(f"ClassicalChannelToAlice_{k}", length=length, models=models),
+                               port_name_node1=f"classical_out_{k}", port_name_node2=f"classical_in_{k}", label=f"classical_ba_{k}")
+    return nodes
+
+
+class LinkKeyPool:
+    """Agreed key bits of one link, as held by each of its two endpoints."""
+
+    def __init__(self):
+        self.blocks = {"alice": [], "bob": []}
+        self.discarded = 0
+        self.offset = 0
+        self.bits = None
+        self.last_sim_time = 0
+
+    def sink(self, side):
+        # key_sink for the protocol on `side`
+        def collect(block):
+            if block.discarded:
+                if side == "bob":
+                    self.discarded += 1
+            else:
+                self.blocks[side].append(np.unpackbits(np.frombuffer(block.key, dtype=np.uint8), count=block.key_bits))
+            self.last_sim_time = max(self.last_sim_time, block.sim_time)
+        return collect
+
+    def key_bits(self):
+        # Bits agreed by both sides, block by block
+        return sum(min(len(a), len(b)) for a, b in zip(self.blocks["alice"], self.blocks["bob"]))
+
+    def available(self):
+        return self.key_bits() - self.offset
+
+    def consume(self, count):
+        # The next `count` bits as {"alice": bits, "bob": bits}, both sides use the same positions
+        if self.bits is None:
+            lengths = [min(len(a), len(b)) for a, b in zip(self.blocks["alice"], self.blocks["bob"])]
+            self.bits = {side: np.concatenate([np.zeros(0, dtype=np.uint8)] +
+                                              [bits[:length] for bits, length in zip(blocks, lengths)])
+                         for side, blocks in self.blocks.items()}
+        bits = {side: bits[self.offset:self.offset + count] for side, bits in self.bits.items()}
+        self.offset += count
+        return bits
+
+
+class BB84Mesh:
+    """num_nodes nodes and one BB84 session per link, all in one NetSquid simulation."""
+
+    def __init__(self, num_nodes, links, encryption_key_length=32, dp_rate=0, blocks=1, fibre_delay=False,
+                 length=1e3, **protocol_options):
+        self.num_nodes = num_nodes
+        self.links = list(links)
+        self.encryption_key_length = encryption_key_length
+        self.nodes = mesh_setup(num_nodes, self.links, fibre_delay=fibre_delay, length=length)
+        self.sessions = []
+        for k, (a, b) in enumerate(self.links):
+            ports = {name: f"{name}_{k}" for name in ("classical_in", "classical_out")}
+            alice_protocol = AliceProtocol(self.nodes[a], encryption_key_length, blocks=blocks,
+                                           ports=dict(ports, quantum_out=f"quantum_out_{k}"), **protocol_options)
+            bob_protocol = BobProtocol(self.nodes[b], encryption_key_length, dp_rate=dp_rate, blocks=blocks,
+                                       ports=dict(ports, quantum_in=f"quantum_in_{k}"), **protocol_options)
+            self.sessions.append((alice_protocol, bob_protocol))
+        self.pools = []
+        self.sim_seconds = 0.0
+        self.wall_seconds = 0.0
+
+    def run(self, seed=None):
+        # Run every session to completion, the link keys end up in self.pools
+        ns.sim_reset()
+        # One generator per protocol, independent across links
+        rngs = [None] * (2 * len(self.links))
+        if seed is not None:
+            rngs = np.random.SeedSequence(seed).spawn(2 * len(self.links))
+            ns.set_random_state(seed=seed)
+        self.pools = [LinkKeyPool() for _ in self.links]
+        for k, (pool, (alice_protocol, bob_protocol)) in enumerate(zip(self.pools, self.sessions)):
+            alice_protocol.key_sink = pool.sink("alice")
+            bob_protocol.key_sink = pool.sink("bob")
+            alice_protocol.reset(rng=rngs[2 * k])
+            bob_protocol.reset(rng=rngs[2 * k + 1])
+        start = time.perf_counter()
+        ns.sim_run()
+        self.wall_seconds = time.perf_counter() - start
+        self.sim_seconds = ns.sim_time() * 1e-9
+        if tracer.enabled(INFO, "Mesh"):
+            tracer.emit(INFO, "Mesh", f"{len(self.links)} links done in {self.wall_seconds:.3f} s wall clock")
+
+    def link_report(self):
+        # Per-link secret bits, discard ratio and key rate over the link's own session time
+        rows = []
+        for k, ((a, b), pool) in enumerate(zip(self.links, self.pools)):
+            blocks = len(pool.blocks["bob"]) + pool.discarded
+            seconds = pool.last_sim_time * 1e-9
+            rows.append({"link": k, "nodes": (a, b), "key_bits": pool.key_bits(),
+                         "discard_ratio": pool.discarded / blocks if blocks else 0.0,
+                         "bits_per_sim_second": pool.key_bits() / seconds if seconds > 0 else 0.0})
+        return rows
+
+    def relay(self, demands, key_bits=None):
+        """Relay end-to-end keys of key_bits bits for every (source, destination) demand.
+
+        Demands are served round-robin, one key each, until a pool on their path
+        runs dry. Returns one row per demand with the keys delivered, hop count,
+        mismatching keys and the end-to-end rate over the simulated time.
+        """
+        key_bits = key_bits or self.encryption_key_length
+        paths = [shortest_path(self.links, source, destination) for source, destination in demands]
+        rows = [{"source": s, "destination": d, "hops": len(path) if path else None, "keys": 0, "mismatches": 0}
+                for (s, d), path in zip(demands, paths)]
+        active = [i for i, path in enumerate(paths) if path]
+        while active:
+            still_active = []
+            for i in active:
+                pools = [self.pools[k] for _, k in paths[i]]
+                if any(pool.available() < key_bits for pool in pools):
+                    continue
+                hop_keys = []
+                node = demands[i][0]
+                for (next_node, k), pool in zip(paths[i], pools):
+                    bits = pool.consume(key_bits)
+                    # The hop runs from the link's Alice to its Bob or the other way round
+                    sending = "alice" if self.links[k][0] == node else "bob"
+                    receiving = "bob" if sending == "alice" else "alice"
+                    hop_keys.append((bits[sending], bits[receiving]))
+                    node = next_node
+                source_key, destination_key, _ = xor_relay(hop_keys)
+                rows[i]["keys"] += 1
+                rows[i]["mismatches"] += int(not np.array_equal(source_key, destination_key))
+                still_active.append(i)
+            active = still_active
+        for row in rows:
+            row["bits_per_sim_second"] = row["keys"] * key_bits / self.sim_seconds if self.sim_seconds else 0.0
+        return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Many-link BB84 mesh with trusted-relay end-to-end keys")
+    parser.add_argument("--nodes", type=int, default=16)
+    parser.add_argument("--links", type=int, nargs="+", default=[15, 24, 48, 96])
+    parser.add_argument("--key", type=int, default=64)
+    parser.add_argument("--blocks", type=int, default=4, help="key blocks per link")
+    parser.add_argument("--dp-rate", type=float, default=0.02)
+    parser.add_argument("--demands", type=int, default=4, help="random end-to-end demands")
+    parser.add_argument("--fibre-delay", action="store_true")
+    parser.add_argument("--length", type=float, default=1e3, help="km per link")
+    parser.add_argument("--per-link", action="store_true", help="print every link of every mesh")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    tracer.configure(level=OFF)
+    rng = np.random.default_rng(args.seed)
+    demands = [tuple(int(node) for node in rng.choice(args.nodes, 2, replace=False)) for _ in range(args.demands)]
+    print(f"{'links':>6} {'setup s':>8} {'run s':>7} {'wall ms/link':>13} {'link bit/s':>11} {'e2e bit/s':>10} "
+          f"{'e2e keys':>9} {'mismatch':>9} {'mean hops':>10}")
+    for num_links in args.links:
+        setup_start = time.perf_counter()
+        mesh = BB84Mesh(args.nodes, random_links(args.nodes, num_links, rng), args.key, dp_rate=args.dp_rate,
+                        blocks=args.blocks, fibre_delay=args.fibre_delay, length=args.length)
+        setup_seconds = time.perf_counter() - setup_start
+        mesh.run(seed=args.seed)
+        links = mesh.link_report()
+        relayed = mesh.relay(demands)
+        hops = [row["hops"] for row in relayed if row["hops"]]
+        print(f"{num_links:>6} {setup_seconds:>8.3f} {mesh.wall_seconds:>7.3f} {1e3 * mesh.wall_seconds / num_links:>13.2f} "
+              f"{np.mean([row['bits_per_sim_second'] for row in links]):>11.4g} "
+              f"{sum(row['bits_per_sim_second'] for row in relayed):>10.4g} {sum(row['keys'] for row in relayed):>9} "
+              f"{sum(row['mismatches'] for row in relayed):>9} {np.mean(hops) if hops else 0:>10.2f}")
+        if args.per_link:
+            for row in links:
+                print(f"    link {row['link']:>3} {row['nodes']}: {row['key_bits']} bits, "
+                      f"discard {row['discard_ratio']:.2%}, {row['bits_per_sim_second']:.4g} bit/s")
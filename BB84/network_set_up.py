@@ -1,15 +1,30 @@
-
+import numpy as np
+import netsquid as ns
 from netsquid.components import QuantumChannel, ClassicalChannel
 from netsquid.components.models.qerrormodels import DepolarNoiseModel
+from netsquid.components.models.delaymodels import FibreDelayModel
+from netsquid.components.models.qerrormodels import FibreLossModel
 from netsquid.nodes import Node, Network
 from netsquid.qubits import create_qubits, measure, operate
 from netsquid.qubits.operators import H
 from textwrap import wrap
+from Alice import AliceProtocol
+from Bob import BobProtocol
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+from formalism import set_formalism, use_formalism
 
+# Gates of a BB84 run besides Z/X-basis preparation and measurement
+OPERATORS = ("X", "Z", "H")
+# Speed of light in fibre (km/s), the FibreDelayModel default
+FIBRE_LIGHT_SPEED = 2e5
 
 
-def network_setup(rate=0):
-    # Create and connect network
+def network_setup(rate=0, fibre_delay=False, length=1e3, attenuation=0, loss_init=0):
+    # Create and connect network. length is in km like every NetSquid channel; attenuation
+    # (dB/km) and loss_init (loss probability at the entrance) make the quantum channel lossy
     network = Network("BB84Network")
 
     alice = Node("Alice", port_names=["quantum_out", "classical_in", "classical_out"])
@@ -18,9 +33,14 @@ def network_setup(rate=0):
     network.add_nodes([alice, bob])
 
     # Create a quantum channel with noise
-    quantum_channel = QuantumChannel("QuantumChannel",length=1e3)
-    classical_channel_to_alice = ClassicalChannel("ClassicalChannelToAlice", length=1e3)
-    classical_channel_to_bob = ClassicalChannel("ClassicalChannelToBob", length=1e3)
+    # With fibre_delay the channels take light-in-fibre time instead of zero time
+    models = {"delay_model": FibreDelayModel(c=FIBRE_LIGHT_SPEED)} if fibre_delay else None
+    quantum_models = dict(models or {})
+    if attenuation or loss_init:
+        quantum_models["quantum_loss_model"] = FibreLossModel(p_loss_init=loss_init, p_loss_length=attenuation)
+    quantum_channel = QuantumChannel("QuantumChannel", length=length, models=quantum_models or None)
+    classical_channel_to_alice = ClassicalChannel("ClassicalChannelToAlice", length=length, models=models)
+    classical_channel_to_bob = ClassicalChannel("ClassicalChannelToBob", length=length, models=models)
 
     network.add_connection(
         alice, bob,
@@ -43,4 +63,59 @@ def network_setup(rate=0):
         port_name_node2="classical_in",
         label="classical_channel_bob_to_alice"
     )
-    return alice, bob 
\ No newline at end of file
+    return alice, bob
+
+
+def session_rngs(seed=None):
+    # Independent generators for Alice and Bob from one seed, None for fresh entropy
+    return [np.random.default_rng(child) for child in np.random.SeedSequence(seed).spawn(2)]
+
+
+class BB84Network:
+    """Alice-Bob topology and protocols built once and reused for many runs.
+
+    Call reset(gamma, seed) before every run: it resets the simulator, clears the
+    per-run state of both protocols and restarts them on the same nodes and channels.
+    formalism is None to keep NetSquid's current formalism, or "ket", "stab", "dm"
+    or "auto" (common/formalism.py), set on every reset since the setting is global
+    to NetSquid; run() restores the previous one afterwards. With a lossy channel
+    Bob counts a qubit as lost when nothing arrived one and a half round trips after
+    his last ACK. elapsed_time holds the simulated duration (ns) of the last run.
+    Each protocol draws from its own generator: seed fixes them at construction,
+    reset(seed=...) re-seeds them and NetSquid, so a run replays bit for bit.
+    """
+
+    def __init__(self, encryption_key_length=32, dp_rate=0, fibre_delay=False, reconciliation=None,
+                 privacy_amplification=False, formalism=None, length=1e3, attenuation=0, loss_init=0,
+                 seed=None, **protocol_options):
+        self.alice, self.bob = network_setup(fibre_delay=fibre_delay, length=length, attenuation=attenuation,
+                                             loss_init=loss_init)
+        qubit_timeout = None
+        if attenuation or loss_init:
+            round_trip = 2e9 * length / FIBRE_LIGHT_SPEED if fibre_delay else 0
+            qubit_timeout = 1.5 * round_trip + 1
+        alice_rng, bob_rng = session_rngs(seed)
+        self.alice_protocol = AliceProtocol(self.alice, encryption_key_length, rng=alice_rng, **protocol_options)
+        self.bob_protocol = BobProtocol(self.bob, encryption_key_length, dp_rate=dp_rate,
+                                        reconciliation=reconciliation, privacy_amplification=privacy_amplification,
+                                        qubit_timeout=qubit_timeout, rng=bob_rng, **protocol_options)
+        self.formalism = formalism
+        self.elapsed_time = 0
+
+    def reset(self, gamma=None, seed=None):
+        ns.sim_reset()
+        set_formalism(self.formalism, OPERATORS, [self.bob_protocol.depolar_noise])
+        alice_rng = bob_rng = None
+        if seed is not None:
+            alice_rng, bob_rng = session_rngs(seed)
+            ns.set_random_state(seed=seed)
+        self.alice_protocol.reset(rng=alice_rng)
+        self.bob_protocol.reset(dp_rate=gamma, rng=bob_rng)
+
+    def run(self, gamma=None, seed=None):
+        # One protocol run, returns Bob's QBER
+        with use_formalism(self.formalism, OPERATORS, [self.bob_protocol.depolar_noise]):
+            self.reset(gamma, seed)
+            ns.sim_run()
+        self.elapsed_time = ns.sim_time()
+        return self.bob_protocol.qber
@@ -0,0 +1,125 @@
+import math
+import numpy as np
+
+# Linear-time BB84 post-processing on NumPy bit arrays.
+# Bits are uint8 arrays of 0/1, bases are uint8 arrays (0 = Z, 1 = X, 2 = lost)
+# as kept by the protocols, or lists of "Z"/"X"/"-" strings as sent in text mode.
+
+QBER_SAMPLE_FRACTION = 0.20
+# Highest QBER (%) at which a block is kept; an empty sample counts as 100
+QBER_THRESHOLD = 11
+
+Z_BASIS = 0
+X_BASIS = 1
+LOST = 2
+BASIS_LETTERS = np.array(["Z", "X", "-"])
+_BASIS_CODES = {"Z": Z_BASIS, "X": X_BASIS, "-": LOST}
+
+# One row of the measurement matrix export: 10 bytes per qubit, no padding
+MATRIX_DTYPE = np.dtype([("block", "<u4"), ("qubit", "<u4"), ("basis", "u1"), ("bit", "u1")])
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def bases_array(bases):
+    if isinstance(bases, np.ndarray):
+        return bases
+    return np.fromiter((_BASIS_CODES[basis] for basis in bases), dtype=np.uint8, count=len(bases))
+
+
+def bits_array(bits):
+    if isinstance(bits, np.ndarray):
+        return bits.astype(np.uint8, copy=False)
+    if isinstance(bits, str):
+        return np.frombuffer(bits.encode(), dtype=np.uint8) - ord("0")
+    return np.asarray(bits, dtype=np.uint8)
+
+
+def sift(alice_bases, bob_bases):
+    # Positions where both used the same basis; lost qubits never match
+    alice_bases = bases_array(alice_bases)
+    bob_bases = bases_array(bob_bases)
+    return np.flatnonzero((alice_bases == bob_bases) & (bob_bases != _BASIS_CODES["-"]))
+
+
+def select_sample(sifted, fraction=QBER_SAMPLE_FRACTION, rng=None):
+    """Split the sifted positions into the key positions and a random QBER sample.
+
+    Returns (remaining, sample). `remaining` keeps the original order, `sample`
+    is in random order. Both run in O(len(sifted)).
+    """
+    rng = np.random.default_rng(rng)
+    sifted = np.asarray(sifted, dtype=np.int64)
+    sample = rng.permutation(sifted)[:math.ceil(len(sifted) * fraction)]
+    return remove_positions(sifted, sample), sample
+
+
+def remove_positions(positions, removed):
+    # positions without the entries in removed, in the original order, via a bitmap
+    positions = np.asarray(positions, dtype=np.int64)
+    removed = np.asarray(removed, dtype=np.int64)
+    if len(positions) == 0 or len(removed) == 0:
+        return positions
+    mask = np.zeros(max(positions.max(), removed.max()) + 1, dtype=bool)
+    mask[removed] = True
+    return positions[~mask[positions]]
+
+
+def popcount(packed):
+    return int(_POPCOUNT[packed].sum(dtype=np.int64))
+
+
+def qber_percentage(alice_bits, bob_bits):
+    # Percentage of differing bits, by popcount over the XOR of the packed bits
+    alice_bits = bits_array(alice_bits)
+    bob_bits = bits_array(bob_bits)
+    if len(alice_bits) != len(bob_bits):
+        raise ValueError("The input bit strings must have the same length.")
+    differing = popcount(np.packbits(alice_bits) ^ np.packbits(bob_bits))
+    return (differing / len(alice_bits)) * 100
+
+
+def take_bits(raw_bits, positions):
+    positions = np.asarray(positions, dtype=np.int64)
+    if isinstance(raw_bits, np.ndarray):
+        return raw_bits[positions].astype(np.uint8, copy=False)
+    return np.fromiter((raw_bits[i] for i in positions), dtype=np.uint8, count=len(positions))
+
+
+def extract_key(sifted, raw_bits, length):
+    """The first `length` sifted bits packed into bytes, most significant bit first.
+
+    The key holds min(length, len(sifted)) bits; the last byte is zero padded.
+    """
+    return np.packbits(take_bits(raw_bits, sifted[:length])).tobytes()
+
+
+def key_to_string(key, length):
+    # '0'/'1' view of a packed key, as produced by tools.encryption_key_generation
+    bits = np.unpackbits(np.frombuffer(key, dtype=np.uint8), count=length)
+    return (bits + ord("0")).tobytes().decode()
+
+
+def bases_to_string(bases):
+    # Text mode form of the bases, e.g. "Z X - Z"
+    return " ".join(BASIS_LETTERS[bases_array(bases)])
+
+
+def measurement_matrix(bases, bits, block=0):
+    # Structured array of (block, qubit, basis, bit) rows, the compact form of display_matrix
+    matrix = np.empty(len(bases), dtype=MATRIX_DTYPE)
+    matrix["block"] = block
+    matrix["qubit"] = np.arange(len(bases))
+    matrix["basis"] = bases_array(bases)
+    matrix["bit"] = bits_array(bits)
+    return matrix
+
+
+def write_matrix(path, matrix, append=False):
+    # Raw MATRIX_DTYPE records, so blocks can be streamed into one file and memory-mapped
+    with open(path, "ab" if append else "wb") as file:
+        matrix.tofile(file)
+
+
+def load_matrix(path):
+    # Read-only memory map of a file written by write_matrix
+    return np.memmap(path, dtype=MATRIX_DTYPE, mode="r")
@@ -0,0 +1,74 @@
+import math
+import numpy as np
+from cascade import binary_entropy
+
+# Privacy amplification with a random Toeplitz matrix (a universal hash family).
+# The m x n matrix is defined by m + n - 1 seed bits t, T[i, j] = t[i - j + n - 1],
+# so T x is a slice of the linear convolution t * x and is computed with FFTs.
+
+DEFAULT_EPSILON = 1e-10
+# Columns per FFT block, bounds the FFT size and keeps the sums well within float64 precision
+FFT_BLOCK = 1 << 22
+
+
+def secure_key_length(num_bits, qber, leaked_bits, epsilon=DEFAULT_EPSILON):
+    """Length of the final key that can be extracted from num_bits reconciled bits.
+
+    Uses the QBER estimate (in percent) for Eve's information, subtracts the bits
+    leaked during reconciliation and a 2 log2(1/epsilon) security margin.
+    """
+    length = num_bits * (1 - binary_entropy(qber / 100)) - leaked_bits - 2 * math.log2(1 / epsilon)
+    return max(0, int(math.floor(length)))
+
+
+def toeplitz_seed(seed, output_length, num_bits):
+    # The public seed expands into the m + n - 1 bits that define the matrix
+    return np.random.default_rng(seed).integers(0, 2, output_length + num_bits - 1, dtype=np.uint8)
+
+
+def _fast_length(size):
+    # Smallest 2^a 3^b >= size, both radices are fast in numpy's FFT
+    best = 1 << (size - 1).bit_length()
+    power_of_three = 1
+    while power_of_three < best:
+        length = power_of_three << max(0, (size - 1) // power_of_three).bit_length()
+        best = min(best, length)
+        power_of_three *= 3
+    return best
+
+
+def toeplitz_hash(bits, output_length, seed):
+    """Hash the bit array down to output_length bits, O(n log n) with FFTs."""
+    bits = np.asarray(bits, dtype=np.uint8)
+    num_bits = len(bits)
+    if output_length == 0 or num_bits == 0:
+        return np.zeros(output_length, dtype=np.uint8)
+    t = toeplitz_seed(seed, output_length, num_bits)
+
+    # Multiply one block of columns j0..j1 at a time. A block only touches the seed bits
+    # t[n - j1 .. n - j0 + m - 2] and the rows we keep never wrap around, so a cyclic
+    # convolution of that length is enough.
+    result = np.zeros(output_length, dtype=np.int64)
+    for j0 in range(0, num_bits, FFT_BLOCK):
+        j1 = min(j0 + FFT_BLOCK, num_bits)
+        window = t[num_bits - j1:num_bits - j0 + output_length - 1]
+        fft_size = _fast_length(len(window))
+        convolution = np.fft.irfft(np.fft.rfft(window, fft_size) * np.fft.rfft(bits[j0:j1], fft_size), fft_size)
+        # y_i = sum_j t[i - j + n - 1] x_j sits at index i + j1 - j0 - 1 of the block convolution
+        offset = j1 - j0 - 1
+        result += np.rint(convolution[offset:offset + output_length]).astype(np.int64)
+    return (result & 1).astype(np.uint8)
+
+
+def toeplitz_hash_reference(bits, output_length, seed):
+    # Explicit O(m n) matrix product, only for cross-checking small inputs
+    bits = np.asarray(bits, dtype=np.int64)
+    num_bits = len(bits)
+    t = toeplitz_seed(seed, output_length, num_bits).astype(np.int64)
+    rows = np.arange(output_length)[:, None] - np.arange(num_bits)[None, :] + num_bits - 1
+    return ((t[rows] @ bits) & 1).astype(np.uint8)
+
+
+def amplify(bits, output_length, seed):
+    # Final key packed into bytes, as returned by postprocessing.extract_key
+    return np.packbits(toeplitz_hash(bits, output_length, seed)).tobytes()
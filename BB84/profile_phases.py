@@ -0,0 +1,48 @@
+import argparse
+import os
+import sys
+from network_set_up import BB84Network
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+from instrumentation import aggregate, export_csv, export_json, run_records
+from tracing import OFF, tracer
+
+
+def profile_sweep(key_length, gammas, samples, seed=None, **protocol_options):
+    """Per-phase records of every run, and their aggregates per gamma.
+
+    Returns (runs, aggregates): runs holds one record per (run, node, phase),
+    aggregates one row per (gamma, node, phase).
+    """
+    network = BB84Network(key_length, profile=True, **protocol_options)
+    runs = []
+    for gamma in gammas:
+        for sample in range(samples):
+            qber = network.run(gamma=gamma, seed=None if seed is None else seed + sample)
+            runs += run_records(network.alice_protocol.profiler, network.bob_protocol.profiler,
+                                key_length=key_length, gamma=gamma, sample=sample, qber=qber)
+    return runs, aggregate(runs, by=("gamma", "node", "phase"))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Per-phase wall time, simulated time and events of BB84 runs")
+    parser.add_argument("--key", type=int, default=256)
+    parser.add_argument("--gammas", type=float, nargs="+", default=[0.0, 0.1, 0.2])
+    parser.add_argument("--samples", type=int, default=10)
+    parser.add_argument("--window", type=int, default=1)
+    parser.add_argument("--fibre-delay", action="store_true")
+    parser.add_argument("--format", choices=["csv", "json"], default="csv")
+    parser.add_argument("--output", default="phases", help="file prefix for <prefix>_runs and <prefix>_aggregate")
+    args = parser.parse_args()
+
+    tracer.configure(level=OFF)
+    runs, aggregates = profile_sweep(args.key, args.gammas, args.samples, seed=0, window=args.window,
+                                     fibre_delay=args.fibre_delay)
+    export = export_csv if args.format == "csv" else export_json
+    export(f"{args.output}_runs.{args.format}", runs)
+    export(f"{args.output}_aggregate.{args.format}", aggregates)
+
+    print(f"{'gamma':>6} {'node':<6} {'phase':<16} {'calls':>7} {'wall ms':>9} {'sim ns':>12} {'events':>7}")
+    for row in aggregates:
+        print(f"{row['gamma']:>6.2f} {row['node']:<6} {row['phase']:<16} {row['calls_mean']:>7.0f} "
+              f"{row['wall_time_mean'] * 1e3:>9.3f} {row['sim_time_mean']:>12.0f} {row['events_mean']:>7.1f}")
@@ -0,0 +1,63 @@
+import collections
+
+# Routing and key relaying of the BB84 mesh (mesh.py), kept free of NetSquid.
+# Links are (a, b) node index pairs, link k is links[k].
+
+
+def random_links(num_nodes, num_links, rng):
+    """num_links distinct undirected links over num_nodes nodes, connected if num_links >= num_nodes - 1.
+
+    A random spanning tree comes first, the remaining links are random chords.
+    """
+    if not num_nodes - 1 <= num_links <= num_nodes * (num_nodes - 1) // 2:
+        raise ValueError(f"{num_links} links cannot connect {num_nodes} nodes without duplicates.")
+    order = rng.permutation(num_nodes)
+    links = [(int(order[rng.integers(0, i)]), int(order[i])) for i in range(1, num_nodes)]
+    existing = {frozenset(link) for link in links}
+    while len(links) < num_links:
+        a, b = (int(node) for node in rng.choice(num_nodes, 2, replace=False))
+        if frozenset((a, b)) not in existing:
+            existing.add(frozenset((a, b)))
+            links.append((a, b))
+    return links
+
+
+def shortest_path(links, source, destination):
+    # Breadth first search, returns [(node, link index), ...] hops from source or None
+    neighbours = collections.defaultdict(list)
+    for k, (a, b) in enumerate(links):
+        neighbours[a].append((b, k))
+        neighbours[b].append((a, k))
+    previous = {source: None}
+    queue = collections.deque([source])
+    while queue:
+        node = queue.popleft()
+        if node == destination:
+            break
+        for neighbour, k in neighbours[node]:
+            if neighbour not in previous:
+                previous[neighbour] = (node, k)
+                queue.append(neighbour)
+    if destination not in previous:
+        return None
+    hops = []
+    node = destination
+    while previous[node] is not None:
+        hops.append((node, previous[node][1]))
+        node = previous[node][0]
+    return hops[::-1]
+
+
+def xor_relay(hop_keys):
+    """End-to-end key through trusted relays.
+
+    hop_keys[j] = (key of hop j at its sending node, key of hop j at its receiving node).
+    The source takes its first hop key as the end-to-end key; relay j publishes
+    its copy of hop j XOR its copy of hop j + 1; the destination XORs its last hop
+    key with every announcement. Returns (source key, destination key, announcements).
+    """
+    announcements = [hop_keys[j][1] ^ hop_keys[j + 1][0] for j in range(len(hop_keys) - 1)]
+    destination_key = hop_keys[-1][1].copy()
+    for announcement in announcements:
+        destination_key ^= announcement
+    return hop_keys[0][0], destination_key, announcements
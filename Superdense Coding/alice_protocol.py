@@ -1,47 +1,84 @@
 
 import netsquid as ns
+import os
+import sys
 from netsquid.qubits import qubitapi as qapi
 from netsquid.protocols import NodeProtocol
 from netsquid.components.models.qerrormodels import DepolarNoiseModel
 
-def print_state(qubits, description):
-    """Utility function to print quantum states."""
-    state = qapi.reduced_dm(qubits)
-    print(f"{description}:{state}\n")
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+from tracing import DEBUG, INFO, tracer
+from state_inspection import inspector
+from instrumentation import make_profiler
+
+def print_state(qubits, description, node=None, step=None):
+    """Utility function to trace quantum states and take the snapshots requested for
+    `step` (state_inspection.py), only computed when tracing or inspection is on."""
+    if step is not None and inspector.wants(step, node):
+        inspector.snapshot(step, node, qubits)
+    if tracer.enabled(DEBUG, node):
+        state = qapi.reduced_dm(qubits)
+        tracer.emit(DEBUG, node, f"{description}:{state}\n")
 
 class AliceProtocol(NodeProtocol):
-    def __init__(self, node, operation):
+    def __init__(self, node, operation, profile=False):
         super().__init__(node)
+        # A two-bit string such as "11", or a sequence of them to encode one per EPR pair
         self.operation = operation
+        self.operations = [operation] if isinstance(operation, str) else list(operation)
         self.dp_noise = DepolarNoiseModel(depolar_rate=0, time_independent=True)
+        self.events = 0
+        self.profiler = make_profiler(profile, node.name, lambda: self.events)
 
     def run(self):
-        print("Alice's protocol has started.")
-        # Wait for qubit from Charlie
-        yield self.await_port_input(self.node.ports["port_q_charlie"])
-        q = self.node.ports["port_q_charlie"].rx_input().items[0]  # Retrieve the qubit
+        if tracer.enabled(INFO, self.node.name):
+            tracer.emit(INFO, self.node.name, "Alice's protocol has started.")
+        operations = iter(self.operations)
+        remaining = len(self.operations)
+        while remaining:
+            # Wait for qubits from Charlie, several pairs can arrive in one message
+            with self.profiler.phase("qubit_wait"):
+                yield self.await_port_input(self.node.ports["port_q_charlie"])
+                self.events += 1
+            for q in self.node.ports["port_q_charlie"].rx_input().items[:remaining]:
+                self.process(q, next(operations))
+                remaining -= 1
+        if tracer.enabled(INFO, self.node.name):
+            tracer.emit(INFO, self.node.name, "Alice's protocol has ended.")
+
+    def process(self, q, operation):
         # This one introduce the noise for received qubit. Setting it to True the probabillity counts
         #for each iterration, not time related. Change the rate to see the possible errors to your connection;)
-        self.dp_noise.error_operation([q]) 
-        print_state([q], "Alice receives qubit")
+        with self.profiler.phase("noise"):
+            self.dp_noise.error_operation([q])
+        print_state([q], "Alice receives qubit", self.node.name, "alice_receive")
+
+        with self.profiler.phase("encode"):
+            self.encode(q, operation)
 
+        print_state([q], f"Alice encodes message: {operation}", self.node.name, "alice_encode")
+        with self.profiler.phase("transmit"):
+            self.node.ports["port_q_bob"].tx_output(q)  # Send the qubit to Bob
+        if tracer.enabled(DEBUG, self.node.name):
+            tracer.emit(DEBUG, self.node.name, "Alice sends the qubit to Bob.")
+
+    def encode(self, q, operation):
         # Encode the message
-        if self.operation == "00":
-            print("Alice applies no operation.")
-        elif self.operation == "01":
+        if operation == "00":
+            if tracer.enabled(DEBUG, self.node.name):
+                tracer.emit(DEBUG, self.node.name, "Alice applies no operation.")
+        elif operation == "01":
             qapi.operate(q, ns.X)
-            print("Alice applies X gate.")
-        elif self.operation == "10":
+            if tracer.enabled(DEBUG, self.node.name):
+                tracer.emit(DEBUG, self.node.name, "Alice applies X gate.")
+        elif operation == "10":
             qapi.operate(q, ns.Z)
-            print("Alice applies Z gate.")
-        elif self.operation == "11":
+            if tracer.enabled(DEBUG, self.node.name):
+                tracer.emit(DEBUG, self.node.name, "Alice applies Z gate.")
+        elif operation == "11":
             qapi.operate(q, ns.Z)
             qapi.operate(q, ns.X)
-            print("Alice applies Z and X gates.")
+            if tracer.enabled(DEBUG, self.node.name):
+                tracer.emit(DEBUG, self.node.name, "Alice applies Z and X gates.")
         else:
             raise ValueError("Invalid operation.")
-
-        print_state([q], f"Alice encodes message: {self.operation}")
-        self.node.ports["port_q_bob"].tx_output(q)  # Send the qubit to Bob
-        print("Alice sends the qubit to Bob.")
-        print("Alice's protocol has ended.")
@@ -0,0 +1,120 @@
+import argparse
+import os
+import sys
+import time
+import numpy as np
+import netsquid as ns
+from netsquid.components import DepolarNoiseModel
+from superdense_network import network_setup
+from charlie_protocol import CharlieProtocol
+from alice_protocol import AliceProtocol
+from bob_protocol import BobProtocol
+from state_inspection import STEPS, inspector
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+from tracing import OFF, tracer
+from formalism import AUTO, FORMALISMS, use_formalism
+
+# Superdense coding of a byte payload: every byte becomes four two-bit symbols,
+# most significant pair first, and every symbol rides on its own EPR pair.
+SYMBOLS = ["00", "01", "10", "11"]
+# Time between two EPR pairs from Charlie (ns); pairs overlap in flight, only the
+# source rate limits the stream
+PAIR_INTERVAL = 1000
+# Gates of a run: Bell pair creation, Alice's encoding and Bob's Bell measurement
+OPERATORS = ("H", "CNOT", "X", "Z")
+
+
+def bytes_to_symbols(payload):
+    bits = np.unpackbits(np.frombuffer(bytes(payload), dtype=np.uint8))
+    return 2 * bits[0::2] + bits[1::2]
+
+
+def symbols_to_bytes(symbols):
+    symbols = np.asarray(symbols, dtype=np.uint8)
+    bits = np.empty(2 * len(symbols), dtype=np.uint8)
+    bits[0::2] = symbols >> 1
+    bits[1::2] = symbols & 1
+    return np.packbits(bits).tobytes()
+
+
+def send_payload(payload, gamma=0.01, dp_rate=0, length=10, fibre_delay=True, pair_interval=PAIR_INTERVAL, seed=None,
+                 formalism=None):
+    """Send `payload` (bytes) from Alice to Bob with one EPR pair per two-bit symbol.
+
+    Charlie emits a pair every pair_interval ns, Alice encodes each qubit as it
+    arrives and Bob decodes each pair as soon as both halves are in, so
+    distribution, encoding and decoding overlap. Returns the received bytes
+    with goodput, symbol/byte error rates and latencies. formalism is "ket", "stab",
+    "dm" or "auto" (common/formalism.py) for this run only, None keeps NetSquid's.
+    """
+    if seed is not None:
+        ns.set_random_state(seed=seed)
+    ns.sim_reset()
+    symbols = bytes_to_symbols(payload)
+    channel_noise = DepolarNoiseModel(depolar_rate=gamma)
+    charlie, alice, bob = network_setup(length=length, fibre_delay=fibre_delay, noise_model=channel_noise)
+    charlie_protocol = CharlieProtocol(charlie, pairs=len(symbols), interval=pair_interval)
+    alice_protocol = AliceProtocol(alice, [SYMBOLS[symbol] for symbol in symbols])
+    bob_protocol = BobProtocol(bob, messages=len(symbols))
+    alice_protocol.dp_noise.depolar_rate = dp_rate
+    bob_protocol.dp_noise_alice.depolar_rate = dp_rate
+    bob_protocol.dp_noise_charlie.depolar_rate = dp_rate
+    noise_models = [channel_noise, alice_protocol.dp_noise, bob_protocol.dp_noise_alice, bob_protocol.dp_noise_charlie]
+
+    wall_start = time.perf_counter()
+    with use_formalism(formalism, OPERATORS, noise_models):
+        for protocol in (charlie_protocol, alice_protocol, bob_protocol):
+            protocol.start()
+        ns.sim_run()
+    wall_seconds = time.perf_counter() - wall_start
+
+    decoded = np.array([SYMBOLS.index(message) for message in bob_protocol.decoded], dtype=np.uint8)
+    received = symbols_to_bytes(decoded)
+    symbol_errors = int(np.count_nonzero(decoded != symbols[:len(decoded)])) + len(symbols) - len(decoded)
+    byte_errors = sum(a != b for a, b in zip(payload, received)) + len(payload) - len(received)
+    # Pair k leaves Charlie at k * pair_interval, its symbol is delivered at decode_times[k]
+    latencies = np.array(bob_protocol.decode_times) - np.arange(len(decoded)) * pair_interval
+    sim_seconds = (bob_protocol.decode_times[-1] if len(decoded) else 0) * 1e-9
+    kilobytes = len(payload) / 1024
+    return {
+        "received": received,
+        "symbols": len(symbols),
+        "symbol_errors": symbol_errors,
+        "symbol_error_rate": symbol_errors / len(symbols) if len(symbols) else 0.0,
+        "byte_error_rate": byte_errors / len(payload) if len(payload) else 0.0,
+        "goodput_bits_per_second": 8 * (len(payload) - byte_errors) / sim_seconds if sim_seconds > 0 else float("nan"),
+        "sim_seconds_per_kb": sim_seconds / kilobytes if kilobytes else 0.0,
+        "wall_seconds_per_kb": wall_seconds / kilobytes if kilobytes else 0.0,
+        "mean_symbol_latency_ns": float(latencies.mean()) if len(latencies) else 0.0,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Batch superdense coding of a byte payload")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[64, 256, 1024], help="payload sizes in bytes")
+    parser.add_argument("--dp-rate", type=float, default=0.0, help="depolarizing probability per received qubit")
+    parser.add_argument("--interval", type=float, default=PAIR_INTERVAL, help="ns between EPR pairs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--formalism", choices=FORMALISMS + (AUTO,), default=AUTO)
+    parser.add_argument("--inspect", nargs="*", default=[], choices=sorted(STEPS), help="steps to snapshot")
+    parser.add_argument("--inspect-every", type=int, default=100, help="keep every n-th snapshot of a step")
+    parser.add_argument("--inspect-file", default="snapshots.npz")
+    args = parser.parse_args()
+
+    tracer.configure(level=OFF)
+    for step in args.inspect:
+        inspector.request(step, every=args.inspect_every)
+    rng = np.random.default_rng(args.seed)
+    print(f"{'bytes':>7} {'SER':>8} {'byte err':>9} {'goodput (bit/s)':>16} {'sim s/KB':>10} {'wall s/KB':>10} {'latency (ns)':>13}")
+    for size in args.sizes:
+        payload = rng.integers(0, 256, size, dtype=np.uint8).tobytes()
+        report = send_payload(payload, dp_rate=args.dp_rate, pair_interval=args.interval, seed=args.seed,
+                              formalism=args.formalism)
+        print(f"{size:>7} {report['symbol_error_rate']:>8.4f} {report['byte_error_rate']:>9.4f} "
+              f"{report['goodput_bits_per_second']:>16.4g} {report['sim_seconds_per_kb']:>10.4g} "
+              f"{report['wall_seconds_per_kb']:>10.4g} {report['mean_symbol_latency_ns']:>13.1f}")
+        inspector.next_run()
+    if args.inspect:
+        inspector.save(args.inspect_file)
+        print(f"{len(inspector.records)} state snapshots written to {args.inspect_file}")
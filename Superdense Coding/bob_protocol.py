@@ -1,50 +1,107 @@
 
+import collections
 import netsquid as ns
+import os
+import sys
 from netsquid.qubits import qubitapi as qapi
 from netsquid.protocols import NodeProtocol
 from netsquid.components.models.qerrormodels import DepolarNoiseModel
 
-def print_state(qubits, description):
-    """Utility function to print quantum states."""
-    state = qapi.reduced_dm(qubits)
-    print(f"{description}:{state}\n")
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+from tracing import DEBUG, INFO, tracer
+from state_inspection import inspector
+from instrumentation import make_profiler
+
+def print_state(qubits, description, node=None, step=None):
+    """Utility function to trace quantum states and take the snapshots requested for
+    `step` (state_inspection.py), only computed when tracing or inspection is on."""
+    if step is not None and inspector.wants(step, node):
+        inspector.snapshot(step, node, qubits)
+    if tracer.enabled(DEBUG, node):
+        state = qapi.reduced_dm(qubits)
+        tracer.emit(DEBUG, node, f"{description}:{state}\n")
 
 class BobProtocol(NodeProtocol):
-    def __init__(self, node):
+    def __init__(self, node, messages=1, profile=False):
         super().__init__(node)
         #Two different errors for each of the quantum channels
         self.dp_noise_alice = DepolarNoiseModel(depolar_rate=0, time_independent=True)
         self.dp_noise_charlie = DepolarNoiseModel(depolar_rate=0, time_independent=True)
+        # Number of two-bit messages to decode; qubits of later pairs may arrive while
+        # earlier ones are still incomplete, so arrivals are queued per port
+        self.messages = messages
+        self.decoded = []
+        self.decode_times = []
+        self.events = 0
+        self.profiler = make_profiler(profile, node.name, lambda: self.events)
+
+    def reset(self):
+        # Forget the messages of the previous run and restart
+        self.decoded = []
+        self.decode_times = []
+        super().reset()
 
     def run(self):
-        print("Bob's protocol has started.")
-
-        # Wait for Charlie's qubit
-        yield self.await_port_input(self.node.ports["port_q_charlie"])
-        q_bob = self.node.ports["port_q_charlie"].rx_input().items[0]
-        self.dp_noise_charlie.error_operation([q_bob ]) 
-        print_state([q_bob], "Bob receives qubit from Charlie")
-
-        # Wait for Alice's qubit
-        yield self.await_port_input(self.node.ports["port_q_alice"])
-        q_alice = self.node.ports["port_q_alice"].rx_input().items[0]
-        self.dp_noise_alice.error_operation([q_alice ]) 
-        print_state([q_alice], "Bob receives qubit from Alice")
-
-        # Apply decoding operations
-        print("Bob starts decoding...")
-        qapi.operate([q_bob, q_alice], ns.CX)  # Apply CNOT gate
-        print("Bob applies CNOT gate.")
-        print_state([q_bob, q_alice], "After CNOT gate")
-
-        qapi.operate(q_bob, ns.H)  # Apply Hadamard gate
-        print("Bob applies Hadamard gate.")
-        print_state([q_bob, q_alice], "After Hadamard gate")
-
-        # Measure the qubits separately
-        print("Preparing to measure qubits separately.")
-        m_qA, p_qA = qapi.measure(q_bob)  # Measure q_bob
-        m_qB, p_qB = qapi.measure(q_alice)  # Measure q_alice
-        print(f"Bob decodes message: {m_qA}{m_qB}")
-        print(f"Measurement probabilities: p_qA={p_qA}, p_qB={p_qB}")
-        print("Bob's protocol has ended.")
+        if tracer.enabled(INFO, self.node.name):
+            tracer.emit(INFO, self.node.name, "Bob's protocol has started.")
+
+        charlie_port = self.node.ports["port_q_charlie"]
+        alice_port = self.node.ports["port_q_alice"]
+        charlie_qubits = collections.deque()
+        alice_qubits = collections.deque()
+        while len(self.decoded) < self.messages:
+            # Wait for Charlie's or Alice's qubit
+            with self.profiler.phase("qubit_wait"):
+                yield self.await_port_input(charlie_port) | self.await_port_input(alice_port)
+                self.events += 1
+
+            message = charlie_port.rx_input()
+            if message is not None:
+                for q_bob in message.items:
+                    with self.profiler.phase("noise"):
+                        self.dp_noise_charlie.error_operation([q_bob])
+                    print_state([q_bob], "Bob receives qubit from Charlie", self.node.name, "bob_receive_charlie")
+                    charlie_qubits.append(q_bob)
+
+            message = alice_port.rx_input()
+            if message is not None:
+                for q_alice in message.items:
+                    with self.profiler.phase("noise"):
+                        self.dp_noise_alice.error_operation([q_alice])
+                    print_state([q_alice], "Bob receives qubit from Alice", self.node.name, "bob_receive_alice")
+                    alice_qubits.append(q_alice)
+
+            # Both channels keep their order, so the heads of the queues belong to the same pair
+            while charlie_qubits and alice_qubits:
+                self.decoded.append(self.decode(charlie_qubits.popleft(), alice_qubits.popleft()))
+                self.decode_times.append(ns.sim_time())
+
+        if tracer.enabled(INFO, self.node.name):
+            tracer.emit(INFO, self.node.name, "Bob's protocol has ended.")
+
+    def decode(self, q_bob, q_alice):
+        with self.profiler.phase("decode"):
+            # Apply decoding operations
+            if tracer.enabled(DEBUG, self.node.name):
+                tracer.emit(DEBUG, self.node.name, "Bob starts decoding...")
+            qapi.operate([q_bob, q_alice], ns.CX)  # Apply CNOT gate
+            if tracer.enabled(DEBUG, self.node.name):
+                tracer.emit(DEBUG, self.node.name, "Bob applies CNOT gate.")
+            print_state([q_bob, q_alice], "After CNOT gate", self.node.name, "bob_after_cnot")
+
+            qapi.operate(q_bob, ns.H)  # Apply Hadamard gate
+            if tracer.enabled(DEBUG, self.node.name):
+                tracer.emit(DEBUG, self.node.name, "Bob applies Hadamard gate.")
+            print_state([q_bob, q_alice], "After Hadamard gate", self.node.name, "bob_after_hadamard")
+
+        with self.profiler.phase("measure"):
+            # Measure the qubits separately
+            if tracer.enabled(DEBUG, self.node.name):
+                tracer.emit(DEBUG, self.node.name, "Preparing to measure qubits separately.")
+            m_qA, p_qA = qapi.measure(q_bob)  # Measure q_bob
+            m_qB, p_qB = qapi.measure(q_alice)  # Measure q_alice
+        if tracer.enabled(DEBUG, self.node.name):
+            tracer.emit(DEBUG, self.node.name, f"Bob decodes message: {m_qA}{m_qB}")
+        if tracer.enabled(DEBUG, self.node.name):
+            tracer.emit(DEBUG, self.node.name, f"Measurement probabilities: p_qA={p_qA}, p_qB={p_qB}")
+        return f"{m_qA}{m_qB}"
@@ -1,26 +1,51 @@
 import netsquid as ns
+import os
+import sys
 from netsquid.qubits import qubitapi as qapi
 from netsquid.protocols import NodeProtocol
 
-def print_state(qubits, description):
-    """Utility function to print quantum states."""
-    state = qapi.reduced_dm(qubits)
-    print(f"{description}:{state}\n")
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+from tracing import DEBUG, INFO, tracer
+from state_inspection import inspector
+from instrumentation import make_profiler
+
+def print_state(qubits, description, node=None, step=None):
+    """Utility function to trace quantum states and take the snapshots requested for
+    `step` (state_inspection.py), only computed when tracing or inspection is on."""
+    if step is not None and inspector.wants(step, node):
+        inspector.snapshot(step, node, qubits)
+    if tracer.enabled(DEBUG, node):
+        state = qapi.reduced_dm(qubits)
+        tracer.emit(DEBUG, node, f"{description}:{state}\n")
 
 class CharlieProtocol(NodeProtocol):
-    def __init__(self, node):
+    def __init__(self, node, pairs=1, interval=0, profile=False):
         super().__init__(node)
+        # Number of EPR pairs to distribute, one every `interval` ns without waiting for Bob
+        self.pairs = pairs
+        self.interval = interval
+        self.events = 0
+        self.profiler = make_profiler(profile, node.name, lambda: self.events)
 
     def run(self):
-        print("Charlie's protocol has started.")
-        q_A, q_B = qapi.create_qubits(2)  # Create qubits
-        qapi.operate(q_A, ns.H)  # Apply Hadamard
-        qapi.operate([q_A, q_B], ns.CX)  # Apply CNOT
-        print_state([q_A, q_B], "Charlie creates entanglement")
-
-        # Send qubits to Alice and Bob
-        self.node.ports["port_q_alice"].tx_output(q_A)
-        self.node.ports["port_q_bob"].tx_output(q_B)
-        print("Charlie sends qubits to Alice and Bob.")
-        print("Charlie's protocol has ended.")
+        if tracer.enabled(INFO, self.node.name):
+            tracer.emit(INFO, self.node.name, "Charlie's protocol has started.")
+        for pair in range(self.pairs):
+            if pair > 0 and self.interval > 0:
+                with self.profiler.phase("source_wait"):
+                    yield self.await_timer(self.interval)
+                    self.events += 1
+            with self.profiler.phase("create_pair"):
+                q_A, q_B = qapi.create_qubits(2)  # Create qubits
+                qapi.operate(q_A, ns.H)  # Apply Hadamard
+                qapi.operate([q_A, q_B], ns.CX)  # Apply CNOT
+            print_state([q_A, q_B], "Charlie creates entanglement", self.node.name, "charlie_entangle")
 
+            # Send qubits to Alice and Bob
+            with self.profiler.phase("distribute"):
+                self.node.ports["port_q_alice"].tx_output(q_A)
+                self.node.ports["port_q_bob"].tx_output(q_B)
+            if tracer.enabled(DEBUG, self.node.name):
+                tracer.emit(DEBUG, self.node.name, "Charlie sends qubits to Alice and Bob.")
+        if tracer.enabled(INFO, self.node.name):
+            tracer.emit(INFO, self.node.name, "Charlie's protocol has ended.")
@@ -0,0 +1,268 @@
+import argparse
+import collections
+import heapq
+import os
+import sys
+import time
+import numpy as np
+import netsquid as ns
+from netsquid.qubits import qubitapi as qapi
+from netsquid.protocols import NodeProtocol
+from netsquid.nodes import Node, Network
+from netsquid.components import QuantumChannel, DepolarNoiseModel
+from netsquid.components.models.delaymodels import FibreDelayModel
+from alice_protocol import AliceProtocol
+from bob_protocol import BobProtocol
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+from tracing import DEBUG, INFO, OFF, tracer
+
+# One Charlie hub distributing EPR pairs to N Alice/Bob client pairs. Client i asks
+# for demand[i] pairs at arrival[i] ns; the hub has `sources` Bell pair sources that
+# each emit one pair per `interval` ns, so clients compete for source slots and a
+# scheduler decides who gets the next pair, at most one per client and emission.
+# Every client pair then runs the usual superdense coding protocols on its own
+# channels.
+
+PAIR_INTERVAL = 1000
+
+
+class RoundRobinScheduler:
+    """Serves the waiting clients in turn, one pair each."""
+
+    def __init__(self, weights, priorities):
+        self.queue = collections.deque()
+
+    def __len__(self):
+        return len(self.queue)
+
+    def add(self, client):
+        self.queue.append(client)
+
+    def select(self):
+        return self.queue.popleft()
+
+    def requeue(self, client):
+        # Client still needs pairs after being served
+        self.queue.append(client)
+
+
+class FairShareScheduler:
+    """Weighted fair queueing: client i gets pairs in proportion to weights[i].
+
+    Every pair of a client advances its virtual finish time by 1 / weight, the
+    client with the earliest finish time is served next. Late arrivals start at the
+    current virtual time instead of claiming the share they missed.
+    """
+
+    def __init__(self, weights, priorities):
+        self.weights = weights
+        self.finish = {}
+        self.virtual = 0.0
+        self.heap = []
+
+    def __len__(self):
+        return len(self.heap)
+
+    def add(self, client):
+        self.finish[client] = max(self.virtual, self.finish.get(client, 0.0)) + 1 / self.weights[client]
+        heapq.heappush(self.heap, (self.finish[client], client))
+
+    def select(self):
+        self.virtual, client = heapq.heappop(self.heap)
+        return client
+
+    def requeue(self, client):
+        self.finish[client] += 1 / self.weights[client]
+        heapq.heappush(self.heap, (self.finish[client], client))
+
+
+class PriorityScheduler:
+    """Strict priority, higher first; round-robin among clients of equal priority."""
+
+    def __init__(self, weights, priorities):
+        self.priorities = priorities
+        self.sequence = 0
+        self.heap = []
+
+    def __len__(self):
+        return len(self.heap)
+
+    def add(self, client):
+        self.sequence += 1
+        heapq.heappush(self.heap, (-self.priorities[client], self.sequence, client))
+
+    def select(self):
+        return heapq.heappop(self.heap)[2]
+
+    requeue = add
+
+
+SCHEDULERS = {"round_robin": RoundRobinScheduler, "fair_share": FairShareScheduler, "priority": PriorityScheduler}
+
+
+def hub_setup(clients, gamma=0.01, length=10, fibre_delay=True):
+    """Charlie hub with `clients` Alice/Bob pairs, returns (charlie, alices, bobs).
+
+    Client nodes keep the port names of superdense_network.network_setup, so the
+    Alice and Bob protocols run unchanged; Charlie has ports port_q_alice_<i> and
+    port_q_bob_<i> per client.
+    """
+    network = Network("EPR Hub Network")
+    charlie = Node("Charlie", port_names=[f"port_q_{side}_{i}" for i in range(clients) for side in ("alice", "bob")])
+    alices = [Node(f"Alice_{i}", port_names=["port_q_charlie", "port_q_bob"]) for i in range(clients)]
+    bobs = [Node(f"Bob_{i}", port_names=["port_q_charlie", "port_q_alice"]) for i in range(clients)]
+    network.add_nodes([charlie] + alices + bobs)
+
+    models = {"quantum_noise": DepolarNoiseModel(depolar_rate=gamma)}
+    if fibre_delay:
+        models["delay_model"] = FibreDelayModel()
+    for i, (alice, bob) in enumerate(zip(alices, bobs)):
+        network.add_connection(charlie, alice, channel_to=QuantumChannel(f"Channel_CA_{i}", length=length, models=dict(models)),
+                               port_name_node1=f"port_q_alice_{i}", port_name_node2="port_q_charlie")
+        network.add_connection(charlie, bob, channel_to=QuantumChannel(f"Channel_CB_{i}", length=length, models=dict(models)),
+                               port_name_node1=f"port_q_bob_{i}", port_name_node2="port_q_charlie")
+        network.add_connection(alice, bob, channel_to=QuantumChannel(f"Channel_AB_{i}", length=length, models=dict(models)),
+                               port_name_node1="port_q_bob", port_name_node2="port_q_alice")
+    return charlie, alices, bobs
+
+
+class HubProtocol(NodeProtocol):
+    def __init__(self, node, demand, arrival, scheduler, sources=1, interval=PAIR_INTERVAL):
+        super().__init__(node)
+        self.demand = list(demand)
+        self.arrival = list(arrival)
+        self.scheduler = scheduler
+        self.sources = sources
+        self.interval = interval
+        # Emission time of every pair, per client
+        self.emit_times = [[] for _ in self.demand]
+        self.events = 0
+
+    def run(self):
+        if tracer.enabled(INFO, self.node.name):
+            tracer.emit(INFO, self.node.name, f"Hub serves {len(self.demand)} client pairs.")
+        remaining = list(self.demand)
+        outstanding = sum(remaining)
+        order = sorted((client for client in range(len(remaining)) if remaining[client]), key=self.arrival.__getitem__)
+        arrived = 0
+        while outstanding:
+            now = ns.sim_time()
+            while arrived < len(order) and self.arrival[order[arrived]] <= now:
+                self.scheduler.add(order[arrived])
+                arrived += 1
+            if not len(self.scheduler):
+                # Idle until the next request
+                yield self.await_timer(self.arrival[order[arrived]] - now)
+                self.events += 1
+                continue
+            # A client gets at most one pair per emission instant, so it is only requeued
+            # once every source has fired and spare sources stay idle
+            served = []
+            for _ in range(self.sources):
+                if not len(self.scheduler):
+                    break
+                client = self.scheduler.select()
+                self.distribute(client)
+                self.emit_times[client].append(now)
+                remaining[client] -= 1
+                outstanding -= 1
+                served.append(client)
+            for client in served:
+                if remaining[client]:
+                    self.scheduler.requeue(client)
+            if outstanding:
+                yield self.await_timer(self.interval)
+                self.events += 1
+        if tracer.enabled(INFO, self.node.name):
+            tracer.emit(INFO, self.node.name, "Hub has served every request.")
+
+    def distribute(self, client):
+        q_A, q_B = qapi.create_qubits(2)
+        qapi.operate(q_A, ns.H)
+        qapi.operate([q_A, q_B], ns.CX)
+        self.node.ports[f"port_q_alice_{client}"].tx_output(q_A)
+        self.node.ports[f"port_q_bob_{client}"].tx_output(q_B)
+        if tracer.enabled(DEBUG, self.node.name):
+            tracer.emit(DEBUG, self.node.name, f"Hub sends a pair to client {client}.")
+
+
+def serve(clients, scheduler="round_robin", demand=10, arrival_spread=0, classes=3, sources=1,
+          interval=PAIR_INTERVAL, gamma=0.01, length=10, seed=None):
+    """Run the hub with `clients` pairs and report latency, throughput and simulator cost.
+
+    Client i belongs to class i % classes, which is its priority and gives it
+    weight 2**class under fair share. Arrivals are uniform in [0, arrival_spread) ns.
+    Pair latency runs from the client's request to Bob decoding that pair.
+    """
+    rng = np.random.default_rng(seed)
+    if seed is not None:
+        ns.set_random_state(seed=seed)
+    ns.sim_reset()
+    client_class = np.arange(clients) % classes
+    arrival = rng.uniform(0, arrival_spread, clients) if arrival_spread else np.zeros(clients)
+    messages = rng.choice(["00", "01", "10", "11"], size=(clients, demand))
+
+    setup_start = time.perf_counter()
+    charlie, alices, bobs = hub_setup(clients, gamma=gamma, length=length)
+    hub = HubProtocol(charlie, [demand] * clients, arrival,
+                      SCHEDULERS[scheduler](weights=2.0 ** client_class, priorities=client_class),
+                      sources=sources, interval=interval)
+    alice_protocols = [AliceProtocol(alice, list(messages[i])) for i, alice in enumerate(alices)]
+    bob_protocols = [BobProtocol(bob, messages=demand) for bob in bobs]
+    setup_wall = time.perf_counter() - setup_start
+
+    run_start = time.perf_counter()
+    for protocol in [hub] + alice_protocols + bob_protocols:
+        protocol.start()
+    ns.sim_run()
+    run_wall = time.perf_counter() - run_start
+
+    latencies = [np.array(bob.decode_times) - arrival[i] for i, bob in enumerate(bob_protocols)]
+    completion = np.array([latency[-1] if len(latency) else np.nan for latency in latencies])
+    all_latencies = np.concatenate(latencies) if latencies else np.zeros(0)
+    errors = sum(sum(a != b for a, b in zip(messages[i], bob.decoded)) for i, bob in enumerate(bob_protocols))
+    pairs = len(all_latencies)
+    sim_seconds = max((bob.decode_times[-1] for bob in bob_protocols if bob.decode_times), default=0) * 1e-9
+    events = hub.events + sum(p.events for p in alice_protocols) + sum(p.events for p in bob_protocols)
+    return {
+        "clients": clients,
+        "scheduler": scheduler,
+        "pairs": pairs,
+        "symbol_error_rate": errors / pairs if pairs else 0.0,
+        "latency_p50_ns": float(np.percentile(all_latencies, 50)) if pairs else 0.0,
+        "latency_p99_ns": float(np.percentile(all_latencies, 99)) if pairs else 0.0,
+        # Mean request completion time per client class
+        "completion_by_class_ns": [float(np.nanmean(completion[client_class == c])) for c in range(min(classes, clients))],
+        "throughput_pairs_per_second": pairs / sim_seconds if sim_seconds else float("nan"),
+        "setup_wall_seconds": setup_wall,
+        "run_wall_seconds": run_wall,
+        "wall_microseconds_per_pair": 1e6 * run_wall / pairs if pairs else 0.0,
+        "events": events,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Multi-tenant EPR distribution hub for Superdense Coding")
+    parser.add_argument("--clients", type=int, nargs="+", default=[10, 50, 100, 200, 400])
+    parser.add_argument("--scheduler", nargs="+", choices=sorted(SCHEDULERS), default=sorted(SCHEDULERS))
+    parser.add_argument("--demand", type=int, default=10, help="EPR pairs requested per client pair")
+    parser.add_argument("--spread", type=float, default=0, help="requests arrive uniformly within this many ns")
+    parser.add_argument("--classes", type=int, default=3, help="priority / weight classes")
+    parser.add_argument("--sources", type=int, default=1, help="pairs the hub emits per interval")
+    parser.add_argument("--interval", type=float, default=PAIR_INTERVAL, help="ns between emissions")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    tracer.configure(level=OFF)
+    print(f"{'clients':>7} {'scheduler':<12} {'p50 (us)':>9} {'p99 (us)':>9} {'completion by class (us)':<28} "
+          f"{'pairs/s':>10} {'setup s':>8} {'run s':>7} {'us/pair':>8} {'events':>8}")
+    for clients in args.clients:
+        for scheduler in args.scheduler:
+            report = serve(clients, scheduler, demand=args.demand, arrival_spread=args.spread, classes=args.classes,
+                           sources=args.sources, interval=args.interval, seed=args.seed)
+            completion = " ".join(f"{value * 1e-3:.0f}" for value in report["completion_by_class_ns"])
+            print(f"{clients:>7} {scheduler:<12} {report['latency_p50_ns'] * 1e-3:>9.1f} "
+                  f"{report['latency_p99_ns'] * 1e-3:>9.1f} {completion:<28} "
+                  f"{report['throughput_pairs_per_second']:>10.4g} {report['setup_wall_seconds']:>8.3f} "
+                  f"{report['run_wall_seconds']:>7.3f} {report['wall_microseconds_per_pair']:>8.1f} {report['events']:>8}")
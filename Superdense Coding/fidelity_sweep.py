@@ -0,0 +1,202 @@
+import argparse
+import os
+import sys
+import numpy as np
+import matplotlib.pyplot as plt
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+from parallel import run_tasks, task_seed
+from result_store import ResultStore, code_version
+from formalism import AUTO
+from tracing import OFF, tracer
+
+# Monte Carlo decoding error sweep of Superdense Coding. For every noise source,
+# gamma and message "00".."11" a task sends `samples` EPR pairs carrying that
+# message and counts what Bob decodes. Only the swept source is noisy, the others
+# stay at 0:
+# - alice: Bob's dp_noise_alice on the qubit arriving from Alice
+# - charlie: Bob's dp_noise_charlie on the qubit arriving from Charlie
+# - channel: DepolarNoiseModel on all three quantum channels, with gamma as the
+#   depolarizing probability per traversal instead of a rate in Hz
+# Results are counts per (sent, decoded) message, from which the confusion matrices
+# and symbol error rate curves follow.
+
+SOURCES = ["alice", "charlie", "channel"]
+MESSAGES = ["00", "01", "10", "11"]
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_STORE = os.path.join(HERE, "fidelity_results.sqlite")
+
+
+def expected_ser(source, gamma):
+    # Any depolarization turns the pair into a uniformly random Bell state, the
+    # channel source depolarizes three qubits per symbol
+    traversals = 3 if source == "channel" else 1
+    return 0.75 * (1 - (1 - np.asarray(gamma)) ** traversals)
+
+
+def transmit(message, samples, alice_rate=0, charlie_rate=0, channel_rate=0, length=10, formalism=AUTO):
+    """Counts of Bob's decoded messages, in MESSAGES order, for `samples` pairs carrying `message`."""
+    import netsquid as ns
+    from netsquid.components import DepolarNoiseModel
+    from superdense_network import network_setup
+    from charlie_protocol import CharlieProtocol
+    from alice_protocol import AliceProtocol
+    from bob_protocol import BobProtocol
+    from batch_coding import OPERATORS, PAIR_INTERVAL
+    from formalism import set_formalism
+
+    ns.sim_reset()
+    channel_noise = DepolarNoiseModel(depolar_rate=channel_rate, time_independent=True)
+    charlie, alice, bob = network_setup(length=length, fibre_delay=True, noise_model=channel_noise)
+    charlie_protocol = CharlieProtocol(charlie, pairs=samples, interval=PAIR_INTERVAL)
+    alice_protocol = AliceProtocol(alice, [message] * samples)
+    bob_protocol = BobProtocol(bob, messages=samples)
+    bob_protocol.dp_noise_alice.depolar_rate = alice_rate
+    bob_protocol.dp_noise_charlie.depolar_rate = charlie_rate
+    set_formalism(formalism, OPERATORS, [channel_noise, alice_protocol.dp_noise, bob_protocol.dp_noise_alice,
+                                         bob_protocol.dp_noise_charlie])
+    for protocol in (charlie_protocol, alice_protocol, bob_protocol):
+        protocol.start()
+    ns.sim_run()
+    decoded = [MESSAGES.index(received) for received in bob_protocol.decoded]
+    return np.bincount(decoded, minlength=len(MESSAGES)).astype(np.int64)
+
+
+def _warm_netsquid():
+    # Pool initializer: import NetSquid and the protocols once per worker. Only Bob's
+    # decoded messages are counted, so the protocols run without tracing
+    import netsquid
+    import batch_coding
+    tracer.configure(level=OFF)
+
+
+def sweep_tasks(sources, gamma_steps, samples, chunk_samples, root_seed):
+    tasks = []
+    for source in sources:
+        for gamma_index in range(gamma_steps):
+            for message in MESSAGES:
+                for chunk, start in enumerate(range(0, samples, chunk_samples)):
+                    tasks.append((source, gamma_index, gamma_steps, message, chunk,
+                                  min(chunk_samples, samples - start), root_seed))
+    return tasks
+
+
+def task_params(task):
+    # Result store key of one task
+    source, gamma_index, gamma_steps, message, chunk, samples, root_seed = task
+    return {"experiment": "superdense_fidelity", "source": source, "gamma_index": gamma_index,
+            "gamma_steps": gamma_steps, "message": message, "chunk": chunk, "samples": samples, "seed": root_seed}
+
+
+def sweep_version():
+    # Results change with the Superdense Coding protocols or the shared helpers (formalism, task seeds)
+    return code_version(HERE, os.path.join(HERE, os.pardir, "common"))
+
+
+def run_sweep_task(task):
+    import netsquid as ns
+
+    source, gamma_index, gamma_steps, message, chunk, samples, root_seed = task
+    gamma = gamma_index / (gamma_steps - 1)
+    seed = task_seed(root_seed, SOURCES.index(source), gamma_index, MESSAGES.index(message), chunk)
+    ns.set_random_state(seed=int(seed.generate_state(1)[0]))
+    return transmit(message, samples, **{f"{source}_rate": gamma})
+
+
+def run_sweep(sources=SOURCES, gamma_steps=21, samples=400, workers=None, root_seed=0, chunk_samples=200,
+              store=None, simulate=True):
+    """Decoding counts for every (source, gamma, message) point.
+
+    Returns {source: array of shape (gamma_steps, 4, 4)}, entry [g, sent, decoded]
+    counting the pairs that carried `sent` and were decoded as `decoded`. Chunks
+    already in the ResultStore are reused and new ones are written as they finish;
+    simulate=False only reads the store and raises KeyError if a chunk is missing.
+    """
+    tasks = sweep_tasks(sources, gamma_steps, samples, chunk_samples, root_seed)
+    results = {}
+    if store is not None:
+        for task in tasks:
+            value = store.get(task_params(task))
+            if value is not None:
+                results[task] = value
+    missing = [task for task in tasks if task not in results]
+    if missing and not simulate:
+        raise KeyError(f"{len(missing)} of {len(tasks)} sweep chunks are not in the result store")
+
+    checkpoint = (lambda task, result: store.put(task_params(task), result)) if store is not None else None
+    computed = run_tasks(run_sweep_task, missing, workers=workers, initializer=_warm_netsquid,
+                         desc="Superdense fidelity sweep", on_result=checkpoint) if missing else []
+    results.update(zip(missing, computed))
+
+    confusion = {source: np.zeros((gamma_steps, len(MESSAGES), len(MESSAGES)), dtype=np.int64) for source in sources}
+    for task in tasks:
+        source, gamma_index, _, message, _, _, _ = task
+        confusion[source][gamma_index, MESSAGES.index(message)] += results[task]
+    return confusion
+
+
+def symbol_error_rates(confusion):
+    # SER per gamma from an array of shape (gamma_steps, 4, 4)
+    correct = np.trace(confusion, axis1=1, axis2=2)
+    return 1 - correct / confusion.sum(axis=(1, 2))
+
+
+def plot_sweep(confusion, samples, gamma_index=None):
+    gamma_steps = next(iter(confusion.values())).shape[0]
+    gamma_values = np.linspace(0, 1, gamma_steps)
+
+    plt.figure(figsize=(8, 6))
+    for source, counts in confusion.items():
+        line, = plt.plot(gamma_values, symbol_error_rates(counts), marker='o', linestyle='-', label=source)
+        plt.plot(gamma_values, expected_ser(source, gamma_values), linestyle='--', color=line.get_color())
+    plt.title("Superdense Coding symbol error rate vs Gamma (dashed: analytic)")
+    plt.xlabel("Gamma (0 - 1)")
+    plt.ylabel("Symbol error rate")
+    plt.grid(True)
+    plt.legend()
+    plt.savefig(os.path.join(HERE, f"SER_vs_Gamma_(N={samples}).png"))
+    plt.close()
+
+    # Confusion matrices at one gamma, row-normalized
+    gamma_index = gamma_steps // 2 if gamma_index is None else gamma_index
+    figure, axes = plt.subplots(1, len(confusion), figsize=(4 * len(confusion), 4), squeeze=False)
+    for axis, (source, counts) in zip(axes[0], confusion.items()):
+        matrix = counts[gamma_index] / np.maximum(counts[gamma_index].sum(axis=1, keepdims=True), 1)
+        axis.imshow(matrix, vmin=0, vmax=1, cmap="Blues")
+        for sent in range(len(MESSAGES)):
+            for decoded in range(len(MESSAGES)):
+                axis.text(decoded, sent, f"{matrix[sent, decoded]:.2f}", ha="center", va="center")
+        axis.set_xticks(range(len(MESSAGES)), MESSAGES)
+        axis.set_yticks(range(len(MESSAGES)), MESSAGES)
+        axis.set_xlabel("Decoded")
+        axis.set_ylabel("Sent")
+        axis.set_title(f"{source}, gamma = {gamma_values[gamma_index]:.2f}")
+    figure.tight_layout()
+    figure.savefig(os.path.join(HERE, f"Confusion_(N={samples}, gamma={gamma_values[gamma_index]:.2f}).png"))
+    plt.close(figure)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Parallel symbol error rate sweep of Superdense Coding")
+    parser.add_argument("--sources", nargs="+", choices=SOURCES, default=SOURCES)
+    parser.add_argument("--steps", type=int, default=21, help="gamma values from 0 to 1")
+    parser.add_argument("--samples", type=int, default=400, help="EPR pairs per message and gamma")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--confusion-index", type=int, default=None, help="gamma index of the confusion plot")
+    parser.add_argument("--store", default=DEFAULT_STORE, help="SQLite result store, 'none' to disable")
+    parser.add_argument("--plot-only", action="store_true", help="plot from the result store without simulating")
+    args = parser.parse_args()
+
+    tracer.configure(level=OFF)
+    store = None if args.store == "none" else ResultStore(args.store, sweep_version())
+    confusion = run_sweep(args.sources, args.steps, args.samples, workers=args.workers, root_seed=args.seed,
+                          store=store, simulate=not args.plot_only)
+    plot_sweep(confusion, args.samples, args.confusion_index)
+    np.savez_compressed(os.path.join(HERE, f"confusion_(N={args.samples}).npz"), gamma=np.linspace(0, 1, args.steps),
+                        **confusion)
+
+    print(f"{'gamma':>6} " + " ".join(f"{source:>8}" for source in confusion))
+    rates = {source: symbol_error_rates(counts) for source, counts in confusion.items()}
+    for gamma_index, gamma in enumerate(np.linspace(0, 1, args.steps)):
+        print(f"{gamma:>6.2f} " + " ".join(f"{rates[source][gamma_index]:>8.4f}" for source in confusion))
@@ -1,4 +1,6 @@
 import netsquid as ns
+import os
+import sys
 from netsquid.qubits import qubitapi as qapi
 from netsquid.protocols import NodeProtocol
 from netsquid.nodes import Node, Network
@@ -6,12 +8,19 @@ from netsquid.components import QuantumChannel, DepolarNoiseModel
 from netsquid.qubits.qubitapi import combine_qubits
 from netsquid.components.models.qerrormodels import DepolarNoiseModel
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+from tracing import DEBUG, INFO, tracer
+from state_inspection import inspector
 
 
-def print_state(qubits, description):
-    """Utility function to print quantum states."""
-    state = qapi.reduced_dm(qubits)
-    print(f"{description}:\n{state}\n")
+def print_state(qubits, description, node=None, step=None):
+    """Utility function to trace quantum states and take the snapshots requested for
+    `step` (state_inspection.py), only computed when tracing or inspection is on."""
+    if step is not None and inspector.wants(step, node):
+        inspector.snapshot(step, node, qubits)
+    if tracer.enabled(DEBUG, node):
+        state = qapi.reduced_dm(qubits)
+        tracer.emit(DEBUG, node, f"{description}:\n{state}\n")
 
 
 class AliceProtocol(NodeProtocol):
@@ -21,35 +30,42 @@ class AliceProtocol(NodeProtocol):
         self.dp_noise = DepolarNoiseModel(depolar_rate=0, time_independent=True)
 
     def run(self):
-        print("Alice's protocol has started.")
+        if tracer.enabled(INFO, self.node.name):
+            tracer.emit(INFO, self.node.name, "Alice's protocol has started.")
         # Wait for qubit from Charlie
         yield self.await_port_input(self.node.ports["port_q_charlie"])
         q = self.node.ports["port_q_charlie"].rx_input().items[0]  # Retrieve the qubit
         # This one introduce the noise for received qubit. Setting it to True the probabillity counts
         #for each iterration, not time related. Change the rate to see the possible errors to your connection;)
         self.dp_noise.error_operation([q]) 
-        print_state([q], "Alice receives qubit")
+        print_state([q], "Alice receives qubit", self.node.name, "alice_receive")
 
         # Encode the message
         if self.operation == "00":
-            print("Alice applies no operation.")
+            if tracer.enabled(DEBUG, self.node.name):
+                tracer.emit(DEBUG, self.node.name, "Alice applies no operation.")
         elif self.operation == "01":
             qapi.operate(q, ns.X)
-            print("Alice applies X gate.")
+            if tracer.enabled(DEBUG, self.node.name):
+                tracer.emit(DEBUG, self.node.name, "Alice applies X gate.")
         elif self.operation == "10":
             qapi.operate(q, ns.Z)
-            print("Alice applies Z gate.")
+            if tracer.enabled(DEBUG, self.node.name):
+                tracer.emit(DEBUG, self.node.name, "Alice applies Z gate.")
         elif self.operation == "11":
             qapi.operate(q, ns.Z)
             qapi.operate(q, ns.X)
-            print("Alice applies Z and X gates.")
+            if tracer.enabled(DEBUG, self.node.name):
+                tracer.emit(DEBUG, self.node.name, "Alice applies Z and X gates.")
         else:
             raise ValueError("Invalid operation.")
 
-        print_state([q], f"Alice encodes message: {self.operation}")
+        print_state([q], f"Alice encodes message: {self.operation}", self.node.name, "alice_encode")
         self.node.ports["port_q_bob"].tx_output(q)  # Send the qubit to Bob
-        print("Alice sends the qubit to Bob.")
-        print("Alice's protocol has ended.")
+        if tracer.enabled(DEBUG, self.node.name):
+            tracer.emit(DEBUG, self.node.name, "Alice sends the qubit to Bob.")
+        if tracer.enabled(INFO, self.node.name):
+            tracer.emit(INFO, self.node.name, "Alice's protocol has ended.")
 
 class BobProtocol(NodeProtocol):
     def __init__(self, node):
@@ -59,37 +75,45 @@ class BobProtocol(NodeProtocol):
         self.dp_noise_charlie = DepolarNoiseModel(depolar_rate=0, time_independent=True)
 
     def run(self):
-        print("Bob's protocol has started.")
+        if tracer.enabled(INFO, self.node.name):
+            tracer.emit(INFO, self.node.name, "Bob's protocol has started.")
 
         # Wait for Charlie's qubit
         yield self.await_port_input(self.node.ports["port_q_charlie"])
         q_bob = self.node.ports["port_q_charlie"].rx_input().items[0]
         self.dp_noise_charlie.error_operation([q_bob ]) 
-        print_state([q_bob], "Bob receives qubit from Charlie")
+        print_state([q_bob], "Bob receives qubit from Charlie", self.node.name, "bob_receive_charlie")
 
         # Wait for Alice's qubit
         yield self.await_port_input(self.node.ports["port_q_alice"])
         q_alice = self.node.ports["port_q_alice"].rx_input().items[0]
         self.dp_noise_alice.error_operation([q_alice ]) 
-        print_state([q_alice], "Bob receives qubit from Alice")
+        print_state([q_alice], "Bob receives qubit from Alice", self.node.name, "bob_receive_alice")
 
         # Apply decoding operations
-        print("Bob starts decoding...")
+        if tracer.enabled(DEBUG, self.node.name):
+            tracer.emit(DEBUG, self.node.name, "Bob starts decoding...")
         qapi.operate([q_bob, q_alice], ns.CX)  # Apply CNOT gate
-        print("Bob applies CNOT gate.")
-        print_state([q_bob, q_alice], "After CNOT gate")
+        if tracer.enabled(DEBUG, self.node.name):
+            tracer.emit(DEBUG, self.node.name, "Bob applies CNOT gate.")
+        print_state([q_bob, q_alice], "After CNOT gate", self.node.name, "bob_after_cnot")
 
         qapi.operate(q_bob, ns.H)  # Apply Hadamard gate
-        print("Bob applies Hadamard gate.")
-        print_state([q_bob, q_alice], "After Hadamard gate")
+        if tracer.enabled(DEBUG, self.node.name):
+            tracer.emit(DEBUG, self.node.name, "Bob applies Hadamard gate.")
+        print_state([q_bob, q_alice], "After Hadamard gate", self.node.name, "bob_after_hadamard")
 
         # Measure the qubits separately
-        print("Preparing to measure qubits separately.")
+        if tracer.enabled(DEBUG, self.node.name):
+            tracer.emit(DEBUG, self.node.name, "Preparing to measure qubits separately.")
         m_qA, p_qA = qapi.measure(q_bob)  # Measure q_bob
         m_qB, p_qB = qapi.measure(q_alice)  # Measure q_alice
-        print(f"Bob decodes message: {m_qA}{m_qB}")
-        print(f"Measurement probabilities: p_qA={p_qA}, p_qB={p_qB}")
-        print("Bob's protocol has ended.")
+        if tracer.enabled(INFO, self.node.name):
+            tracer.emit(INFO, self.node.name, f"Bob decodes message: {m_qA}{m_qB}")
+        if tracer.enabled(DEBUG, self.node.name):
+            tracer.emit(DEBUG, self.node.name, f"Measurement probabilities: p_qA={p_qA}, p_qB={p_qB}")
+        if tracer.enabled(INFO, self.node.name):
+            tracer.emit(INFO, self.node.name, "Bob's protocol has ended.")
 
 
 class CharlieProtocol(NodeProtocol):
@@ -97,17 +121,20 @@ class CharlieProtocol(NodeProtocol):
         super().__init__(node)
 
     def run(self):
-        print("Charlie's protocol has started.")
+        if tracer.enabled(INFO, self.node.name):
+            tracer.emit(INFO, self.node.name, "Charlie's protocol has started.")
         q_A, q_B = qapi.create_qubits(2)  # Create qubits
         qapi.operate(q_A, ns.H)  # Apply Hadamard
         qapi.operate([q_A, q_B], ns.CX)  # Apply CNOT
-        print_state([q_A, q_B], "Charlie creates entanglement")
+        print_state([q_A, q_B], "Charlie creates entanglement", self.node.name, "charlie_entangle")
 
         # Send qubits to Alice and Bob
         self.node.ports["port_q_alice"].tx_output(q_A)
         self.node.ports["port_q_bob"].tx_output(q_B)
-        print("Charlie sends qubits to Alice and Bob.")
-        print("Charlie's protocol has ended.")
+        if tracer.enabled(DEBUG, self.node.name):
+            tracer.emit(DEBUG, self.node.name, "Charlie sends qubits to Alice and Bob.")
+        if tracer.enabled(INFO, self.node.name):
+            tracer.emit(INFO, self.node.name, "Charlie's protocol has ended.")
 
 
 # Create the network
@@ -146,6 +173,9 @@ charlie_protocol.start()
 alice_protocol.start()
 bob_protocol.start()
 
+# Trace every step and quantum state
+tracer.configure(level=DEBUG)
+
 # Run the simulation
 print("\n--- Starting the simulation ---")
 ns.sim_run()
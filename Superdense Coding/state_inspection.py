@@ -0,0 +1,95 @@
+import numpy as np
+
+# Declarative quantum-state snapshots for the Superdense Coding protocols.
+#
+# The protocols pass their qubits to print_state at the named steps below. Nothing
+# is computed unless a snapshot was requested for that step, so batch runs do not
+# pay for density matrices nobody reads. Snapshots are collected in memory and
+# saved as one .npz array file.
+
+STEPS = {
+    "charlie_entangle": "Charlie creates entanglement",
+    "alice_receive": "Alice receives qubit",
+    "alice_encode": "Alice encodes message",
+    "bob_receive_charlie": "Bob receives qubit from Charlie",
+    "bob_receive_alice": "Bob receives qubit from Alice",
+    "bob_after_cnot": "After CNOT gate",
+    "bob_after_hadamard": "After Hadamard gate",
+}
+# Snapshots hold at most two qubits, smaller ones are zero padded to 4 x 4
+MAX_DIMENSION = 4
+
+
+class StateInspector:
+    """Collects reduced density matrices at requested protocol steps."""
+
+    def __init__(self):
+        # step -> list of (node or None, qubit positions or None, every)
+        self.requests = {}
+        self.clear()
+
+    def request(self, step, qubits=None, node=None, every=1):
+        """Snapshot `step` from now on.
+
+        qubits selects positions in the list of qubits the step hands over, e.g.
+        [0] for Bob's own qubit after the CNOT; None takes all of them. node
+        restricts the request to one node, every=n keeps only every n-th occurrence.
+        """
+        if step not in STEPS:
+            raise ValueError(f"Unknown step {step!r}, expected one of {sorted(STEPS)}.")
+        self.requests.setdefault(step, []).append((node, None if qubits is None else list(qubits), every))
+
+    def clear_requests(self):
+        self.requests = {}
+
+    def clear(self):
+        # Forget the collected snapshots
+        self.run = 0
+        self.occurrences = {}
+        self.records = []
+        self.matrices = []
+
+    def next_run(self):
+        # Tag the following snapshots with the next run index, e.g. between Monte Carlo samples
+        self.run += 1
+        self.occurrences = {}
+
+    def wants(self, step, node=None):
+        # True if a request for `step` covers `node`, so other nodes skip snapshot() entirely
+        return any(wanted_node is None or wanted_node == node for wanted_node, _, _ in self.requests.get(step, ()))
+
+    def snapshot(self, step, node, qubits):
+        from netsquid.qubits import qubitapi as qapi
+        import netsquid as ns
+
+        occurrence = self.occurrences.get((step, node), 0)
+        self.occurrences[(step, node)] = occurrence + 1
+        for wanted_node, positions, every in self.requests.get(step, ()):
+            if (wanted_node is not None and wanted_node != node) or occurrence % every:
+                continue
+            selected = qubits if positions is None else [qubits[position] for position in positions]
+            state = qapi.reduced_dm(selected)
+            matrix = np.zeros((MAX_DIMENSION, MAX_DIMENSION), dtype=np.complex128)
+            matrix[:state.shape[0], :state.shape[1]] = state
+            self.records.append((self.run, step, node or "", occurrence, ns.sim_time(), len(selected)))
+            self.matrices.append(matrix)
+
+    def arrays(self):
+        # Column arrays of all snapshots, matrices has shape (snapshots, 4, 4)
+        columns = list(zip(*self.records)) if self.records else [()] * 6
+        return {
+            "run": np.array(columns[0], dtype=np.int64),
+            "step": np.array(columns[1], dtype=str),
+            "node": np.array(columns[2], dtype=str),
+            "occurrence": np.array(columns[3], dtype=np.int64),
+            "sim_time": np.array(columns[4], dtype=np.float64),
+            "num_qubits": np.array(columns[5], dtype=np.uint8),
+            "matrices": np.array(self.matrices, dtype=np.complex128).reshape(-1, MAX_DIMENSION, MAX_DIMENSION),
+        }
+
+    def save(self, path):
+        # One .npz file, read back with np.load(path)
+        np.savez_compressed(path, **self.arrays())
+
+
+inspector = StateInspector()
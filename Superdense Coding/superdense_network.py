@@ -0,0 +1,31 @@
+from netsquid.nodes import Node, Network
+from netsquid.components import QuantumChannel, DepolarNoiseModel
+from netsquid.components.models.delaymodels import FibreDelayModel
+
+
+def network_setup(gamma=0.01, length=10, fibre_delay=False, noise_model=None):
+    # Charlie distributes EPR pairs to Alice and Bob, Alice forwards her encoded qubit to Bob.
+    # noise_model replaces the default channel noise DepolarNoiseModel(depolar_rate=gamma)
+    network = Network("Superdense Coding Network")
+
+    charlie = Node("Charlie", port_names=["port_q_alice", "port_q_bob"])
+    alice = Node("Alice", port_names=["port_q_charlie", "port_q_bob"])
+    bob = Node("Bob", port_names=["port_q_charlie", "port_q_alice"])
+
+    network.add_nodes([charlie, alice, bob])
+
+    # Quantum channels of `length` km; with fibre_delay they take light-in-fibre time
+    if noise_model is None:
+        noise_model = DepolarNoiseModel(depolar_rate=gamma)
+    models = {"quantum_noise": noise_model}
+    if fibre_delay:
+        models["delay_model"] = FibreDelayModel()
+
+    channel_ca = QuantumChannel("Channel_CA", length=length, models=dict(models))
+    channel_cb = QuantumChannel("Channel_CB", length=length, models=dict(models))
+    channel_ab = QuantumChannel("Channel_AB", length=length, models=dict(models))
+
+    network.add_connection(charlie, alice, channel_to=channel_ca, port_name_node1="port_q_alice", port_name_node2="port_q_charlie")
+    network.add_connection(charlie, bob, channel_to=channel_cb, port_name_node1="port_q_bob", port_name_node2="port_q_charlie")
+    network.add_connection(alice, bob, channel_to=channel_ab, port_name_node1="port_q_bob", port_name_node2="port_q_alice")
+    return charlie, alice, bob
@@ -0,0 +1,75 @@
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "BB84"))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "Superdense Coding"))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+from network_set_up import BB84Network
+from batch_coding import send_payload
+from formalism import AUTO, FORMALISMS, resolve_formalism
+from tracing import OFF, tracer
+
+# Speed and correctness of the KET, stabilizer and density matrix formalisms on both
+# protocols. The statistics are checked against the analytic error rates:
+# - BB84: Bob depolarizes every qubit with probability p before measuring, a
+#   depolarized qubit gives a random bit, so QBER = p / 2.
+# - Superdense coding: three depolarizations with probability p per symbol (Alice's
+#   received qubit, both qubits at Bob). Any of them turns the pair into a uniformly
+#   random Bell state, so SER = 3/4 * (1 - (1 - p)^3).
+# Every formalism must match within Z_LIMIT standard errors.
+
+Z_LIMIT = 4.0
+
+
+def bb84_check(formalism, key_length, dp_rate, samples, seed):
+    network = BB84Network(key_length, formalism=formalism)
+    qbers = []
+    start = time.perf_counter()
+    for sample in range(samples):
+        qbers.append(network.run(gamma=dp_rate, seed=seed + sample))
+    wall = (time.perf_counter() - start) / samples
+    qbers = np.array(qbers, dtype=float) / 100
+    expected = dp_rate / 2
+    error = qbers.std(ddof=1) / np.sqrt(samples) if samples > 1 else 0.0
+    return wall, qbers.mean(), expected, error
+
+
+def superdense_check(formalism, payload_bytes, dp_rate, seed):
+    payload = np.random.default_rng(seed).integers(0, 256, payload_bytes, dtype=np.uint8).tobytes()
+    start = time.perf_counter()
+    report = send_payload(payload, gamma=0, dp_rate=dp_rate, seed=seed, formalism=formalism)
+    wall = time.perf_counter() - start
+    expected = 0.75 * (1 - (1 - dp_rate) ** 3)
+    error = np.sqrt(expected * (1 - expected) / report["symbols"])
+    return wall / report["symbols"], report["symbol_error_rate"], expected, error
+
+
+def row(protocol, formalism, wall, measured, expected, error):
+    ok = abs(measured - expected) <= Z_LIMIT * error + 1e-12
+    print(f"{protocol:<11} {formalism:<5} {wall * 1e3:>12.3f} {measured:>9.4f} {expected:>9.4f} {error:>8.4f} "
+          f"{'ok' if ok else 'FAIL':>5}")
+    return ok
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Compare the quantum state formalisms on BB84 and Superdense Coding")
+    parser.add_argument("--key", type=int, default=256)
+    parser.add_argument("--samples", type=int, default=20, help="BB84 runs per formalism")
+    parser.add_argument("--bytes", type=int, default=1024, help="superdense payload size")
+    parser.add_argument("--dp-rate", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    tracer.configure(level=OFF)
+    print(f"auto picks {resolve_formalism(AUTO, ('X', 'Z', 'H', 'CNOT'))} for both protocols (Clifford gates, Pauli noise)")
+    print(f"{'protocol':<11} {'form':<5} {'wall ms/unit':>12} {'measured':>9} {'expected':>9} {'std err':>8} {'check':>5}")
+    passed = True
+    for formalism in FORMALISMS + (AUTO,):
+        passed &= row("bb84", formalism, *bb84_check(formalism, args.key, args.dp_rate, args.samples, args.seed))
+    for formalism in FORMALISMS + (AUTO,):
+        passed &= row("superdense", formalism, *superdense_check(formalism, args.bytes, args.dp_rate, args.seed))
+    # BB84 units are runs, superdense units are symbols
+    sys.exit(0 if passed else 1)
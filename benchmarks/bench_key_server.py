@@ -0,0 +1,105 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "BB84"))
+from key_server import KeyPool, KeyServer, fill_from_stream, serve
+
+# Load test of the key delivery API: `clients` keep-alive connections each fetch a
+# key from enc_keys and redeem it at dec_keys, back to back, for `duration`
+# seconds. By default the pool is topped up with random bytes so the numbers show
+# the API path alone; --bb84 fills it from a live KeyStream instead.
+
+HOST = "127.0.0.1"
+
+
+async def synthetic_fill(pool, chunk=1 << 16):
+    # Both ends get identical random bytes whenever the pool has room
+    while True:
+        await pool.space.wait()
+        material = os.urandom(chunk)
+        pool.add(material, material)
+        await asyncio.sleep(0)
+
+
+async def request(reader, writer, path):
+    writer.write(f"GET {path} HTTP/1.1\r\nHost: {HOST}\r\n\r\n".encode())
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while True:
+        line = await reader.readline()
+        if line == b"\r\n":
+            break
+        name, _, value = line.decode().partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+async def client(port, size, deadline, latencies, failures):
+    reader, writer = await asyncio.open_connection(HOST, port)
+    loop = asyncio.get_running_loop()
+    while loop.time() < deadline:
+        start = time.perf_counter()
+        status, payload = await request(reader, writer, f"/api/v1/keys/SAE_B/enc_keys?number=1&size={size}")
+        latencies["enc_keys"].append(time.perf_counter() - start)
+        if status != 200:
+            failures["enc_keys"] += 1
+            continue
+        key = payload["keys"][0]
+        start = time.perf_counter()
+        status, payload = await request(reader, writer, f"/api/v1/keys/SAE_A/dec_keys?key_ID={key['key_ID']}")
+        latencies["dec_keys"].append(time.perf_counter() - start)
+        if status != 200 or payload["keys"][0]["key"] != key["key"]:
+            failures["dec_keys"] += 1
+    writer.close()
+
+
+async def load_test(clients, duration, size, bb84, port):
+    pool = KeyPool(capacity=1 << 22)
+    listener = await serve(KeyServer(pool, key_size=size), HOST, port)
+    if bb84:
+        from key_stream import KeyStream
+        from tracing import OFF, tracer
+        # Printing per-block protocol records would be timed along with the API
+        tracer.configure(level=OFF)
+        producer = asyncio.ensure_future(fill_from_stream(pool, KeyStream(encryption_key_length=1024, blocks=None,
+                                                                          report_every=0)))
+    else:
+        producer = asyncio.ensure_future(synthetic_fill(pool))
+    # Let the producer put some material in before the clients start
+    await pool.wait_for(clients * size // 8, timeout=30)
+
+    latencies = {"enc_keys": [], "dec_keys": []}
+    failures = {"enc_keys": 0, "dec_keys": 0}
+    deadline = asyncio.get_running_loop().time() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*(client(port, size, deadline, latencies, failures) for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+    producer.cancel()
+    listener.close()
+    await listener.wait_closed()
+    return latencies, failures, elapsed
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Latency and throughput of the local key delivery API")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 8, 64])
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per client count")
+    parser.add_argument("--size", type=int, default=256, help="key size in bits")
+    parser.add_argument("--bb84", action="store_true", help="fill the pool from a live BB84 KeyStream")
+    parser.add_argument("--port", type=int, default=18014)
+    args = parser.parse_args()
+
+    print(f"{'clients':>7} {'endpoint':<9} {'requests':>9} {'p50 (ms)':>9} {'p99 (ms)':>9} {'req/s':>9} {'failed':>7}")
+    for clients in args.clients:
+        latencies, failures, elapsed = asyncio.run(load_test(clients, args.duration, args.size, args.bb84, args.port))
+        for endpoint, values in latencies.items():
+            values = np.array(values) * 1e3
+            p50, p99 = np.percentile(values, [50, 99]) if len(values) else (float("nan"),) * 2
+            print(f"{clients:>7} {endpoint:<9} {len(values):>9} {p50:>9.3f} {p99:>9.3f} {len(values) / elapsed:>9.0f} "
+                  f"{failures[endpoint]:>7}")
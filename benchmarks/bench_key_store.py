@@ -0,0 +1,71 @@
+import argparse
+import os
+import sys
+import tempfile
+import time
+import zlib
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "BB84"))
+from key_store import KeyStore
+
+# Append and read throughput of the key store at gigabyte scale. Keys are appended
+# in batches, read back with zero-copy views (crc32 touches every byte) and consumed
+# one by one; a reopen measures the restart cost of the index.
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return time.perf_counter() - start, result
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Key store append, read and consume throughput")
+    parser.add_argument("--gigabytes", type=float, default=1.0)
+    parser.add_argument("--key-bytes", type=int, default=1024)
+    parser.add_argument("--batch", type=int, default=4096, help="keys per extend call")
+    parser.add_argument("--consume", type=int, default=100000, help="keys consumed one by one")
+    parser.add_argument("--durable", action="store_true", help="fsync every append")
+    parser.add_argument("--directory", default=None, help="where to put the store, a temporary directory by default")
+    args = parser.parse_args()
+
+    total_keys = int(args.gigabytes * 2 ** 30) // args.key_bytes
+    batch = np.random.default_rng(0).integers(0, 256, args.batch * args.key_bytes, dtype=np.uint8).tobytes()
+    keys = [batch[i * args.key_bytes:(i + 1) * args.key_bytes] for i in range(args.batch)]
+
+    with tempfile.TemporaryDirectory(dir=args.directory) as directory:
+        path = os.path.join(directory, "keys")
+        with KeyStore(path, durable=args.durable) as store:
+            def append_all():
+                for start in range(0, total_keys, args.batch):
+                    store.extend(keys[:min(args.batch, total_keys - start)])
+            append_seconds, _ = timed(append_all)
+            single_keys = min(10000, total_keys)
+            single_seconds, _ = timed(lambda: [store.append(keys[i % args.batch]) for i in range(single_keys)])
+
+        reopen_seconds, store = timed(lambda: KeyStore(path))
+        with store:
+            def read_all():
+                checksum = 0
+                for key_id in range(total_keys):
+                    checksum = zlib.crc32(store.read(key_id), checksum)
+                return checksum
+            read_seconds, _ = timed(read_all)
+            consumed = min(args.consume, total_keys)
+            consume_seconds, _ = timed(lambda: [store.consume_next() for _ in range(consumed)])
+            bulk_seconds, bulk = timed(lambda: store.consume_next(total_keys))
+
+        gigabytes = total_keys * args.key_bytes / 2 ** 30
+        print(f"{total_keys} keys of {args.key_bytes} bytes, {gigabytes:.2f} GiB{' (fsync per append)' if args.durable else ''}")
+        print(f"{'operation':<26} {'seconds':>9} {'keys/s':>12} {'GiB/s':>8}")
+        rows = [("append (batched)", append_seconds, total_keys),
+                ("append (single)", single_seconds, single_keys),
+                ("reopen", reopen_seconds, 0),
+                ("read (zero copy + crc32)", read_seconds, total_keys),
+                ("consume_next (single)", consume_seconds, consumed),
+                ("consume_next (bulk)", bulk_seconds, len(bulk))]
+        for name, seconds, count in rows:
+            print(f"{name:<26} {seconds:>9.3f} {count / seconds if count else 0:>12.0f} "
+                  f"{count * args.key_bytes / 2 ** 30 / seconds if count else 0:>8.2f}")
+        del bulk
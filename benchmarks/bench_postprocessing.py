@@ -0,0 +1,65 @@
+import math
+import os
+import random
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "BB84"))
+from postprocessing import extract_key, qber_percentage, select_sample, sift
+
+KEY_LENGTHS = [32, 256, 2048, 16384, 131072, 1000000]
+# The list based pipeline is quadratic, stop timing it past this key length
+LEGACY_LIMIT = 16384
+
+
+def legacy_pipeline(alice_bases, bob_bases, alice_bits, bob_bits, length):
+    # The string/list post-processing the protocols used before postprocessing.py
+    sifted_basis = [i for i, (a_basis, b_basis) in enumerate(zip(alice_bases, bob_bases)) if a_basis == b_basis]
+    random_selection = random.sample(sifted_basis, math.ceil(len(sifted_basis) * 0.20))
+    sifted_basis = [item for item in sifted_basis if item not in random_selection]
+    alice_qber_key = "".join([f"{alice_bits[item]}" for item in random_selection])
+    bob_qber_key = "".join([f"{bob_bits[item]}" for item in random_selection])
+    differing_count = 0
+    for digit1, digit2 in zip(alice_qber_key, bob_qber_key):
+        if digit1 != digit2:
+            differing_count += 1
+    encryption_key = ""
+    for selected_item in sifted_basis[:length]:
+        encryption_key += str(alice_bits[selected_item])
+    return encryption_key
+
+
+def packed_pipeline(alice_bases, bob_bases, alice_bits, bob_bits, length, rng):
+    remaining, sample = select_sample(sift(alice_bases, bob_bases), rng=rng)
+    qber_percentage(alice_bits[sample], bob_bits[sample])
+    return extract_key(remaining, alice_bits, length)
+
+
+def best_time(function, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    print(f"{'K':>9} {'qubits':>9} {'legacy (s)':>12} {'packed (s)':>12} {'speed-up':>9}")
+    for key_length in KEY_LENGTHS:
+        num_bits = 3 * key_length
+        alice_bases = rng.integers(0, 2, num_bits, dtype=np.uint8)
+        bob_bases = rng.integers(0, 2, num_bits, dtype=np.uint8)
+        alice_bits = rng.integers(0, 2, num_bits, dtype=np.uint8)
+        bob_bits = alice_bits ^ (rng.random(num_bits) < 0.05)
+
+        packed = best_time(lambda: packed_pipeline(alice_bases, bob_bases, alice_bits, bob_bits, key_length, rng))
+        if key_length <= LEGACY_LIMIT:
+            lists = [np.where(alice_bases == 1, "X", "Z").tolist(), np.where(bob_bases == 1, "X", "Z").tolist(),
+                     alice_bits.tolist(), bob_bits.astype(np.uint8).tolist()]
+            legacy = best_time(lambda: legacy_pipeline(*lists, key_length), repeat=1)
+            print(f"{key_length:>9} {num_bits:>9} {legacy:>12.5f} {packed:>12.5f} {legacy / packed:>8.1f}x")
+        else:
+            print(f"{key_length:>9} {num_bits:>9} {'-':>12} {packed:>12.5f} {'-':>9}")
@@ -0,0 +1,38 @@
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "BB84"))
+from privacy_amplification import secure_key_length, toeplitz_hash, toeplitz_hash_reference
+
+INPUT_LENGTHS = [1024, 8192, 65536, 1 << 20, 4 << 20]
+QBER = 3
+# The explicit matrix product is O(m n), only time it on small inputs
+REFERENCE_LIMIT = 8192
+
+
+def best_time(function, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    print(f"{'n':>9} {'m':>9} {'matrix (ms)':>12} {'FFT (ms)':>10} {'Mbit/s':>8}")
+    for num_bits in INPUT_LENGTHS:
+        bits = rng.integers(0, 2, num_bits, dtype=np.uint8)
+        # Typical output size after Cascade leaks about 1.2 n h(e)
+        output_length = secure_key_length(num_bits, QBER, int(0.233 * num_bits))
+
+        fft = best_time(lambda: toeplitz_hash(bits, output_length, seed=1))
+        if num_bits <= REFERENCE_LIMIT:
+            assert np.array_equal(toeplitz_hash(bits, output_length, 1), toeplitz_hash_reference(bits, output_length, 1))
+            reference = best_time(lambda: toeplitz_hash_reference(bits, output_length, seed=1), repeat=1)
+            print(f"{num_bits:>9} {output_length:>9} {reference * 1e3:>12.2f} {fft * 1e3:>10.2f} {num_bits / fft / 1e6:>8.1f}")
+        else:
+            print(f"{num_bits:>9} {output_length:>9} {'-':>12} {fft * 1e3:>10.2f} {num_bits / fft / 1e6:>8.1f}")
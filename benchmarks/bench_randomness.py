@@ -0,0 +1,82 @@
+import argparse
+import os
+import random
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "BB84"))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+
+# Cost of the protocols' random draws. The old path called random.randint and
+# random.choice once per qubit at Alice and random.choice once per qubit at Bob;
+# now each side draws a block's bits and bases in one call from its own seeded
+# numpy Generator. --replay checks that a seeded BB84Network run repeats exactly
+# (needs NetSquid).
+
+BLOCK_LENGTHS = [32, 256, 2048, 16384, 131072, 1000000]
+
+
+def per_qubit_draws(num_bits):
+    # Alice's bit and basis plus Bob's basis, one qubit at a time
+    raw_bits, alice_bases, bob_bases = [], [], []
+    for _ in range(num_bits):
+        raw_bits.append(random.randint(0, 1))
+        alice_bases.append(random.choice(["Z", "X"]))
+        bob_bases.append(random.choice(["Z", "X"]))
+    return raw_bits, alice_bases, bob_bases
+
+
+def block_draws(num_bits, alice_rng, bob_rng):
+    raw_bits = alice_rng.integers(0, 2, num_bits, dtype=np.uint8)
+    alice_bases = alice_rng.integers(0, 2, num_bits, dtype=np.uint8)
+    bob_bases = bob_rng.integers(0, 2, num_bits, dtype=np.uint8)
+    return raw_bits, alice_bases, bob_bases
+
+
+def best_time(function, repeat=3):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def replay(key_length, seed, runs=3):
+    # Same seed, same bases, bits and key on both ends, run after run
+    from network_set_up import BB84Network
+    from tracing import OFF, tracer
+
+    tracer.configure(level=OFF)
+
+    def transcript(network):
+        network.run(seed=seed)
+        alice, bob = network.alice_protocol, network.bob_protocol
+        key = np.asarray([] if bob.encryption_key is None else bob.encryption_key)
+        return [alice.raw_bits, alice.bases, bob.bases, bob.raw_bits, key]
+
+    first = transcript(BB84Network(key_length, dp_rate=0.02, seed=seed))
+    network = BB84Network(key_length, dp_rate=0.02)
+    for _ in range(runs):
+        assert all(np.array_equal(a, b) for a, b in zip(first, transcript(network))), "seeded runs differ"
+    print(f"Replay: {runs + 1} runs with seed {seed} gave identical bases, bits and keys")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Per-qubit versus per-block random draws of the BB84 protocols")
+    parser.add_argument("--replay", action="store_true", help="also check that seeded network runs repeat")
+    parser.add_argument("--key", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    alice_rng, bob_rng = (np.random.default_rng(child) for child in np.random.SeedSequence(args.seed).spawn(2))
+    print(f"{'qubits':>9} {'per qubit (ms)':>15} {'per block (ms)':>15} {'speedup':>8} {'Mqubit/s':>9}")
+    for num_bits in BLOCK_LENGTHS:
+        legacy = best_time(lambda: per_qubit_draws(num_bits))
+        bulk = best_time(lambda: block_draws(num_bits, alice_rng, bob_rng))
+        print(f"{num_bits:>9} {legacy * 1e3:>15.3f} {bulk * 1e3:>15.3f} {legacy / bulk:>8.0f} "
+              f"{num_bits / bulk / 1e6:>9.1f}")
+
+    if args.replay:
+        replay(args.key, args.seed)
@@ -0,0 +1,48 @@
+import os
+import sys
+import time
+import netsquid as ns
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "BB84"))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+from Alice import AliceProtocol
+from Bob import BobProtocol
+from network_set_up import BB84Network, network_setup
+from tracing import OFF, tracer
+
+SAMPLES = 200
+KEY_LENGTHS = [32, 256, 2048]
+
+
+def fresh_setup(key_length, gamma):
+    # What Gamma_veriation.py did for every sample before BB84Network
+    alice, bob = network_setup()
+    alice_protocol = AliceProtocol(alice, key_length)
+    bob_protocol = BobProtocol(bob, key_length, dp_rate=gamma)
+    alice_protocol.start()
+    bob_protocol.start()
+
+
+def time_per_sample(function, samples=SAMPLES):
+    start = time.perf_counter()
+    for _ in range(samples):
+        function()
+    return (time.perf_counter() - start) / samples
+
+
+if __name__ == '__main__':
+    tracer.configure(level=OFF)
+    print(f"{'K':>6} {'setup fresh (us)':>17} {'setup reset (us)':>17} {'run fresh (ms)':>15} {'run reset (ms)':>15}")
+    for key_length in KEY_LENGTHS:
+        network = BB84Network(key_length)
+
+        # Setup cost only: building everything versus resetting the reused instances
+        setup_fresh = time_per_sample(lambda: (ns.sim_reset(), fresh_setup(key_length, 0.1)))
+        setup_reset = time_per_sample(lambda: network.reset(gamma=0.1))
+
+        # Whole samples including the simulation
+        samples = max(5, SAMPLES * 32 // key_length)
+        run_fresh = time_per_sample(lambda: (ns.sim_reset(), fresh_setup(key_length, 0.1), ns.sim_run()), samples)
+        run_reset = time_per_sample(lambda: network.run(gamma=0.1), samples)
+
+        print(f"{key_length:>6} {setup_fresh * 1e6:>17.1f} {setup_reset * 1e6:>17.1f} {run_fresh * 1e3:>15.2f} {run_reset * 1e3:>15.2f}")
@@ -0,0 +1,49 @@
+import io
+import os
+import sys
+import timeit
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "common"))
+from tracing import DEBUG, OFF, Tracer
+
+ITERATIONS = 200000
+NODE = "Alice"
+
+
+def hot_loop_without_tracing(tracer, num_bits=ITERATIONS):
+    total = 0
+    for i in range(num_bits):
+        bit, basis = i & 1, "Z"
+        total += bit
+    return total
+
+
+def hot_loop_with_tracing(tracer, num_bits=ITERATIONS):
+    # Same loop with a guarded per-qubit record, as in AliceProtocol
+    total = 0
+    for i in range(num_bits):
+        bit, basis = i & 1, "Z"
+        total += bit
+        if tracer.enabled(DEBUG, NODE):
+            tracer.emit(DEBUG, NODE, f"[Alice] Sent qubit {i+1}/{num_bits}: Bit={bit}, Basis={basis}")
+    return total
+
+
+if __name__ == '__main__':
+    disabled = Tracer(level=OFF)
+    ring_only = Tracer(level=DEBUG, stream=None)
+    printing = Tracer(level=DEBUG, stream=io.StringIO())
+
+    cases = [
+        ("no tracing code", hot_loop_without_tracing, disabled),
+        ("tracing off", hot_loop_with_tracing, disabled),
+        ("ring buffer only", hot_loop_with_tracing, ring_only),
+        ("printing", hot_loop_with_tracing, printing),
+    ]
+    baseline = None
+    print(f"{'case':>18} {'ns / qubit':>11} {'overhead':>9}")
+    for name, function, tracer in cases:
+        seconds = min(timeit.repeat(lambda: function(tracer), number=1, repeat=5))
+        per_qubit = seconds / ITERATIONS * 1e9
+        baseline = baseline or per_qubit
+        print(f"{name:>18} {per_qubit:>11.1f} {per_qubit - baseline:>+8.1f}ns")
@@ -0,0 +1,211 @@
+import argparse
+import datetime
+import importlib.util
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(HERE, os.pardir, "BB84"))
+sys.path.append(os.path.join(HERE, os.pardir, "Superdense Coding"))
+sys.path.append(os.path.join(HERE, os.pardir, "common"))
+from postprocessing import bases_array, bits_array, extract_key, qber_percentage, select_sample, sift
+from tools import encryption_key_generation, qber_calculation
+
+# Key lengths of the Gamma_veriation.py sweep
+KEY_LENGTHS = [32, 64, 128, 256, 512, 1024, 2048]
+HAS_NETSQUID = importlib.util.find_spec("netsquid") is not None
+# Metrics ending in one of these are better when higher, all others when lower
+HIGHER_IS_BETTER = ("_per_second",)
+
+
+def time_per_call(work, min_time=0.2, max_calls=100000):
+    # Repeat work() until min_time has passed, return the mean seconds per call
+    work()
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        work()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or calls >= max_calls:
+            return elapsed / calls
+
+
+def peak_memory(work):
+    # Peak Python heap allocated during one call, measured apart from the timing
+    tracemalloc.start()
+    try:
+        work()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(work, units, unit_name, min_time):
+    seconds = time_per_call(work, min_time)
+    return {
+        "seconds_per_call": seconds,
+        f"{unit_name}_per_second": units / seconds,
+        "peak_memory_bytes": peak_memory(work),
+    }
+
+
+def helper_benchmarks(key_length, rng, min_time):
+    # Sifting, QBER and key extraction helpers on the lists/strings the protocols pass around
+    num_bits = 3 * key_length
+    alice_bases = rng.choice(["Z", "X"], num_bits).tolist()
+    bob_bases = rng.choice(["Z", "X"], num_bits).tolist()
+    alice_bits = rng.integers(0, 2, num_bits).tolist()
+    bob_bits = rng.integers(0, 2, num_bits).tolist()
+    sifted_basis = sift(alice_bases, bob_bases).tolist()
+    alice_string = "".join(str(alice_bits[i]) for i in sifted_basis)
+    bob_string = "".join(str(bob_bits[i]) for i in sifted_basis)
+
+    packed_alice, packed_bob = bits_array(alice_bits), bits_array(bob_bits)
+    results = {
+        f"tools/sifting/K={key_length}": measure(
+            lambda: [i for i, (a, b) in enumerate(zip(alice_bases, bob_bases)) if a == b], num_bits, "qubits", min_time),
+        f"tools/qber_calculation/K={key_length}": measure(
+            lambda: qber_calculation(alice_string, bob_string), len(alice_string), "bits", min_time),
+        f"tools/encryption_key_generation/K={key_length}": measure(
+            lambda: encryption_key_generation(sifted_basis, alice_bits, key_length), key_length, "bits", min_time),
+        f"postprocessing/pipeline/K={key_length}": measure(
+            lambda: _packed_pipeline(alice_bases, bob_bases, packed_alice, packed_bob, key_length, rng), num_bits, "qubits", min_time),
+    }
+    return results
+
+
+def _packed_pipeline(alice_bases, bob_bases, alice_bits, bob_bits, key_length, rng):
+    remaining, sample = select_sample(sift(bases_array(alice_bases), bases_array(bob_bases)), rng=rng)
+    qber_percentage(alice_bits[sample], bob_bits[sample])
+    return extract_key(remaining, alice_bits, key_length)
+
+
+def bb84_benchmarks(key_length, min_time):
+    from network_set_up import BB84Network
+
+    network = BB84Network(key_length)
+    return {f"bb84/protocol_run/K={key_length}": measure(lambda: network.run(gamma=0.05), 3 * key_length, "qubits", min_time)}
+
+
+def network_setup_benchmark(min_time):
+    import netsquid as ns
+    from network_set_up import network_setup
+
+    return {"bb84/network_setup": measure(lambda: (ns.sim_reset(), network_setup()), 1, "networks", min_time)}
+
+
+def superdense_benchmark(min_time):
+    # The Charlie/Alice/Bob exchange of Superdense Coding/main.py, one two-bit message per call
+    import netsquid as ns
+    from superdense_network import network_setup as superdense_network_setup
+    from charlie_protocol import CharlieProtocol
+    from alice_protocol import AliceProtocol
+    from bob_protocol import BobProtocol
+
+    charlie, alice, bob = superdense_network_setup(gamma=0.01)
+    protocols = [CharlieProtocol(charlie), AliceProtocol(alice, operation="11"), BobProtocol(bob)]
+
+    def send_message():
+        ns.sim_reset()
+        for protocol in protocols:
+            protocol.reset()
+        ns.sim_run()
+
+    return {"superdense/message": measure(send_message, 1, "messages", min_time)}
+
+
+def run_suite(key_lengths=KEY_LENGTHS, min_time=0.2, seed=0):
+    from tracing import OFF, tracer
+
+    tracer.configure(level=OFF)
+    rng = np.random.default_rng(seed)
+    results = {}
+    skipped = []
+    for key_length in key_lengths:
+        results.update(helper_benchmarks(key_length, rng, min_time))
+    if HAS_NETSQUID:
+        import netsquid as ns
+
+        ns.set_random_state(seed=seed)
+        results.update(network_setup_benchmark(min_time))
+        for key_length in key_lengths:
+            results.update(bb84_benchmarks(key_length, min_time))
+        results.update(superdense_benchmark(min_time))
+    else:
+        skipped += ["bb84/network_setup", "bb84/protocol_run", "superdense/message"]
+    return {"meta": run_metadata(), "skipped": skipped, "results": results}
+
+
+def run_metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = "unknown"
+    return {
+        "commit": commit,
+        "date": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "netsquid": HAS_NETSQUID,
+    }
+
+
+def compare(current, baseline, tolerance=0.2):
+    """Metrics of `current` that are worse than `baseline` by more than tolerance.
+
+    Returns a list of (benchmark, metric, baseline value, current value, relative change).
+    """
+    regressions = []
+    for name, metrics in current["results"].items():
+        for metric, value in metrics.items():
+            reference = baseline["results"].get(name, {}).get(metric)
+            if not reference:
+                continue
+            change = (value - reference) / reference
+            worse = -change if metric.endswith(HIGHER_IS_BETTER) else change
+            if worse > tolerance:
+                regressions.append((name, metric, reference, value, change))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark suite for the BB84 and Superdense Coding hot paths")
+    parser.add_argument("--keys", type=int, nargs="+", default=KEY_LENGTHS)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds spent timing each benchmark")
+    parser.add_argument("--output", default=None, help="JSON file for the results, default results/<commit>.json")
+    parser.add_argument("--baseline", default=None, help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown before failing")
+    args = parser.parse_args()
+
+    suite = run_suite(args.keys, args.min_time)
+    output = args.output or os.path.join(HERE, "results", f"{suite['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(suite, file, indent=2)
+
+    print(f"{'benchmark':<45} {'s/call':>12} {'throughput':>22} {'peak memory':>12}")
+    for name, metrics in suite["results"].items():
+        throughput = next(f"{value:.4g} {metric[:-len('_per_second')]}/s" for metric, value in metrics.items()
+                          if metric.endswith("_per_second"))
+        print(f"{name:<45} {metrics['seconds_per_call']:>12.3g} {throughput:>22} {metrics['peak_memory_bytes']:>12}")
+    for name in suite["skipped"]:
+        print(f"{name:<45} skipped, netsquid is not installed")
+    print(f"Results written to {output}")
+
+    if args.baseline:
+        with open(args.baseline) as file:
+            regressions = compare(suite, json.load(file), args.tolerance)
+        for name, metric, reference, value, change in regressions:
+            print(f"REGRESSION {name} {metric}: {reference:.4g} -> {value:.4g} ({change:+.1%})")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline")
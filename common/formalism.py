@@ -0,0 +1,73 @@
+import contextlib
+
+# Quantum-state formalism of a run: "ket", "stab" (stabilizer), "dm" (density
+# matrix) or "auto". The auto mode picks the cheapest formalism that can represent
+# every operation and noise model of the run:
+#
+# - stabilizer if only Clifford gates, Pauli-basis measurements and Pauli noise
+#   (depolarizing, dephasing) occur. Pauli noise is then sampled per qubit, so
+#   single runs give pure states and the statistics over runs match DM.
+# - ket if a non-Clifford gate occurs but the noise is still a Pauli channel.
+# - density matrix otherwise, e.g. for amplitude damping (T1/T2) noise.
+#
+# None leaves NetSquid's current formalism (KET unless changed) alone.
+
+KET = "ket"
+STAB = "stab"
+DM = "dm"
+AUTO = "auto"
+FORMALISMS = (KET, STAB, DM)
+
+CLIFFORD_OPERATORS = frozenset(["I", "X", "Y", "Z", "H", "S", "CNOT", "CX", "CZ"])
+PAULI_NOISE_MODELS = frozenset(["DepolarNoiseModel", "DephaseNoiseModel"])
+# Models that drop or delay qubits without acting on the state
+STATELESS_MODELS = frozenset(["FibreLossModel", "FibreDelayModel", "FixedDelayModel", "GaussianDelayModel"])
+
+
+def required_formalism(operators=(), noise_models=()):
+    """Cheapest formalism supporting the operator names and noise model instances given."""
+    noise_names = {type(model).__name__ for model in noise_models if model is not None} - STATELESS_MODELS
+    if noise_names - PAULI_NOISE_MODELS:
+        return DM
+    if set(operators) - CLIFFORD_OPERATORS:
+        return KET
+    return STAB
+
+
+def resolve_formalism(option, operators=(), noise_models=()):
+    if option == AUTO:
+        return required_formalism(operators, noise_models)
+    if option not in FORMALISMS:
+        raise ValueError(f"Unknown formalism {option!r}, expected one of {FORMALISMS + (AUTO,)}.")
+    return option
+
+
+def _netsquid_formalism(name):
+    import netsquid as ns
+    return {KET: ns.QFormalism.KET, STAB: ns.QFormalism.STAB, DM: ns.QFormalism.DM}[name]
+
+
+def set_formalism(option, operators=(), noise_models=()):
+    # Switch NetSquid to the resolved formalism, applies to qubits created afterwards
+    if option is None:
+        return None
+    import netsquid as ns
+
+    name = resolve_formalism(option, operators, noise_models)
+    ns.set_qstate_formalism(_netsquid_formalism(name))
+    return name
+
+
+@contextlib.contextmanager
+def use_formalism(option, operators=(), noise_models=()):
+    # set_formalism for the duration of a with block, then restore the previous one
+    if option is None:
+        yield None
+        return
+    import netsquid as ns
+
+    previous = ns.get_qstate_formalism()
+    try:
+        yield set_formalism(option, operators, noise_models)
+    finally:
+        ns.set_qstate_formalism(previous)
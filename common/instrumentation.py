@@ -0,0 +1,124 @@
+import contextlib
+import csv
+import json
+import time
+import numpy as np
+
+# Per-phase instrumentation of protocol runs.
+#
+# A protocol wraps every phase of its run in `with self.profiler.phase(name):`.
+# The profiler adds up, per phase, the wall clock time, the simulated time and the
+# simulator events the protocol handled. Phases may contain yields: the simulated
+# time then includes the wait for the other node, the wall time includes whatever
+# the simulator did meanwhile. Protocols get the NullProfiler unless profiling is
+# switched on, so the uninstrumented path only pays for an empty context manager.
+
+FIELDS = ["node", "phase", "calls", "wall_time", "sim_time", "events"]
+
+
+def _sim_time():
+    import netsquid as ns
+    return ns.sim_time()
+
+
+class PhaseProfiler:
+    """Wall time, simulated time (ns) and event counts per phase of one node."""
+
+    enabled = True
+
+    def __init__(self, node, event_counter=None, sim_clock=_sim_time):
+        self.node = node
+        # Callable returning the node's running event count, e.g. lambda: protocol.events
+        self.event_counter = event_counter or (lambda: 0)
+        self.sim_clock = sim_clock
+        self.clear()
+
+    def clear(self):
+        # phase name -> [calls, wall time (s), simulated time (ns), events]
+        self.phases = {}
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        wall_start = time.perf_counter()
+        sim_start = self.sim_clock()
+        events_start = self.event_counter()
+        try:
+            yield
+        finally:
+            totals = self.phases.setdefault(name, [0, 0.0, 0.0, 0])
+            totals[0] += 1
+            totals[1] += time.perf_counter() - wall_start
+            totals[2] += self.sim_clock() - sim_start
+            totals[3] += self.event_counter() - events_start
+
+    def records(self):
+        # One dict per phase, the rows of the JSON/CSV exports
+        return [{"node": self.node, "phase": name, "calls": calls, "wall_time": wall, "sim_time": sim, "events": events}
+                for name, (calls, wall, sim, events) in self.phases.items()]
+
+
+class NullProfiler:
+    """Drop-in PhaseProfiler that records nothing."""
+
+    enabled = False
+    _context = contextlib.nullcontext()
+
+    def __init__(self, node=None, event_counter=None, sim_clock=None):
+        self.node = node
+        self.phases = {}
+
+    def clear(self):
+        pass
+
+    def phase(self, name):
+        return self._context
+
+    def records(self):
+        return []
+
+
+NULL_PROFILER = NullProfiler()
+
+
+def make_profiler(enabled, node, event_counter=None):
+    return PhaseProfiler(node, event_counter) if enabled else NULL_PROFILER
+
+
+def run_records(*profilers, **labels):
+    # Records of all nodes of one run, tagged with labels such as key_length=32, gamma=0.1
+    return [dict(labels, **record) for profiler in profilers for record in profiler.records()]
+
+
+def aggregate(records, by=("node", "phase")):
+    """Mean, standard deviation and total of every metric over many runs.
+
+    records holds the run_records of all runs of a sweep point; rows are grouped
+    by the `by` fields, e.g. add "gamma" to get one row per gamma and phase.
+    """
+    groups = {}
+    for record in records:
+        groups.setdefault(tuple(record[field] for field in by), []).append(record)
+    rows = []
+    for key, group in groups.items():
+        row = dict(zip(by, key))
+        row["runs"] = len(group)
+        for metric in FIELDS[2:]:
+            values = np.array([record[metric] for record in group], dtype=float)
+            row[f"{metric}_mean"] = float(values.mean())
+            row[f"{metric}_std"] = float(values.std(ddof=1)) if len(values) > 1 else 0.0
+            row[f"{metric}_total"] = float(values.sum())
+        rows.append(row)
+    return rows
+
+
+def export_json(path, records):
+    with open(path, "w") as file:
+        json.dump(records, file, indent=2)
+
+
+def export_csv(path, records):
+    fields = list(dict.fromkeys(field for record in records for field in record))
+    with open(path, "w", newline="") as file:
+        writer = csv.DictWriter(file, fieldnames=fields)
+        writer.writeheader()
+        writer.writerows(records)
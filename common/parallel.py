@@ -0,0 +1,55 @@
+import multiprocessing
+import os
+import numpy as np
+from tqdm import tqdm
+
+
+def task_seed(root_seed, *key):
+    """Independent, reproducible seed for the task identified by `key`.
+
+    The seed only depends on the root seed and the task key, never on which
+    worker runs the task or in which order, so results do not change with the
+    number of workers.
+    """
+    return np.random.SeedSequence(root_seed, spawn_key=tuple(int(k) for k in key))
+
+
+def run_tasks(function, tasks, workers=None, initializer=None, desc=None, on_result=None):
+    """Run function(task) for every task on a process pool.
+
+    Tasks are dispatched in the given order, so callers should put the most
+    expensive ones first. Results are returned in task order. A single
+    tqdm bar tracks completions across all workers. on_result(task, result),
+    if given, is called in the parent process as soon as each task finishes,
+    e.g. to checkpoint partial results.
+    """
+    tasks = list(tasks)
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(tasks)))
+    results = [None] * len(tasks)
+
+    with tqdm(total=len(tasks), desc=desc) as progress:
+        if workers == 1:
+            if initializer is not None:
+                initializer()
+            for index, task in enumerate(tasks):
+                results[index] = function(task)
+                if on_result is not None:
+                    on_result(task, results[index])
+                progress.update()
+            return results
+
+        with multiprocessing.Pool(workers, initializer=initializer) as pool:
+            indexed = pool.imap_unordered(_indexed_call, [(function, index, task) for index, task in enumerate(tasks)], chunksize=1)
+            for index, result in indexed:
+                results[index] = result
+                if on_result is not None:
+                    on_result(tasks[index], result)
+                progress.update()
+    return results
+
+
+def _indexed_call(item):
+    function, index, task = item
+    return index, function(task)
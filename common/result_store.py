@@ -0,0 +1,87 @@
+import glob
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import time
+import numpy as np
+
+
+def code_version(*paths):
+    """Short hash of the source files that produce a result.
+
+    Directories stand for all the .py files inside them. Results stored under
+    an older version are ignored, so editing the protocols invalidates the cache.
+    """
+    files = []
+    for path in paths:
+        files += sorted(glob.glob(os.path.join(path, "*.py"))) if os.path.isdir(path) else [path]
+    digest = hashlib.sha1()
+    for file in files:
+        digest.update(os.path.basename(file).encode())
+        with open(file, "rb") as source:
+            digest.update(source.read())
+    return digest.hexdigest()[:12]
+
+
+def _params_key(params):
+    return json.dumps(params, sort_keys=True, separators=(",", ":"))
+
+
+class ResultStore:
+    """SQLite file of NumPy results keyed by a parameter dict and a code version.
+
+    Every put is committed at once, so a long sweep that writes each finished
+    point is checkpointed and can be resumed after a crash.
+    """
+
+    def __init__(self, path, version=""):
+        self.path = path
+        self.version = version
+        self.connection = sqlite3.connect(path)
+        self.connection.execute("CREATE TABLE IF NOT EXISTS results ("
+                                "params TEXT NOT NULL, version TEXT NOT NULL, value BLOB NOT NULL, created REAL NOT NULL, "
+                                "PRIMARY KEY (params, version))")
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __contains__(self, params):
+        return self.connection.execute("SELECT 1 FROM results WHERE params = ? AND version = ?",
+                                       (_params_key(params), self.version)).fetchone() is not None
+
+    def get(self, params, default=None):
+        row = self.connection.execute("SELECT value FROM results WHERE params = ? AND version = ?",
+                                      (_params_key(params), self.version)).fetchone()
+        return default if row is None else np.load(io.BytesIO(row[0]), allow_pickle=False)
+
+    def put(self, params, value):
+        buffer = io.BytesIO()
+        np.save(buffer, np.asarray(value), allow_pickle=False)
+        self.connection.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                                (_params_key(params), self.version, buffer.getvalue(), time.time()))
+        self.connection.commit()
+
+    def memoize(self, params, function):
+        # Stored value for params, computing and storing it on a miss
+        value = self.get(params)
+        if value is None:
+            value = np.asarray(function())
+            self.put(params, value)
+        return value
+
+    def query(self, **filters):
+        # (params, value) of this version whose params contain all the given items
+        rows = self.connection.execute("SELECT params, value FROM results WHERE version = ?", (self.version,)).fetchall()
+        for params_json, value in rows:
+            params = json.loads(params_json)
+            if all(params.get(name) == wanted for name, wanted in filters.items()):
+                yield params, np.load(io.BytesIO(value), allow_pickle=False)
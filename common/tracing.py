@@ -0,0 +1,67 @@
+import collections
+import contextlib
+import sys
+
+# Trace levels, a tracer emits every record at or below its level
+OFF = 0
+ERROR = 1
+WARNING = 2
+INFO = 3
+DEBUG = 4
+
+LEVEL_NAMES = {ERROR: "ERROR", WARNING: "WARNING", INFO: "INFO", DEBUG: "DEBUG"}
+
+
+class Tracer:
+    """Levelled, per-node filtered tracing with a bounded in-memory ring buffer.
+
+    Call sites guard every record with `enabled` so that message formatting and
+    state inspection only run when the record is actually wanted:
+
+        if tracer.enabled(DEBUG, "Alice"):
+            tracer.emit(DEBUG, "Alice", f"[Alice] Sent qubit {i}")
+    """
+
+    def __init__(self, level=INFO, nodes=None, ring_size=10000, stream=sys.stdout):
+        self.level = level
+        # None traces every node, otherwise a set of node names
+        self.nodes = None if nodes is None else set(nodes)
+        # Stream the records are printed to, None keeps them in the ring buffer only
+        self.stream = stream
+        self.ring = collections.deque(maxlen=ring_size)
+
+    def configure(self, level=None, nodes=(), ring_size=None, stream=()):
+        # Only the given settings change; nodes=None and stream=None are valid values
+        if level is not None:
+            self.level = level
+        if nodes != ():
+            self.nodes = None if nodes is None else set(nodes)
+        if ring_size is not None:
+            self.ring = collections.deque(self.ring, maxlen=ring_size)
+        if stream != ():
+            self.stream = stream
+
+    def enabled(self, level, node=None):
+        return level <= self.level and (self.nodes is None or node in self.nodes)
+
+    def emit(self, level, node, message):
+        self.ring.append((level, node, message))
+        if self.stream is not None:
+            print(message, file=self.stream)
+
+    def dump(self, stream=sys.stderr):
+        # Write out the buffered records, oldest first
+        for level, node, message in self.ring:
+            print(f"{LEVEL_NAMES.get(level, level)} {node}: {message}", file=stream)
+
+    @contextlib.contextmanager
+    def dump_on_error(self, stream=sys.stderr):
+        try:
+            yield self
+        except BaseException:
+            self.dump(stream)
+            raise
+
+
+# Process wide tracer shared by all protocols
+tracer = Tracer()
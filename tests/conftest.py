@@ -0,0 +1,7 @@
+import os
+import sys
+
+# The scripts import their neighbours as bare modules, make them importable like they see each other
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+for directory in ("BB84", "common", "BB84 | QBER examination and Results", "Superdense Coding"):
+    sys.path.append(os.path.join(ROOT, directory))
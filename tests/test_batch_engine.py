@@ -0,0 +1,37 @@
+import numpy as np
+from batch_engine import encryption_keys, qber_curve, run_batch
+
+
+def test_noiseless_runs_agree():
+    result = run_batch(32, 0.0, samples=50, rng=1)
+    assert np.all(result["qber"] == 0)
+    assert np.all(result["key_errors"] == 0)
+    assert np.all(result["accepted"])
+    assert encryption_keys(result, "alice") == encryption_keys(result, "bob")
+
+
+def test_key_never_exceeds_requested_length():
+    result = run_batch(16, 0.05, samples=50, rng=2)
+    assert np.all(result["key_bits"] <= 16)
+    assert [len(key) for key in encryption_keys(result)] == list(result["key_bits"])
+
+
+def test_same_seed_same_runs():
+    first, second = run_batch(32, 0.1, samples=10, rng=7), run_batch(32, 0.1, samples=10, rng=7)
+    for name in first:
+        assert np.array_equal(first[name], second[name])
+
+
+def test_empty_sample_is_discarded():
+    # Like BobProtocol, no sampled bits counts as a QBER of 100
+    result = run_batch(0, 0.0, samples=3, rng=3)
+    assert np.all(result["sample_size"] == 0)
+    assert np.all(result["qber"] == 100)
+    assert not result["accepted"].any()
+
+
+def test_qber_grows_with_noise():
+    # A depolarized qubit measured in the right basis flips with probability gamma / 2
+    curve = qber_curve(64, [0.0, 0.2], samples=400, rng=4)
+    assert curve[0] == 0
+    assert abs(curve[1] - 10) < 1.5
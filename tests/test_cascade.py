@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+from cascade import ParityOracle, cascade, decode_queries, encode_queries, reconcile_local
+
+
+def noisy_copy(num_bits, percent, seed):
+    rng = np.random.default_rng(seed)
+    alice_bits = rng.integers(0, 2, num_bits, dtype=np.uint8)
+    return alice_bits, alice_bits ^ (rng.random(num_bits) < percent / 100).astype(np.uint8)
+
+
+@pytest.mark.parametrize("percent", [1, 3, 5, 8])
+@pytest.mark.parametrize("seed", range(3))
+def test_cascade_removes_every_error(percent, seed):
+    alice_bits, bob_bits = noisy_copy(2000, percent, seed)
+    result = reconcile_local(alice_bits, bob_bits, percent, seed=seed)
+    assert np.array_equal(result["bits"], alice_bits)
+    assert result["corrected"] == int((alice_bits != bob_bits).sum())
+    # Bob's input is left untouched
+    assert not np.array_equal(bob_bits, alice_bits)
+
+
+def test_identical_bits_only_cost_the_top_level_parities():
+    alice_bits, _ = noisy_copy(500, 0, 0)
+    result = reconcile_local(alice_bits, alice_bits.copy(), 2, passes=4, seed=1)
+    assert result["corrected"] == 0
+    assert result["round_trips"] == 4
+
+
+def test_queries_survive_the_classical_message():
+    # Alice answers from the decoded message exactly as Bob's generator expects
+    alice_bits, bob_bits = noisy_copy(300, 5, 9)
+    oracle = None
+    reconciliation = cascade(bob_bits, 5, seed=4)
+    try:
+        queries = next(reconciliation)
+        while True:
+            seed, passes, decoded = decode_queries(encode_queries(4, 4, queries))
+            assert decoded == [tuple(query) for query in queries]
+            oracle = oracle or ParityOracle(alice_bits, passes, seed)
+            queries = reconciliation.send(oracle.parities(decoded))
+    except StopIteration as done:
+        assert np.array_equal(done.value["bits"], alice_bits)
+
+
+def test_empty_input():
+    result = reconcile_local([], [], 3)
+    assert len(result["bits"]) == 0 and result["leaked_bits"] == 0
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+from codec import decode_bases, decode_sifting, encode_bases, encode_sifting
+from postprocessing import LOST, X_BASIS, Z_BASIS
+
+
+def test_bases_round_trip():
+    bases = np.random.default_rng(0).integers(Z_BASIS, X_BASIS + 1, 101, dtype=np.uint8)
+    assert np.array_equal(decode_bases(encode_bases(bases)), bases)
+
+
+def test_bases_round_trip_with_lost_qubits():
+    bases = np.array([Z_BASIS, LOST, X_BASIS, X_BASIS, LOST, Z_BASIS, Z_BASIS, X_BASIS, LOST], dtype=np.uint8)
+    assert np.array_equal(decode_bases(encode_bases(bases)), bases)
+
+
+def test_sifting_round_trip():
+    # The sample comes back in ascending position order, with its bits reordered to match
+    sifted = [0, 3, 4, 7, 9, 12]
+    selection, bits = [9, 3, 12], "101"
+    assert decode_sifting(encode_sifting(16, sifted, selection, bits)) == (sifted, [3, 9, 12], "011")
+
+
+def test_wrong_message_type_is_rejected():
+    with pytest.raises(ValueError):
+        decode_sifting(encode_bases("ZX"))
+
+
+def test_letters_and_codes_encode_alike():
+    assert encode_bases("ZX-Z") == encode_bases(np.array([Z_BASIS, X_BASIS, LOST, Z_BASIS], dtype=np.uint8))
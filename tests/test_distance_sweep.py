@@ -0,0 +1,39 @@
+from types import SimpleNamespace
+import numpy as np
+import pytest
+from distance_sweep import distance_sweep, keys_match, summarize, task_params
+from result_store import ResultStore
+
+
+def network(alice_key, bob_key):
+    # Only the protocol attributes keys_match reads
+    return SimpleNamespace(alice_protocol=SimpleNamespace(encryption_key=alice_key),
+                           bob_protocol=SimpleNamespace(encryption_key=bob_key))
+
+
+def test_only_matching_keys_count():
+    assert keys_match(network(b"\x0f\xf0", b"\x0f\xf0"))
+    assert not keys_match(network(b"\x0f\xf0", b"\x0f\xf1"))
+    assert not keys_match(network(None, None))
+    assert not keys_match(network(b"\x0f", None))
+
+
+def test_reconciliation_is_part_of_the_store_key(tmp_path):
+    # Points stored without Cascade are never reused for runs with privacy amplification
+    options = {"key_length": 256, "dp_rate": 0.02, "attenuation": 0.2, "loss_init": 0.0, "window": 16}
+    task = (0, 10, 2, 0)
+    with ResultStore(str(tmp_path / "results.sqlite")) as store:
+        store.put(task_params(task, dict(options, reconciliation=None, privacy_amplification=False)), np.ones((2, 3)))
+        store.put(task_params(task, dict(options, reconciliation="cascade", privacy_amplification=True)),
+                  np.zeros((2, 3)))
+        assert distance_sweep([10], 2, privacy_amplification=False, store=store)[10].tolist() == [[1, 1, 1]] * 2
+        assert distance_sweep([10], 2, privacy_amplification=True, store=store)[10].tolist() == [[0, 0, 0]] * 2
+
+
+def test_summarize():
+    # Two runs of 1 us each at one distance, one of them discarded
+    runs = np.array([[2.0, 100, 1e3], [4.0, 0, 1e3]])
+    row, = summarize({25: runs})
+    assert row["distance"] == 25 and row["qber"] == 3.0
+    assert row["key_rate"] == pytest.approx(100 / 2e-6)
+    assert row["discard_ratio"] == 0.5
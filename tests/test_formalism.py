@@ -0,0 +1,51 @@
+import pytest
+from formalism import AUTO, DM, KET, STAB, required_formalism, resolve_formalism, set_formalism, use_formalism
+
+
+class DepolarNoiseModel:
+    # Stand-ins named like the NetSquid models, required_formalism only looks at the class name
+    pass
+
+
+class T1T2NoiseModel:
+    pass
+
+
+class FibreLossModel:
+    pass
+
+
+def test_clifford_circuit_with_pauli_noise_uses_stabilizers():
+    assert required_formalism(["H", "CNOT", "X", "Z"], [DepolarNoiseModel(), FibreLossModel(), None]) == STAB
+    assert required_formalism() == STAB
+
+
+def test_non_clifford_gate_needs_ket():
+    assert required_formalism(["H", "T"], [DepolarNoiseModel()]) == KET
+
+
+def test_amplitude_damping_needs_density_matrices():
+    assert required_formalism(["H"], [T1T2NoiseModel()]) == DM
+
+
+def test_resolve():
+    assert resolve_formalism(AUTO, ["H", "T"]) == KET
+    assert resolve_formalism(DM, ["H"]) == DM
+    with pytest.raises(ValueError):
+        resolve_formalism("sparse")
+
+
+def test_none_leaves_the_formalism_alone():
+    # No NetSquid call at all, so this also holds without NetSquid installed
+    assert set_formalism(None, ["T"]) is None
+    with use_formalism(None) as name:
+        assert name is None
+
+
+def test_use_formalism_restores_the_previous_one():
+    ns = pytest.importorskip("netsquid")
+    previous = ns.get_qstate_formalism()
+    with use_formalism(AUTO, ["H", "CNOT"]) as name:
+        assert name == STAB
+        assert ns.get_qstate_formalism() == ns.QFormalism.STAB
+    assert ns.get_qstate_formalism() == previous
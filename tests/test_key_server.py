@@ -0,0 +1,56 @@
+import asyncio
+import base64
+import json
+from key_server import KeyPool, KeyServer
+
+
+def test_both_copies_are_cut_at_the_same_offsets():
+    pool = KeyPool()
+    pool.add(bytes(range(10)), bytes(range(10)) + b"extra")
+    assert pool.stored() == 10
+    key_ids = []
+    for size in (3, 3, 4):
+        key_id, alice_key = pool.take(size)
+        assert pool.redeem(key_id) == alice_key
+        key_ids.append(key_id)
+    assert pool.stored() == 0
+    # A key is handed to the slave SAE once
+    assert pool.redeem(key_ids[0]) is None
+
+
+def test_capacity_blocks_producers_until_keys_are_taken():
+    pool = KeyPool(capacity=8)
+    pool.add(bytes(8), bytes(8))
+    assert not pool.space.is_set()
+    pool.take(4)
+    assert pool.space.is_set()
+
+
+def test_wait_for_times_out_and_wakes_up():
+    async def scenario():
+        pool = KeyPool()
+        assert not await pool.wait_for(4, 0.01)
+        asyncio.get_running_loop().call_later(0.01, pool.add, bytes(4), bytes(4))
+        return await pool.wait_for(4, 1.0)
+
+    assert asyncio.run(scenario())
+
+
+def test_enc_keys_and_dec_keys_hand_out_the_same_key():
+    async def scenario():
+        pool = KeyPool()
+        pool.add(bytes(range(64)), bytes(range(64)))
+        server = KeyServer(pool, timeout=0.01)
+        status, payload = await server.dispatch("GET", "/api/v1/keys/SAE_B/enc_keys?number=2&size=128", b"")
+        assert status == 200
+        body = json.dumps({"key_IDs": [{"key_ID": key["key_ID"]} for key in payload["keys"]]}).encode()
+        status, redeemed = await server.dispatch("POST", "/api/v1/keys/SAE_A/dec_keys", body)
+        assert status == 200 and redeemed == payload
+        assert [len(base64.b64decode(key["key"])) for key in payload["keys"]] == [16, 16]
+        # The pool holds 32 more bytes, not enough for three 128 bit keys
+        status, _ = await server.dispatch("GET", "/api/v1/keys/SAE_B/enc_keys?number=3&size=128", b"")
+        assert status == 503
+        status, _ = await server.dispatch("GET", "/api/v1/keys/SAE_A/enc_keys", b"")
+        assert status == 401
+
+    asyncio.run(scenario())
@@ -0,0 +1,89 @@
+import multiprocessing
+import os
+import pytest
+from key_store import INDEX_DTYPE, KeyStore
+from tools import KeyBlock
+
+
+def test_append_read_consume(tmp_path):
+    with KeyStore(str(tmp_path / "store")) as store:
+        assert store.append(b"\x01\x02") == 0
+        assert store.extend([b"\x03", b"\x04\x05\x06"], [5, 20]) == [1, 2]
+        assert len(store) == 3 and store.available() == 3
+        assert bytes(store.read(2)) == b"\x04\x05\x06"
+        assert bytes(store.consume(1)) == b"\x03"
+        with pytest.raises(ValueError):
+            store.consume(1)
+        with pytest.raises(KeyError):
+            store.consume(3)
+        # Reading never consumes
+        assert bytes(store.read(1)) == b"\x03" and store.available() == 2
+
+
+def test_consume_next_skips_consumed_keys(tmp_path):
+    with KeyStore(str(tmp_path / "store")) as store:
+        store.extend([bytes([i]) for i in range(200)])
+        store.consume(0)
+        store.consume(2)
+        taken = store.consume_next(3)
+        assert [key_id for key_id, _ in taken] == [1, 3, 4]
+        assert [bytes(view) for _, view in taken] == [b"\x01", b"\x03", b"\x04"]
+        assert len(store.consume_next(500)) == 195
+        assert store.consume_next() == []
+
+
+def test_reopen_keeps_keys_and_consumption(tmp_path):
+    path = str(tmp_path / "store")
+    with KeyStore(path) as store:
+        store.extend([b"a", b"b", b"c"], [1, 2, 3])
+        store.consume(1)
+    with KeyStore(path) as store:
+        assert store.available() == 2
+        assert store.index["bits"].tolist() == [1, 2, 3]
+        assert [key_id for key_id, _ in store.consume_next(5)] == [0, 2]
+        assert store.append(b"d") == 3
+
+
+def test_torn_index_record_is_dropped(tmp_path):
+    path = str(tmp_path / "store")
+    with KeyStore(path) as store:
+        store.extend([b"a", b"b"])
+    with open(f"{path}.idx", "ab") as index:
+        index.write(b"\x00" * (INDEX_DTYPE.itemsize // 2))
+    with KeyStore(path) as store:
+        assert len(store) == 2
+        assert os.path.getsize(f"{path}.idx") == 2 * INDEX_DTYPE.itemsize
+
+
+def test_sink_keeps_agreed_blocks_only(tmp_path):
+    with KeyStore(str(tmp_path / "store")) as store:
+        store.sink(KeyBlock(0, b"\xff", 7, 1.0, False, 0.0, 0.0))
+        store.sink(KeyBlock(1, None, 0, 30.0, True, 0.0, 0.0))
+        assert len(store) == 1 and bytes(store.read(0)) == b"\xff"
+        # read maps the new record
+        assert store.index["bits"].tolist() == [7]
+
+
+def _consume_all(path, queue):
+    with KeyStore(path) as store:
+        taken = []
+        while True:
+            batch = store.consume_next(7)
+            if not batch:
+                break
+            taken += [key_id for key_id, _ in batch]
+        queue.put(taken)
+
+
+def test_processes_never_share_a_key(tmp_path):
+    path = str(tmp_path / "store")
+    with KeyStore(path) as store:
+        store.extend([bytes(4)] * 500)
+    queue = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=_consume_all, args=(path, queue)) for _ in range(3)]
+    for worker in workers:
+        worker.start()
+    taken = [key_id for _ in workers for key_id in queue.get(timeout=30)]
+    for worker in workers:
+        worker.join()
+    assert sorted(taken) == list(range(500))
@@ -0,0 +1,29 @@
+import numpy as np
+from parallel import run_tasks, task_seed
+
+
+def draw(task):
+    # Module level so the worker processes can unpickle it
+    root_seed, index = task
+    return np.random.default_rng(task_seed(root_seed, index)).random(4)
+
+
+def test_task_seed_depends_only_on_root_and_key():
+    assert task_seed(5, 1, 2).generate_state(4).tolist() == task_seed(5, 1, 2).generate_state(4).tolist()
+    assert task_seed(5, 1, 2).generate_state(4).tolist() != task_seed(5, 2, 1).generate_state(4).tolist()
+    assert task_seed(5, 1).generate_state(4).tolist() != task_seed(6, 1).generate_state(4).tolist()
+
+
+def test_results_do_not_depend_on_workers_or_order():
+    tasks = [(3, index) for index in range(6)]
+    serial = run_tasks(draw, tasks, workers=1)
+    pooled = run_tasks(draw, tasks, workers=2)
+    reordered = run_tasks(draw, tasks[::-1], workers=2)[::-1]
+    for a, b, c in zip(serial, pooled, reordered):
+        assert np.array_equal(a, b) and np.array_equal(a, c)
+
+
+def test_on_result_sees_every_task():
+    seen = []
+    run_tasks(draw, [(0, index) for index in range(3)], workers=1, on_result=lambda task, result: seen.append(task))
+    assert sorted(seen) == [(0, 0), (0, 1), (0, 2)]
@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+from postprocessing import (LOST, X_BASIS, Z_BASIS, bases_to_string, extract_key, key_to_string, load_matrix,
+                            measurement_matrix, qber_percentage, remove_positions, select_sample, sift, write_matrix)
+from tools import encryption_key_generation, qber_calculation
+
+
+def test_sift_skips_lost_qubits():
+    assert sift("ZXZX-", "ZZZX-").tolist() == [0, 2, 3]
+    alice = np.array([Z_BASIS, X_BASIS, Z_BASIS], dtype=np.uint8)
+    bob = np.array([Z_BASIS, LOST, Z_BASIS], dtype=np.uint8)
+    assert sift(alice, bob).tolist() == [0, 2]
+
+
+def test_select_sample_partitions_the_sifted_positions():
+    sifted = np.arange(0, 200, 3)
+    remaining, sample = select_sample(sifted, rng=0)
+    assert len(sample) == 14
+    assert sorted(remaining.tolist() + sample.tolist()) == sifted.tolist()
+    assert remaining.tolist() == sorted(remaining.tolist())
+
+
+def test_remove_positions_keeps_order():
+    assert remove_positions([9, 2, 7, 4], [7, 9]).tolist() == [2, 4]
+    assert remove_positions([1, 2], []).tolist() == [1, 2]
+
+
+@pytest.mark.parametrize("length", [1, 7, 8, 9, 100])
+def test_qber_matches_the_string_version(length):
+    rng = np.random.default_rng(length)
+    alice, bob = rng.integers(0, 2, length, dtype=np.uint8), rng.integers(0, 2, length, dtype=np.uint8)
+    as_string = lambda bits: (bits + ord("0")).tobytes().decode()
+    assert qber_percentage(alice, bob) == pytest.approx(qber_calculation(as_string(alice), as_string(bob)))
+    assert qber_percentage(as_string(alice), as_string(bob)) == qber_percentage(alice, bob)
+
+
+def test_qber_rejects_different_lengths():
+    with pytest.raises(ValueError):
+        qber_percentage("010", "01")
+
+
+def test_extract_key_matches_encryption_key_generation():
+    raw_bits = np.random.default_rng(1).integers(0, 2, 60, dtype=np.uint8)
+    sifted = list(range(0, 60, 2))
+    for length in (5, 16, 40):
+        key = extract_key(sifted, raw_bits, length)
+        assert key_to_string(key, min(length, len(sifted))) == encryption_key_generation(sifted, raw_bits, length)
+
+
+def test_bases_to_string():
+    assert bases_to_string("ZX-") == "Z X -"
+
+
+def test_matrix_blocks_stream_into_one_file(tmp_path):
+    path = tmp_path / "matrix.bin"
+    write_matrix(path, measurement_matrix("ZX", "01", block=0))
+    write_matrix(path, measurement_matrix("-Z", [0, 1], block=1), append=True)
+    matrix = load_matrix(path)
+    assert matrix["block"].tolist() == [0, 0, 1, 1]
+    assert matrix["basis"].tolist() == [Z_BASIS, X_BASIS, LOST, Z_BASIS]
+    assert matrix["bit"].tolist() == [0, 1, 0, 1]
@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+import privacy_amplification
+from privacy_amplification import amplify, secure_key_length, toeplitz_hash, toeplitz_hash_reference
+
+
+@pytest.mark.parametrize("num_bits, output_length", [(1, 1), (17, 5), (64, 64), (300, 120), (1025, 3)])
+def test_fft_hash_matches_the_matrix_product(num_bits, output_length):
+    bits = np.random.default_rng(num_bits).integers(0, 2, num_bits, dtype=np.uint8)
+    assert np.array_equal(toeplitz_hash(bits, output_length, 11), toeplitz_hash_reference(bits, output_length, 11))
+
+
+@pytest.mark.parametrize("block", [1, 7, 64])
+def test_multi_block_path_matches_the_matrix_product(monkeypatch, block):
+    # Small FFT blocks split the columns into many blocks, including a short last one
+    monkeypatch.setattr(privacy_amplification, "FFT_BLOCK", block)
+    bits = np.random.default_rng(block).integers(0, 2, 200, dtype=np.uint8)
+    assert np.array_equal(toeplitz_hash(bits, 90, 3), toeplitz_hash_reference(bits, 90, 3))
+
+
+def test_hash_depends_on_the_seed():
+    bits = np.random.default_rng(0).integers(0, 2, 256, dtype=np.uint8)
+    assert not np.array_equal(toeplitz_hash(bits, 128, 1), toeplitz_hash(bits, 128, 2))
+
+
+def test_empty_output():
+    assert len(toeplitz_hash(np.ones(10, dtype=np.uint8), 0, 1)) == 0
+    assert amplify([], 0, 1) == b""
+
+
+def test_amplify_packs_like_extract_key():
+    bits = np.random.default_rng(5).integers(0, 2, 100, dtype=np.uint8)
+    assert amplify(bits, 20, 8) == np.packbits(toeplitz_hash_reference(bits, 20, 8)).tobytes()
+
+
+def test_secure_key_length():
+    # Noiseless, nothing leaked: only the 2 log2(1 / epsilon) margin is lost
+    assert secure_key_length(1000, 0, 0, epsilon=2 ** -10) == 980
+    assert secure_key_length(1000, 5, 300) < secure_key_length(1000, 5, 0)
+    assert secure_key_length(100, 11, 80) == 0
+
+
+def test_amplification_needs_reconciliation():
+    pytest.importorskip("netsquid")
+    from network_set_up import BB84Network
+
+    with pytest.raises(ValueError):
+        BB84Network(32, privacy_amplification=True)
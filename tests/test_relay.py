@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+from relay import random_links, shortest_path, xor_relay
+
+
+def test_shortest_path_takes_the_fewest_hops():
+    # 0 - 1 - 2 - 3 plus a chord 0 - 3
+    links = [(0, 1), (1, 2), (2, 3), (3, 0)]
+    assert shortest_path(links, 0, 2) == [(1, 0), (2, 1)]
+    assert shortest_path(links, 0, 3) == [(3, 3)]
+    # Links are undirected
+    assert shortest_path(links, 2, 0) == [(1, 1), (0, 0)]
+
+
+def test_shortest_path_between_unconnected_nodes():
+    assert shortest_path([(0, 1), (2, 3)], 0, 3) is None
+    assert shortest_path([(0, 1)], 0, 0) == []
+
+
+def test_random_links_connect_every_node():
+    rng = np.random.default_rng(0)
+    links = random_links(8, 12, rng)
+    assert len({frozenset(link) for link in links}) == 12
+    assert all(shortest_path(links, 0, node) is not None for node in range(8))
+    with pytest.raises(ValueError):
+        random_links(4, 7, rng)
+
+
+@pytest.mark.parametrize("hops", [1, 2, 5])
+def test_xor_relay_recovers_the_end_to_end_key(hops):
+    # Both ends of every hop hold the same link key; the relays only publish XORs
+    rng = np.random.default_rng(hops)
+    link_keys = [rng.integers(0, 2, 64, dtype=np.uint8) for _ in range(hops)]
+    hop_keys = [(key, key.copy()) for key in link_keys]
+    source_key, destination_key, announcements = xor_relay(hop_keys)
+    assert np.array_equal(source_key, destination_key)
+    assert len(announcements) == hops - 1
+    # No announcement is the key itself
+    assert not any(np.array_equal(announcement, source_key) for announcement in announcements)
+
+
+def test_xor_relay_passes_link_errors_through():
+    # A flipped bit on any hop shows up at the same position of the destination key
+    rng = np.random.default_rng(7)
+    link_keys = [rng.integers(0, 2, 32, dtype=np.uint8) for _ in range(3)]
+    hop_keys = [(key, key.copy()) for key in link_keys]
+    hop_keys[1][1][5] ^= 1
+    source_key, destination_key, _ = xor_relay(hop_keys)
+    assert np.flatnonzero(source_key != destination_key).tolist() == [5]
@@ -0,0 +1,56 @@
+import numpy as np
+from result_store import ResultStore, code_version
+
+
+def test_hit_after_put_and_reopen(tmp_path):
+    path = str(tmp_path / "results.sqlite")
+    params = {"gamma": 0.1, "samples": 20, "key_length": 32}
+    with ResultStore(path, "v1") as store:
+        assert store.get(params) is None and params not in store
+        store.put(params, np.arange(4.0))
+    with ResultStore(path, "v1") as store:
+        # Key order does not matter
+        assert np.array_equal(store.get(dict(reversed(list(params.items())))), np.arange(4.0))
+        assert store.get(dict(params, gamma=0.2)) is None
+
+
+def test_new_code_version_misses(tmp_path):
+    path = str(tmp_path / "results.sqlite")
+    with ResultStore(path, "v1") as store:
+        store.put({"gamma": 0.1}, [1.0])
+    with ResultStore(path, "v2") as store:
+        assert {"gamma": 0.1} not in store
+        store.put({"gamma": 0.1}, [2.0])
+    with ResultStore(path, "v1") as store:
+        assert store.get({"gamma": 0.1}).tolist() == [1.0]
+
+
+def test_memoize_computes_once(tmp_path):
+    calls = []
+    with ResultStore(str(tmp_path / "results.sqlite")) as store:
+        for _ in range(3):
+            value = store.memoize({"point": 1}, lambda: calls.append(1) or [5, 6])
+        assert value.tolist() == [5, 6] and len(calls) == 1
+
+
+def test_query_filters_on_params(tmp_path):
+    with ResultStore(str(tmp_path / "results.sqlite"), "v1") as store:
+        for gamma in (0.1, 0.2):
+            for samples in (10, 20):
+                store.put({"gamma": gamma, "samples": samples}, [gamma * samples])
+        assert sorted(params["samples"] for params, _ in store.query(gamma=0.2)) == [10, 20]
+
+
+def test_code_version_follows_the_sources(tmp_path):
+    package, common = tmp_path / "package", tmp_path / "common"
+    package.mkdir(), common.mkdir()
+    (package / "protocol.py").write_text("A = 1\n")
+    (common / "shared.py").write_text("B = 1\n")
+    (package / "notes.txt").write_text("not code")
+    version = code_version(str(package), str(common))
+    assert version == code_version(str(package), str(common))
+    (package / "notes.txt").write_text("still not code")
+    assert version == code_version(str(package), str(common))
+    # Editing shared code changes the version as much as editing the protocol
+    (common / "shared.py").write_text("B = 2\n")
+    assert version != code_version(str(package), str(common))